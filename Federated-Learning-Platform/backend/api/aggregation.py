@@ -0,0 +1,280 @@
+"""
+Server-side FedAvg for an iteration.
+
+Each submission is folded into a persisted IterationAccumulator as it arrives
+(sum of weight * params plus the total weight), so closing a round only
+divides the accumulator. A resubmission first subtracts the client's previous
+contribution. Clients are weighted by num_samples (1 when not reported).
+
+Iterations without an accumulator are rebuilt from the latest ClientModel per
+assignment: parameters are stacked into one (n_clients, ...) array per
+parameter and summed in a single NumPy contraction.
+"""
+import copy
+import io
+import pickle
+
+import numpy as np
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import Max, OuterRef, Subquery
+
+from . import safe_pickle
+from .models import (
+    CentralAuthModel,
+    CentralClientAssignment,
+    ClientModel,
+    IterationAccumulator,
+    AccumulatorContribution,
+)
+
+# Fitted attributes averaged by FedAvg (scikit-learn linear models).
+PARAMETERS = ("coef_", "intercept_")
+
+
+class AggregationError(Exception):
+    pass
+
+
+def iteration_submissions(iteration):
+    """
+    Every ClientModel submitted to `iteration` (any version row of it). Round
+    names are only unique per central authority, so both are matched.
+    """
+    return ClientModel.objects.filter(
+        assignment__central_auth_id=iteration.central_auth_id,
+        assignment__iteration_name=iteration.iteration_name,
+    )
+
+
+def latest_submissions(iteration):
+    """Latest ClientModel of every assignment in `iteration`, in one query."""
+    latest = (
+        ClientModel.objects.filter(assignment=OuterRef("assignment"))
+        .order_by("-created_at", "-id")
+        .values("id")[:1]
+    )
+    return (
+        iteration_submissions(iteration)
+        .filter(id=Subquery(latest))
+        .select_related("assignment__client")
+        .order_by("assignment_id")
+    )
+
+
+def load_estimator(model_file):
+    """Unpickle an uploaded model through the restricted unpickler (api/safe_pickle.py)."""
+    with model_file.open("rb") as f:
+        try:
+            return safe_pickle.load(f)
+        except safe_pickle.UnsafeModel as e:
+            raise AggregationError(str(e)) from None
+
+
+def extract_parameters(estimator):
+    missing = [name for name in PARAMETERS if not hasattr(estimator, name)]
+    if missing:
+        raise AggregationError(
+            f"{type(estimator).__name__} has no {', '.join(missing)}; only linear models can be averaged."
+        )
+    return {name: np.asarray(getattr(estimator, name), dtype=np.float64) for name in PARAMETERS}
+
+
+def weighted_sum(stacked, weights):
+    """
+    `stacked` maps a parameter name to an (n_clients, ...) array; `weights`
+    is (n_clients,). Each parameter is reduced in one tensordot.
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    return {name: np.tensordot(weights, values, axes=1) for name, values in stacked.items()}
+
+
+def weighted_average(stacked, weights):
+    """FedAvg over stacked client parameters."""
+    total = float(np.sum(weights))
+    if total <= 0:
+        raise AggregationError("Client weights must sum to a positive number.")
+    return {name: value / total for name, value in weighted_sum(stacked, weights).items()}
+
+
+def pack(parameters):
+    buffer = io.BytesIO()
+    np.savez(buffer, **parameters)
+    return buffer.getvalue()
+
+
+def unpack(data):
+    if not data:
+        return {}
+    with np.load(io.BytesIO(bytes(data))) as archive:
+        return {name: archive[name] for name in archive.files}
+
+
+def submission_weight(client_model):
+    return float(client_model.num_samples or 1)
+
+
+def stack_parameters(parameter_sets):
+    stacked = {}
+    for name in PARAMETERS:
+        shapes = {p[name].shape for p in parameter_sets}
+        if len(shapes) != 1:
+            raise AggregationError(f"Client {name} shapes differ: {sorted(shapes)}.")
+        stacked[name] = np.stack([p[name] for p in parameter_sets])
+    return stacked
+
+
+def build_estimator(template, averaged):
+    estimator = copy.deepcopy(template)
+    for name, value in averaged.items():
+        setattr(estimator, name, value)
+    return estimator
+
+
+def next_version(iteration):
+    current = (
+        CentralAuthModel.objects.filter(central_auth=iteration.central_auth, iteration_name=iteration.iteration_name)
+        .aggregate(v=Max("version"))["v"]
+    )
+    return (current or 0) + 1
+
+
+def save_global_model(iteration, estimator):
+    """Store `estimator` as the next version of `iteration` and return the new row."""
+    with transaction.atomic():
+        version = next_version(iteration)
+        model = CentralAuthModel(
+            central_auth=iteration.central_auth,
+            iteration_name=iteration.iteration_name,
+            model_name=iteration.model_name,
+            dataset_domain=iteration.dataset_domain,
+            version=version,
+        )
+        model.model_file.save(
+            f"{iteration.iteration_name}_v{version}.pkl", ContentFile(pickle.dumps(estimator)), save=False
+        )
+        model.save()
+        # Assignments follow their iteration to the new version row.
+        CentralClientAssignment.objects.filter(
+            central_auth=iteration.central_auth, iteration_name=iteration.iteration_name
+        ).update(iteration=model)
+    return model
+
+
+def accumulate_submission(client_model):
+    """
+    Fold `client_model` into its iteration's accumulator, replacing the
+    assignment's earlier contribution. Raises AggregationError, before writing
+    anything, when the model has no averageable parameters.
+    """
+    estimator = load_estimator(client_model.model_file)
+    parameters = extract_parameters(estimator)
+    weight = submission_weight(client_model)
+    assignment = client_model.assignment
+
+    with transaction.atomic():
+        accumulator, _ = IterationAccumulator.objects.get_or_create(
+            central_auth_id=assignment.central_auth_id, iteration_name=assignment.iteration_name
+        )
+        # Row lock serialises concurrent submissions to the same iteration.
+        accumulator = IterationAccumulator.objects.select_for_update().get(pk=accumulator.pk)
+        sums = unpack(accumulator.weighted_sum)
+        total = accumulator.total_weight
+
+        previous = AccumulatorContribution.objects.filter(assignment=assignment).first()
+        if previous is not None:
+            for name, value in unpack(previous.parameters).items():
+                sums[name] = sums[name] - previous.weight * value
+            total -= previous.weight
+
+        for name, value in parameters.items():
+            if name in sums and sums[name].shape != value.shape:
+                raise AggregationError(
+                    f"{name} shape {value.shape} does not match the iteration's {sums[name].shape}."
+                )
+            sums[name] = sums.get(name, 0) + weight * value
+
+        accumulator.weighted_sum = pack(sums)
+        accumulator.total_weight = total + weight
+        accumulator.template = pickle.dumps(estimator)
+        accumulator.save()
+        AccumulatorContribution.objects.update_or_create(
+            assignment=assignment,
+            defaults={
+                "accumulator": accumulator,
+                "client_model": client_model,
+                "weight": weight,
+                "parameters": pack(parameters),
+            },
+        )
+    return accumulator
+
+
+def withdraw_contribution(sender, instance, **kwargs):
+    """
+    post_delete of an AccumulatorContribution: take its weight back out of the
+    accumulator, so a deleted client, assignment or submission is no longer
+    averaged in.
+    """
+    with transaction.atomic():
+        accumulator = IterationAccumulator.objects.select_for_update().filter(pk=instance.accumulator_id).first()
+        if accumulator is None:
+            return  # deleted along with it
+        sums = unpack(accumulator.weighted_sum)
+        for name, value in unpack(instance.parameters).items():
+            sums[name] = sums[name] - instance.weight * value
+        accumulator.weighted_sum = pack(sums)
+        accumulator.total_weight -= instance.weight
+        accumulator.save(update_fields=["weighted_sum", "total_weight", "updated_at"])
+
+
+def rebuild_accumulator(iteration):
+    """Recompute an iteration's accumulator from its latest submissions."""
+    submissions = list(latest_submissions(iteration))
+    if not submissions:
+        raise AggregationError("No client submissions to aggregate.")
+
+    estimators = [load_estimator(s.model_file) for s in submissions]
+    parameter_sets = [extract_parameters(e) for e in estimators]
+    weights = [submission_weight(s) for s in submissions]
+    sums = weighted_sum(stack_parameters(parameter_sets), weights)
+
+    with transaction.atomic():
+        # Removed first: withdraw_contribution subtracts them, and the sums are then overwritten.
+        AccumulatorContribution.objects.filter(
+            accumulator__central_auth_id=iteration.central_auth_id,
+            accumulator__iteration_name=iteration.iteration_name,
+        ).delete()
+        accumulator, _ = IterationAccumulator.objects.update_or_create(
+            central_auth_id=iteration.central_auth_id,
+            iteration_name=iteration.iteration_name,
+            defaults={
+                "weighted_sum": pack(sums),
+                "total_weight": float(np.sum(weights)),
+                "template": pickle.dumps(estimators[-1]),
+            },
+        )
+        AccumulatorContribution.objects.bulk_create(
+            AccumulatorContribution(
+                accumulator=accumulator,
+                assignment_id=s.assignment_id,
+                client_model=s,
+                weight=w,
+                parameters=pack(p),
+            )
+            for s, w, p in zip(submissions, weights, parameter_sets)
+        )
+    return accumulator
+
+
+def aggregate_iteration(iteration):
+    """FedAvg of `iteration`, read from its accumulator (rebuilt if missing)."""
+    accumulator = IterationAccumulator.objects.filter(
+        central_auth_id=iteration.central_auth_id, iteration_name=iteration.iteration_name
+    ).first()
+    if accumulator is None or accumulator.total_weight <= 0:
+        accumulator = rebuild_accumulator(iteration)
+
+    averaged = {name: value / accumulator.total_weight for name, value in unpack(accumulator.weighted_sum).items()}
+    template = safe_pickle.loads(accumulator.template)
+    return save_global_model(iteration, build_estimator(template, averaged))
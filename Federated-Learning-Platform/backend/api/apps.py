@@ -4,3 +4,32 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from django.db.models.signals import post_init, post_save, post_delete
+
+        # Connects the post_save hook that hot-swaps finalized models.
+        from . import registry  # noqa: F401
+        from .models import AccumulatorContribution, CentralAuthModel, CentralClientAssignment, ClientModel
+        from .aggregation import withdraw_contribution
+        from .caching import assignment_changed, client_model_changed, iteration_changed
+        from .storage import track_model_file, count_model_file, release_model_file
+
+        # Keep Blob.ref_count in step with the rows that reference each artifact.
+        for model in (CentralAuthModel, ClientModel):
+            post_init.connect(track_model_file, sender=model)
+            post_save.connect(count_model_file, sender=model)
+            post_delete.connect(release_model_file, sender=model)
+
+        # Deleting a contribution (or the client, assignment or submission behind it)
+        # takes it out of the iteration's running FedAvg.
+        post_delete.connect(withdraw_contribution, sender=AccumulatorContribution)
+
+        # Invalidate cached list responses (api/caching.py) when their rows change.
+        for model, handler in (
+            (CentralAuthModel, iteration_changed),
+            (CentralClientAssignment, assignment_changed),
+            (ClientModel, client_model_changed),
+        ):
+            post_save.connect(handler, sender=model)
+            post_delete.connect(handler, sender=model)
@@ -0,0 +1,167 @@
+"""
+Native, memory-mappable model artifacts.
+
+An artifact is a directory holding a small manifest.json plus the model's
+weights in a native format:
+
+    linear models   one .npy file per fitted array, opened with mmap_mode="r",
+                    so every worker maps the same page-cache pages instead of
+                    unpickling a private copy
+    CatBoost        model.cbm (CatBoost's own format; no unpickling)
+
+Pickles are converted once into MODEL_ARTIFACT_DIR (under MEDIA_ROOT), keyed by
+the pickle's path, size and mtime; `manage.py convert_models` does this ahead
+of time for every known model.
+"""
+import hashlib
+import importlib
+import json
+import os
+import pickle
+import shutil
+import tempfile
+
+import numpy as np
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+MANIFEST = "manifest.json"
+FORMAT = "fl-artifact"
+FORMAT_VERSION = 1
+
+# Estimators that may be rebuilt from a manifest (the class is imported by name).
+LINEAR_MODULE = "sklearn.linear_model."
+LINEAR_ARRAYS = ("coef_", "intercept_", "classes_", "n_iter_")
+
+
+class ArtifactError(Exception):
+    pass
+
+
+def artifact_root():
+    return default_storage.path(getattr(settings, "MODEL_ARTIFACT_DIR", "artifacts"))
+
+
+def artifact_dir_for(pickle_path):
+    stat = os.stat(pickle_path)
+    key = f"{os.path.abspath(pickle_path)}:{stat.st_size}:{stat.st_mtime_ns}"
+    return os.path.join(artifact_root(), hashlib.sha256(key.encode()).hexdigest()[:32])
+
+
+def _class_path(estimator):
+    cls = type(estimator)
+    return f"{cls.__module__.split('._')[0]}.{cls.__name__}"
+
+
+def _write_linear(estimator, directory):
+    arrays = {}
+    for name in LINEAR_ARRAYS:
+        if hasattr(estimator, name):
+            np.save(os.path.join(directory, f"{name}.npy"), np.ascontiguousarray(getattr(estimator, name)))
+            arrays[name] = f"{name}.npy"
+    attributes = {"n_features_in_": int(getattr(estimator, "n_features_in_", 0)) or None}
+    if hasattr(estimator, "feature_names_in_"):
+        attributes["feature_names_in_"] = [str(f) for f in estimator.feature_names_in_]
+    return {
+        "kind": "linear",
+        "estimator": _class_path(estimator),
+        "params": estimator.get_params(),
+        "arrays": arrays,
+        "attributes": attributes,
+    }
+
+
+def _write_catboost(estimator, directory):
+    estimator.save_model(os.path.join(directory, "model.cbm"), format="cbm")
+    return {"kind": "catboost", "estimator": _class_path(estimator), "file": "model.cbm"}
+
+
+def save_artifact(estimator, directory):
+    """Write `estimator` as an artifact directory (atomically replaced into place)."""
+    if _class_path(estimator).startswith(LINEAR_MODULE) and hasattr(estimator, "coef_"):
+        writer = _write_linear
+    elif type(estimator).__module__.startswith("catboost"):
+        writer = _write_catboost
+    else:
+        raise ArtifactError(f"No native artifact format for {type(estimator).__name__}.")
+
+    parent = os.path.dirname(directory)
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(dir=parent, prefix=".staging-")
+    try:
+        manifest = {"format": FORMAT, "version": FORMAT_VERSION, **writer(estimator, staging)}
+        with open(os.path.join(staging, MANIFEST), "w") as f:
+            json.dump(manifest, f, indent=2)
+        try:
+            os.rename(staging, directory)
+        except OSError:
+            # Another worker converted the same model first; keep theirs.
+            if not os.path.exists(os.path.join(directory, MANIFEST)):
+                raise
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    return directory
+
+
+def _import_class(path):
+    module, _, name = path.rpartition(".")
+    return getattr(importlib.import_module(module), name)
+
+
+def load_artifact(directory):
+    """Load an artifact; linear weights come back as read-only np.memmap views."""
+    try:
+        with open(os.path.join(directory, MANIFEST)) as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        raise ArtifactError(f"No artifact at {directory}.") from None
+    if manifest.get("format") != FORMAT or manifest.get("version") != FORMAT_VERSION:
+        raise ArtifactError(f"Unsupported artifact format in {directory}.")
+
+    if manifest["kind"] == "linear":
+        if not manifest["estimator"].startswith(LINEAR_MODULE):
+            raise ArtifactError(f"Refusing to build {manifest['estimator']}.")
+        estimator = _import_class(manifest["estimator"])(**manifest["params"])
+        for name, filename in manifest["arrays"].items():
+            setattr(estimator, name, np.load(os.path.join(directory, filename), mmap_mode="r"))
+        attributes = manifest.get("attributes", {})
+        if attributes.get("n_features_in_"):
+            estimator.n_features_in_ = attributes["n_features_in_"]
+        if "feature_names_in_" in attributes:
+            estimator.feature_names_in_ = np.array(attributes["feature_names_in_"], dtype=object)
+        return estimator
+
+    if manifest["kind"] == "catboost":
+        from catboost import CatBoostClassifier
+
+        return CatBoostClassifier().load_model(os.path.join(directory, manifest["file"]), format="cbm")
+
+    raise ArtifactError(f"Unknown artifact kind {manifest['kind']!r}.")
+
+
+def convert_pickle(pickle_path, directory=None):
+    """Convert a pickled model to an artifact and return the artifact directory."""
+    directory = directory or artifact_dir_for(pickle_path)
+    if os.path.exists(os.path.join(directory, MANIFEST)):
+        return directory
+    with open(pickle_path, "rb") as f:
+        estimator = pickle.load(f)
+    return save_artifact(estimator, directory)
+
+
+def load_model(path):
+    """
+    Load the model stored at `path` (a pickle), through its native artifact when
+    the model type has one, converting on first use. Other models are unpickled.
+    """
+    directory = artifact_dir_for(path)
+    if os.path.exists(os.path.join(directory, MANIFEST)):
+        return load_artifact(directory)
+
+    with open(path, "rb") as f:
+        estimator = pickle.load(f)
+    try:
+        save_artifact(estimator, directory)
+    except ArtifactError:
+        return estimator
+    return load_artifact(directory)
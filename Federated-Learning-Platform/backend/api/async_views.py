@@ -0,0 +1,275 @@
+"""
+Async counterparts of the polled read endpoints, chunk uploads and
+single-record inference, for the ASGI deployment:
+
+    uvicorn core.asgi:application --workers 4
+
+core/asgi.py turns on ASYNC_VIEWS, and api/urls.py then routes these URLs here
+ahead of the DRF views in views.py. Paths, parameters, auth and payloads are
+the same. Database access goes through the async ORM. Inference awaits the
+micro-batcher (or an executor), so an idle or waiting connection holds no
+thread.
+"""
+import functools
+import json
+
+from asgiref.sync import sync_to_async
+from django.db.models import Count, Q
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions, status
+
+from .models import UserProfile, CentralClientAssignment, CentralAuthModel, UploadSession
+from .auth import SignedTokenAuthentication, aprincipal
+from .batching import apredict_one
+from .caching import cached_response, email_scope, user_id_scope
+from .pagination import apaginated_response
+from .pool import PoolSaturated
+from .registry import ModelNotRegistered
+from .schemas import get_schema
+from .uploads import UploadError, write_chunk
+from .serializer import CentralClientAssignmentSerializer, CentralAuthModelSerializer
+
+
+def async_api_view(methods):
+    """
+    The parts of DRF's @api_view these views need: method check, token
+    authentication (request.token_user) and JSON 401/403 responses.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                return JsonResponse(
+                    {"detail": f'Method "{request.method}" not allowed.'},
+                    status=status.HTTP_405_METHOD_NOT_ALLOWED,
+                )
+            try:
+                authenticated = SignedTokenAuthentication().authenticate(request)
+                request.token_user = authenticated[0] if authenticated else None
+                return await view(request, *args, **kwargs)
+            except exceptions.AuthenticationFailed as e:
+                response = JsonResponse({"detail": str(e.detail)}, status=status.HTTP_401_UNAUTHORIZED)
+                response["WWW-Authenticate"] = "Bearer"
+                return response
+            except exceptions.PermissionDenied as e:
+                return JsonResponse({"detail": str(e.detail)}, status=status.HTTP_403_FORBIDDEN)
+        return csrf_exempt(wrapper)
+    return decorator
+
+
+def _error(message, code):
+    return JsonResponse({"error": message}, status=code)
+
+
+# ---------------------------
+# ✅ Client Management
+# ---------------------------
+@async_api_view(["GET"])
+@cached_response(email_scope)
+async def fetch_assign(request, email):
+    if request.token_user is not None:
+        await aprincipal(request, "central", email=email)
+
+    assignments = CentralClientAssignment.objects.filter(
+        central_auth__email=email
+    ).select_related("client", "central_auth")
+    return await apaginated_response(
+        request, assignments, CentralClientAssignmentSerializer, time_field="assigned_at"
+    )
+
+
+# ---------------------------
+# ✅ Model / Iteration Management
+# ---------------------------
+async def _central_user(request):
+    user_id = request.GET.get("user_id")
+    if not user_id and request.token_user is None:
+        return None, _error("user_id parameter is required", status.HTTP_400_BAD_REQUEST)
+    try:
+        return await aprincipal(request, "central", user_id=user_id), None
+    except UserProfile.DoesNotExist:
+        return None, _error("Central Auth user not found", status.HTTP_404_NOT_FOUND)
+
+
+@async_api_view(["GET"])
+@cached_response(user_id_scope)
+async def list_central_models(request):
+    user, error = await _central_user(request)
+    if error:
+        return error
+
+    models = (
+        CentralAuthModel.objects.filter(central_auth_id=user.id)
+        .select_related("central_auth")
+        .order_by("-created_at")
+    )
+    return await apaginated_response(request, models, CentralAuthModelSerializer)
+
+
+@async_api_view(["GET"])
+@cached_response(user_id_scope)
+async def running_iterations(request):
+    user, error = await _central_user(request)
+    if error:
+        return error
+
+    iterations = (
+        CentralAuthModel.objects.filter(central_auth_id=user.id, version__gt=0)
+        .select_related("central_auth")
+        .order_by("-version")
+    )
+    return await apaginated_response(request, iterations, CentralAuthModelSerializer)
+
+
+# ---------------------------
+# ✅ Client Dashboard
+# ---------------------------
+@async_api_view(["GET"])
+async def client_dashboard_data(request, email):
+    try:
+        client = await aprincipal(request, "client", email=email)
+    except UserProfile.DoesNotExist:
+        return _error("Client not found", status.HTTP_404_NOT_FOUND)
+
+    counters = await CentralClientAssignment.objects.filter(client_id=client.id).aaggregate(
+        total_rounds=Count("id"),
+        current_running_rounds=Count("id", filter=Q(iteration__version__gt=0)),
+        total_finalized_models=Count("id", filter=Q(iteration__version=0)),
+    )
+    return JsonResponse({
+        "client_email": client.email,
+        "hospital": client.hospital,
+        **counters,
+    })
+
+
+@async_api_view(["GET"])
+@cached_response(user_id_scope)
+async def list_client_models(request):
+    user_id = request.GET.get("user_id")
+    if not user_id and request.token_user is None:
+        return _error("user_id parameter is required", status.HTTP_400_BAD_REQUEST)
+    try:
+        client = await aprincipal(request, "client", user_id=user_id)
+    except UserProfile.DoesNotExist:
+        return _error("Client not found", status.HTTP_404_NOT_FOUND)
+
+    iterations = (
+        CentralAuthModel.objects.filter(assignments__client_id=client.id)
+        .select_related("central_auth")
+        .distinct()
+        .order_by("-created_at")
+    )
+    return await apaginated_response(request, iterations, CentralAuthModelSerializer)
+
+
+@async_api_view(["GET"])
+async def current_client_iterations(request, email):
+    try:
+        client = await aprincipal(request, "client", email=email)
+    except UserProfile.DoesNotExist:
+        return _error("Client not found", status.HTTP_404_NOT_FOUND)
+
+    assigned_iterations = CentralClientAssignment.objects.filter(
+        client_id=client.id, iteration__version__gt=0
+    ).select_related("central_auth", "iteration")
+    data = [
+        {
+            "assignment_id": a.id,
+            "iteration_name": a.iteration_name,
+            "model_name": a.model_name,
+            "data_domain": a.data_domain,
+            "central_auth_email": a.central_auth.email,
+            "version": a.iteration.version,
+        }
+        async for a in assigned_iterations
+    ]
+    return JsonResponse(data, safe=False)
+
+
+# ---------------------------
+# ✅ Chunked Uploads
+# ---------------------------
+def _upload_state(session):
+    return {
+        "upload_id": session.id,
+        "next_chunk": session.next_chunk,
+        "bytes_received": session.bytes_received,
+        "committed": session.committed,
+    }
+
+
+def _upload_not_found():
+    # Same body as get_object_or_404 under DRF
+    return JsonResponse(
+        {"detail": "No UploadSession matches the given query."}, status=status.HTTP_404_NOT_FOUND
+    )
+
+
+@async_api_view(["GET"])
+async def upload_status(request, upload_id):
+    session = await UploadSession.objects.filter(id=upload_id).afirst()
+    if session is None:
+        return _upload_not_found()
+    return JsonResponse(_upload_state(session))
+
+
+@async_api_view(["PUT"])
+async def put_upload_chunk(request, upload_id, index):
+    """
+    The ASGI handler has already spooled the body without a thread; the
+    locked append and hash update run in the ORM's sync thread.
+    """
+    if not await UploadSession.objects.filter(id=upload_id).aexists():
+        return _upload_not_found()
+    try:
+        session = await sync_to_async(write_chunk)(upload_id, index, request)
+    except UploadError as e:
+        current = await UploadSession.objects.aget(id=upload_id)
+        return JsonResponse({"error": str(e), **_upload_state(current)}, status=e.status)
+    return JsonResponse(_upload_state(session))
+
+
+# ---------------------------
+# ✅ ML Inference
+# ---------------------------
+async def _predict(request, name):
+    try:
+        schema = get_schema(name)
+    except ModelNotRegistered:
+        return _error(f"Unknown model '{name}'.", status.HTTP_404_NOT_FOUND)
+
+    try:
+        if request.content_type == "application/json":
+            data = json.loads(request.body or b"{}")
+        else:
+            data = request.POST
+        if not isinstance(data, dict):
+            return _error("Send the features as a JSON object.", status.HTTP_400_BAD_REQUEST)
+        # A fresh row: other requests encode on this thread while this one waits
+        label, probability = await apredict_one(name, schema.encode(data, reuse=False))
+    except PoolSaturated as e:
+        response = _error(str(e), status.HTTP_503_SERVICE_UNAVAILABLE)
+        response["Retry-After"] = str(e.retry_after)
+        return response
+    except ModelNotRegistered:
+        return _error(f"Model '{name}' is not served.", status.HTTP_404_NOT_FOUND)
+    except Exception as e:
+        return _error(str(e), status.HTTP_400_BAD_REQUEST)
+    return JsonResponse({name: int(label), "probability": float(probability)})
+
+
+@async_api_view(["POST"])
+async def predict(request, model):
+    return await _predict(request, model)
+
+
+@async_api_view(["POST"])
+async def diabetes(request):
+    return await _predict(request, "diabetes")
+
+
+@async_api_view(["POST"])
+async def heartdisease(request):
+    return await _predict(request, "heartdisease")
@@ -0,0 +1,100 @@
+"""
+Signed, expiring bearer tokens.
+
+`login` issues a token carrying the user's id, email, role and hospital,
+signed with SECRET_KEY (django.core.signing) and valid for AUTH_TOKEN_MAX_AGE
+seconds.
+SignedTokenAuthentication verifies it without a database query and sets
+request.user to a TokenUser. The password is checked once, at login.
+
+Requests without a token still work through the legacy user_id/email
+parameters; `principal` resolves either form for the views.
+"""
+from django.conf import settings
+from django.core import signing
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+
+from .models import UserProfile
+
+SALT = "api.auth.token"
+KEYWORD = b"bearer"
+
+
+class TokenUser:
+    """The authenticated principal, rebuilt from token claims."""
+
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, id, email, role, hospital=None):
+        self.id = self.pk = id
+        self.email = email
+        self.role = role
+        self.hospital = hospital
+
+    def __str__(self):
+        return self.email
+
+
+def issue_token(user):
+    claims = {"id": user.id, "email": user.email, "role": user.role, "hospital": user.hospital}
+    return signing.dumps(claims, salt=SALT, compress=True)
+
+
+def read_token(token):
+    """Return a TokenUser for a valid token; raises signing.BadSignature otherwise."""
+    claims = signing.loads(token, salt=SALT, max_age=getattr(settings, "AUTH_TOKEN_MAX_AGE", 12 * 3600))
+    return TokenUser(claims["id"], claims["email"], claims["role"], claims.get("hospital"))
+
+
+class SignedTokenAuthentication(BaseAuthentication):
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != KEYWORD:
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed("Invalid token header.")
+        try:
+            token = auth[1].decode()
+            return read_token(token), token
+        except signing.SignatureExpired:
+            raise exceptions.AuthenticationFailed("Token has expired.")
+        except (signing.BadSignature, UnicodeDecodeError, KeyError, TypeError):
+            raise exceptions.AuthenticationFailed("Invalid token.")
+
+    def authenticate_header(self, request):
+        return "Bearer"
+
+
+def _check_token_user(user, role, user_id, email):
+    if user.role != role:
+        raise exceptions.PermissionDenied(f"This endpoint requires a {role} user.")
+    if (user_id and str(user_id) != str(user.id)) or (email and email != user.email):
+        raise exceptions.PermissionDenied("Token does not belong to the requested user.")
+    return user
+
+
+def _lookup(role, user_id, email):
+    if not (user_id or email):
+        raise UserProfile.DoesNotExist
+    lookup = {"id": user_id} if user_id else {"email": email}
+    return UserProfile.objects.filter(role=role, **lookup)
+
+
+def principal(request, role, user_id=None, email=None):
+    """
+    The acting user for a request: the token's principal if there is one
+    (403 if it names a different user or role), else the UserProfile given by
+    the legacy `user_id`/`email` parameters (UserProfile.DoesNotExist if none).
+    """
+    if isinstance(request.user, TokenUser):
+        return _check_token_user(request.user, role, user_id, email)
+    return _lookup(role, user_id, email).get()
+
+
+async def aprincipal(request, role, user_id=None, email=None):
+    """principal() for the async views, which set request.token_user."""
+    if request.token_user is not None:
+        return _check_token_user(request.token_user, role, user_id, email)
+    return await _lookup(role, user_id, email).aget()
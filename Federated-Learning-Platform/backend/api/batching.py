@@ -0,0 +1,271 @@
+"""
+Micro-batching for the single-record inference endpoints.
+
+Concurrent requests for the same model are queued and scored together: the
+first request opens a window of INFERENCE_BATCH_WINDOW_MS, and the batch is
+flushed when the window closes or INFERENCE_BATCH_MAX_SIZE rows are waiting.
+Each caller blocks on its own future and gets its own row back; async views
+await it instead (apredict_one). A window of 0 disables batching and scores on
+the request thread. With INFERENCE_POOL_WORKERS set, batches are scored in the
+process pool (api/pool.py) instead.
+"""
+import asyncio
+import functools
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+import pandas as pd
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .inference import score
+from .metrics import observe_inference
+from .pool import inference_pool
+from .prediction_cache import prediction_cache
+from .registry import registry
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the batch-size histogram buckets.
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+def batch_window():
+    return getattr(settings, "INFERENCE_BATCH_WINDOW_MS", 2) / 1000
+
+
+def batch_max_size():
+    return getattr(settings, "INFERENCE_BATCH_MAX_SIZE", 64)
+
+
+def _stack(rows):
+    if isinstance(rows[0], pd.DataFrame):
+        return pd.concat(rows, ignore_index=True)
+    return np.vstack(rows)
+
+
+class MicroBatcher:
+    def __init__(self, name, window=None, max_size=None):
+        self.name = name
+        self._window = window
+        self._max_size = max_size
+        self._queue = queue.Queue()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._requests = 0
+        self._batches = 0
+        self._largest = 0
+        self._wait_seconds = 0.0
+        self._histogram = dict.fromkeys(BATCH_SIZE_BUCKETS + (float("inf"),), 0)
+
+    @property
+    def window(self):
+        return self._window if self._window is not None else batch_window()
+
+    @property
+    def max_size(self):
+        return self._max_size if self._max_size is not None else batch_max_size()
+
+    def submit(self, model, X):
+        """Queue a one-row input scored by `model` (a LoadedModel) and return its future."""
+        future = Future()
+        self._queue.put((model, X, future, time.monotonic()))
+        self._ensure_worker()
+        return future
+
+    def predict(self, model, X):
+        return self.submit(model, X).result()
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "requests": self._requests,
+                "batches": self._batches,
+                "largest_batch": self._largest,
+                "mean_batch_size": self._requests / self._batches if self._batches else 0.0,
+                "mean_queue_wait_ms": 1000 * self._wait_seconds / self._requests if self._requests else 0.0,
+                "batch_size_histogram": {
+                    ("+Inf" if bound == float("inf") else str(bound)): count
+                    for bound, count in self._histogram.items()
+                },
+            }
+
+    # ----- worker -----
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name=f"microbatch-{self.name}", daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            batch = [first]
+            deadline = first[3] + self.window
+            while len(batch) < self.max_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._flush(batch)
+
+    def _flush(self, batch):
+        flushed_at = time.monotonic()
+        # A hot swap can land mid-window; score each model's rows separately.
+        groups = {}
+        for item in batch:
+            groups.setdefault(id(item[0]), []).append(item)
+
+        for items in groups.values():
+            futures = [future for _, _, future, _ in items]
+            scored = _score(items[0][0], _stack([X for _, X, _, _ in items]))
+            scored.add_done_callback(functools.partial(_deliver, futures))
+
+        self._record(batch, flushed_at)
+
+    def _record(self, batch, flushed_at):
+        size = len(batch)
+        with self._stats_lock:
+            self._requests += size
+            self._batches += 1
+            self._largest = max(self._largest, size)
+            self._wait_seconds += sum(flushed_at - enqueued for _, _, _, enqueued in batch)
+            for bound in self._histogram:
+                if size <= bound:
+                    self._histogram[bound] += 1
+                    break
+
+
+def _score(model, X):
+    """Future of (labels, probabilities) for `X`: from the process pool, or scored here."""
+    pool = inference_pool()
+    if pool is not None:
+        try:
+            return pool.submit(model, X)
+        except Exception as exc:
+            future = Future()
+            future.set_exception(exc)
+            return future
+    future = Future()
+    try:
+        future.set_result(_timed_score(model, X))
+    except Exception as exc:
+        future.set_exception(exc)
+    return future
+
+
+def _timed_score(model, X):
+    started = time.perf_counter()
+    scored = score(model.estimator, X)
+    observe_inference(model, time.perf_counter() - started, len(X))
+    return scored
+
+
+def _deliver(futures, scored):
+    """Hand each caller its own row of a scored batch."""
+    try:
+        labels, probabilities = scored.result()
+    except Exception as exc:
+        for future in futures:
+            future.set_exception(exc)
+        return
+    for future, label, probability in zip(futures, labels, probabilities):
+        future.set_result((label, probability))
+
+
+_batchers = {}
+_batchers_lock = threading.Lock()
+
+
+def batcher_for(name):
+    batcher = _batchers.get(name)
+    if batcher is None:
+        with _batchers_lock:
+            batcher = _batchers.setdefault(name, MicroBatcher(name))
+    return batcher
+
+
+def _remembered(model, X):
+    key = prediction_cache.key(model, X)
+    return key, prediction_cache.get(key)
+
+
+def _remember(key, future):
+    if key is not None and future.exception() is None:
+        prediction_cache.put(key, future.result())
+
+
+def _submit(name, model, X, key):
+    pool = inference_pool()
+    if pool is not None:
+        pool.admit()
+    try:
+        if batch_window() > 0:
+            future = batcher_for(name).submit(model, X)
+        else:
+            future = Future()
+            _score(model, X).add_done_callback(functools.partial(_deliver, [future]))
+    except BaseException:
+        if pool is not None:
+            pool.release()
+        raise
+    if pool is not None:
+        future.add_done_callback(lambda _: pool.release())
+    future.add_done_callback(functools.partial(_remember, key))
+    return future
+
+
+def submit_one(name, X):
+    """
+    Future of (label, probability) for a single-row input to model `name`.
+    Repeated inputs are answered from the prediction cache. Raises
+    PoolSaturated when the process pool's queue is full.
+    """
+    model = registry.get(name)
+    key, cached = _remembered(model, X)
+    if cached is not None:
+        future = Future()
+        future.set_result(cached)
+        return future
+    return _submit(name, model, X, key)
+
+
+def predict_one(name, X):
+    """Score a single-row input for model `name`, coalescing with concurrent callers."""
+    return submit_one(name, X).result()
+
+
+async def apredict_one(name, X):
+    """
+    predict_one for async views. The request awaits its batch or pool future
+    (or an executor thread when both are off) instead of blocking the event loop.
+    """
+    if registry.is_loaded(name):
+        model = registry.get(name)
+    else:
+        model = await sync_to_async(registry.get)(name)
+    key, cached = _remembered(model, X)
+    if cached is not None:
+        return cached
+    if batch_window() <= 0 and inference_pool() is None:
+        loop = asyncio.get_running_loop()
+        labels, probabilities = await loop.run_in_executor(None, _timed_score, model, X)
+        prediction_cache.put(key, (labels[0], probabilities[0]))
+        return labels[0], probabilities[0]
+    return await asyncio.wrap_future(_submit(name, model, X, key))
+
+
+def batching_stats():
+    return {name: batcher.stats() for name, batcher in _batchers.items()}
@@ -0,0 +1,185 @@
+"""
+Per-user response cache with strong ETags for the polled list endpoints.
+
+A cached endpoint names the scope its response belongs to (a user id or an
+email). Each scope has a generation token in the cache; entries are keyed by
+endpoint, scope generation and query string, so a write invalidates every
+cached response of a scope by replacing its generation. A poll whose
+If-None-Match matches the cached ETag gets 304 without touching the database
+or the serializer.
+
+Generations are replaced after commit by post_save/post_delete hooks on the
+models these responses are built from.
+"""
+import asyncio
+import functools
+import hashlib
+import json
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from rest_framework import status
+from rest_framework.response import Response
+
+KEY_PREFIX = "api-response"
+
+
+def _generation_key(kind, value):
+    return f"{KEY_PREFIX}:gen:{kind}:{value}"
+
+
+def generation(kind, value):
+    key = _generation_key(kind, value)
+    token = cache.get(key)
+    if token is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        token = cache.get(key)
+    return token
+
+
+async def ageneration(kind, value):
+    key = _generation_key(kind, value)
+    token = await cache.aget(key)
+    if token is None:
+        await cache.aadd(key, uuid.uuid4().hex, None)
+        token = await cache.aget(key)
+    return token
+
+
+def invalidate(*scopes):
+    """Drop every cached response of the given (kind, value) scopes once the transaction commits."""
+    scopes = {(kind, str(value)) for kind, value in scopes if value not in (None, "")}
+    if not scopes:
+        return
+
+    def bump():
+        cache.set_many({_generation_key(kind, value): uuid.uuid4().hex for kind, value in scopes}, None)
+
+    transaction.on_commit(bump)
+
+
+def _etag(data):
+    body = json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True, separators=(",", ":"))
+    return f'"{hashlib.sha256(body.encode()).hexdigest()[:32]}"'
+
+
+def _matches(request, etag):
+    header = request.headers.get("If-None-Match", "")
+    return any(tag.strip() in (etag, "*") for tag in header.split(",")) if header else False
+
+
+def _response_key(view, request, kind, value, token, kwargs):
+    query = "&".join(sorted(request.GET.urlencode().split("&")))
+    params = json.dumps(kwargs, sort_keys=True, default=str)
+    key = f"{view.__module__}.{view.__name__}:{kind}:{value}:{token}:{params}:{query}"
+    return f"{KEY_PREFIX}:{hashlib.sha256(key.encode()).hexdigest()}"
+
+
+def _timeout():
+    return getattr(settings, "RESPONSE_CACHE_TIMEOUT", 300)
+
+
+def _conditional(request, response, etag):
+    if _matches(request, etag):
+        response = HttpResponseNotModified()
+    response["ETag"] = etag
+    return response
+
+
+def cached_response(scope):
+    """
+    Cache a GET view's 200 responses. `scope(request, **kwargs)` returns the
+    (kind, value) the response belongs to, or None to bypass the cache.
+    DRF views cache their data; async views (returning JsonResponse) their body.
+    """
+    def decorator(view):
+        if asyncio.iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                kind, value = scope(request, **kwargs) or (None, None)
+                if not value:
+                    return await view(request, *args, **kwargs)
+
+                token = await ageneration(kind, value)
+                key = _response_key(view, request, kind, value, token, kwargs)
+                entry = await cache.aget(key)
+                if entry is None:
+                    response = await view(request, *args, **kwargs)
+                    if response.status_code != status.HTTP_200_OK:
+                        return response
+                    entry = (f'"{hashlib.sha256(response.content).hexdigest()[:32]}"', response.content)
+                    await cache.aset(key, entry, _timeout())
+                else:
+                    response = HttpResponse(entry[1], content_type="application/json")
+                return _conditional(request, response, entry[0])
+            return async_wrapper
+
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            kind, value = scope(request, **kwargs) or (None, None)
+            if not value:
+                return view(request, *args, **kwargs)
+
+            key = _response_key(view, request, kind, value, generation(kind, value), kwargs)
+            entry = cache.get(key)
+            if entry is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                entry = (_etag(response.data), response.data)
+                cache.set(key, entry, _timeout())
+            else:
+                response = Response(entry[1])
+            return _conditional(request, response, entry[0])
+        return wrapper
+    return decorator
+
+
+def _token_user(request):
+    if hasattr(request, "token_user"):  # async views (api/async_views.py)
+        return request.token_user
+    return request.user if request.user.is_authenticated else None
+
+
+def user_id_scope(request, **kwargs):
+    user = _token_user(request)
+    if user is not None:
+        return "user", user.id
+    return "user", request.GET.get("user_id")
+
+
+def email_scope(request, email=None, **kwargs):
+    # A token holder's entries live in their own scope, so they are never
+    # served another user's cached response.
+    user = _token_user(request)
+    if user is not None:
+        return "user", user.id
+    return "email", email
+
+
+# ----- invalidation hooks -----
+
+def _central_scopes(central_auth):
+    return [("user", central_auth.id), ("email", central_auth.email)]
+
+
+def iteration_changed(sender, instance, **kwargs):
+    from .models import CentralClientAssignment
+
+    client_ids = CentralClientAssignment.objects.filter(
+        iteration_name=instance.iteration_name
+    ).values_list("client_id", flat=True)
+    invalidate(*_central_scopes(instance.central_auth), *(("user", pk) for pk in client_ids))
+
+
+def assignment_changed(sender, instance, **kwargs):
+    invalidate(*_central_scopes(instance.central_auth), ("user", instance.client_id))
+
+
+def client_model_changed(sender, instance, **kwargs):
+    assignment = instance.assignment
+    invalidate(*_central_scopes(assignment.central_auth), ("user", assignment.client_id))
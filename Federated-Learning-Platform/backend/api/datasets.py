@@ -0,0 +1,253 @@
+"""
+Reference datasets in binary form, and federated client partitions of them.
+
+The reference CSVs (EVALUATION_DATASETS) are parsed once into a columnar
+store: one .npy file per column under MEDIA_ROOT/<DATASET_CACHE_DIR>, keyed
+by the CSV's size and mtime and the spec, so nothing re-reads the CSV.
+
+`partition` splits the training rows (the held-out validation split is never
+handed to clients) into N client shards, IID or label-skewed by a Dirichlet
+draw, deterministically from a seed. Rows are written grouped by client, so
+every shard is a contiguous slice of one X.npy / y.npy pair and
+`open_shard` returns memory-mapped views of it without copying.
+
+    python manage.py partition_dataset heartdisease --clients 20 --scheme dirichlet --alpha 0.3
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+MANIFEST = "manifest.json"
+SCHEMES = ("iid", "dirichlet")
+
+
+class DatasetError(Exception):
+    pass
+
+
+def dataset_spec(name):
+    try:
+        return settings.EVALUATION_DATASETS[name]
+    except KeyError:
+        raise DatasetError(f"No reference dataset named '{name}'.") from None
+
+
+def _digest(*parts):
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+def source_digest(spec):
+    stat = os.stat(spec["path"])
+    return _digest(str(spec["path"]), stat.st_size, stat.st_mtime_ns, {k: v for k, v in spec.items() if k != "path"})
+
+
+def _root(setting, default):
+    return default_storage.path(getattr(settings, setting, default))
+
+
+def _write_npy(path, array):
+    partial = f"{path}.{os.getpid()}.tmp"
+    with open(partial, "wb") as f:
+        np.save(f, array)
+    os.replace(partial, path)
+
+
+def _write_manifest(directory, manifest):
+    # Written last: its presence marks the directory complete.
+    partial = os.path.join(directory, f"{MANIFEST}.{os.getpid()}.tmp")
+    with open(partial, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(partial, os.path.join(directory, MANIFEST))
+
+
+def _read_manifest(directory):
+    try:
+        with open(os.path.join(directory, MANIFEST)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+# ----- reference datasets -----
+
+def read_reference(spec):
+    """The reference CSV as a frame, renamed and rescaled as in the training notebooks."""
+    frame = pd.read_csv(spec["path"], sep=spec.get("sep", ","))
+    frame = frame.rename(columns=spec.get("rename", {})).drop_duplicates()
+    for column, factor in spec.get("scale", {}).items():
+        frame[column] = frame[column] * factor
+    return frame
+
+
+def convert(name):
+    """Write dataset `name` as one .npy per column (once) and return the store's directory."""
+    spec = dataset_spec(name)
+    directory = os.path.join(_root("DATASET_CACHE_DIR", "datasets"), f"{name}-{source_digest(spec)}")
+    if _read_manifest(directory) is not None:
+        return directory
+
+    frame = read_reference(spec)
+    os.makedirs(directory, exist_ok=True)
+    columns = {}
+    for column in frame.columns:
+        values = frame[column].to_numpy()
+        _write_npy(os.path.join(directory, f"{column}.npy"), values)
+        columns[column] = str(values.dtype)
+    _write_manifest(directory, {"dataset": name, "rows": len(frame), "columns": columns, "target": spec["target"]})
+    return directory
+
+
+def load_columns(name, columns=None):
+    """Memory-mapped columns of dataset `name` (all by default), converting it on first use."""
+    directory = convert(name)
+    manifest = _read_manifest(directory)
+    missing = [c for c in columns or () if c not in manifest["columns"]]
+    if missing:
+        raise DatasetError(f"Dataset '{name}' has no columns {missing}.")
+    return {
+        column: np.load(os.path.join(directory, f"{column}.npy"), mmap_mode="r")
+        for column in (columns or manifest["columns"])
+    }
+
+
+def feature_columns(name):
+    """Model input columns of dataset `name`: its model's schema columns, in training order."""
+    from .schemas import get_schema
+
+    return get_schema(name).columns
+
+
+def load_xy(name):
+    """(X, y) of every row of dataset `name`, X in the model's column order."""
+    spec = dataset_spec(name)
+    features = feature_columns(name)
+    columns = load_columns(name, [*features, spec["target"]])
+    X = np.column_stack([np.asarray(columns[c], dtype=np.float64) for c in features])
+    return X, np.asarray(columns[spec["target"]])
+
+
+def split_indices(name, rows):
+    """(train, validation) row indices: the validation split the server evaluates on."""
+    from sklearn.model_selection import train_test_split
+
+    spec = dataset_spec(name)
+    return train_test_split(
+        np.arange(rows), test_size=spec.get("test_size", 0.2), random_state=spec.get("seed", 42)
+    )
+
+
+def write_parquet(name, path=None):
+    """Export dataset `name` as one Parquet file (needs pyarrow or fastparquet)."""
+    path = path or os.path.join(convert(name), f"{name}.parquet")
+    frame = pd.DataFrame({c: np.asarray(v) for c, v in load_columns(name).items()})
+    try:
+        frame.to_parquet(path, index=False)
+    except ImportError as e:
+        raise DatasetError(f"Parquet export needs pyarrow or fastparquet: {e}") from None
+    return path
+
+
+# ----- client partitions -----
+
+def iid_partition(n_rows, n_clients, rng):
+    return np.array_split(rng.permutation(n_rows), n_clients)
+
+
+def dirichlet_partition(labels, n_clients, alpha, rng, min_size=1, max_draws=100):
+    """
+    Label-skewed split: each class's rows are divided among the clients in
+    proportions drawn from Dirichlet(alpha); smaller alpha, more skew. Draws
+    are repeated until every client has at least `min_size` rows.
+    """
+    classes = np.unique(labels)
+    for _ in range(max_draws):
+        shards = [[] for _ in range(n_clients)]
+        for label in classes:
+            rows = rng.permutation(np.flatnonzero(labels == label))
+            proportions = rng.dirichlet(np.full(n_clients, alpha))
+            cuts = (np.cumsum(proportions)[:-1] * len(rows)).astype(int)
+            for shard, part in zip(shards, np.split(rows, cuts)):
+                shard.append(part)
+        shards = [rng.permutation(np.concatenate(parts)) for parts in shards]
+        if min(len(s) for s in shards) >= min_size:
+            return shards
+    raise DatasetError(
+        f"No Dirichlet({alpha}) split gives all {n_clients} clients {min_size} rows; "
+        "raise alpha or lower the client count."
+    )
+
+
+def partition(name, n_clients, scheme="iid", alpha=0.5, seed=0, min_size=1, include_validation=False):
+    """
+    Shard dataset `name` into `n_clients` client partitions (once per
+    argument set) and return the partition directory. The rows are drawn from
+    the training split unless `include_validation`.
+    """
+    if scheme not in SCHEMES:
+        raise DatasetError(f"Unknown scheme '{scheme}', expected one of {', '.join(SCHEMES)}.")
+    if n_clients < 1:
+        raise DatasetError("At least one client is needed.")
+    spec = dataset_spec(name)
+    options = {
+        "clients": n_clients, "scheme": scheme, "alpha": alpha if scheme == "dirichlet" else None,
+        "seed": seed, "min_size": min_size, "include_validation": include_validation,
+    }
+    directory = os.path.join(
+        _root("PARTITION_DIR", "partitions"),
+        f"{name}-{scheme}-n{n_clients}-s{seed}-{_digest(source_digest(spec), options)}",
+    )
+    if _read_manifest(directory) is not None:
+        return directory
+
+    X, y = load_xy(name)
+    rows = np.arange(len(y)) if include_validation else np.sort(split_indices(name, len(y))[0])
+    if len(rows) < n_clients * min_size:
+        raise DatasetError(f"{len(rows)} rows cannot give {n_clients} clients {min_size} rows each.")
+    rng = np.random.default_rng(seed)
+    if scheme == "iid":
+        shards = iid_partition(len(rows), n_clients, rng)
+    else:
+        shards = dirichlet_partition(y[rows], n_clients, alpha, rng, min_size)
+
+    order = rows[np.concatenate(shards)]
+    os.makedirs(directory, exist_ok=True)
+    _write_npy(os.path.join(directory, "X.npy"), X[order])
+    _write_npy(os.path.join(directory, "y.npy"), y[order])
+
+    clients, start = [], 0
+    for shard in shards:
+        labels, counts = np.unique(y[rows[shard]], return_counts=True)
+        clients.append({
+            "start": start,
+            "stop": start + len(shard),
+            "labels": {str(label): int(count) for label, count in zip(labels, counts)},
+        })
+        start += len(shard)
+    _write_manifest(directory, {
+        "dataset": name,
+        **options,
+        "features": feature_columns(name),
+        "target": spec["target"],
+        "rows": int(start),
+        "client_shards": clients,
+    })
+    return directory
+
+
+def open_shard(directory, client):
+    """(X, y) of client `client` (0-based) in a partition: read-only memory-mapped views, no copy."""
+    manifest = _read_manifest(directory)
+    if manifest is None:
+        raise DatasetError(f"{directory} is not a finished partition.")
+    shards = manifest["client_shards"]
+    if not 0 <= client < len(shards):
+        raise DatasetError(f"Client {client} is out of range; the partition has {len(shards)} clients.")
+    start, stop = shards[client]["start"], shards[client]["stop"]
+    X = np.load(os.path.join(directory, "X.npy"), mmap_mode="r")
+    y = np.load(os.path.join(directory, "y.npy"), mmap_mode="r")
+    return X[start:stop], y[start:stop]
@@ -0,0 +1,122 @@
+"""
+Compressed delta submissions for client model updates.
+
+Instead of a full pickle, a client can send the difference between its trained
+parameters and a referenced CentralAuthModel version, as an .npz archive. Each
+averaged parameter (see aggregation.PARAMETERS) is stored in one of three ways:
+
+    <name>.dense               delta as float32 or float16
+    <name>.q, <name>.scale     int8-quantized delta; delta = q * scale
+    <name>.idx, <name>.val     top-k sparse delta: flat indices and values
+
+Parameters missing from the archive are unchanged. The server adds the delta
+to the base model's parameters and stores the result as a regular ClientModel.
+"""
+import io
+import zipfile
+
+import numpy as np
+
+from .aggregation import PARAMETERS, AggregationError, build_estimator, extract_parameters
+
+
+class DeltaError(Exception):
+    pass
+
+
+def _quantize_int8(delta):
+    peak = float(np.abs(delta).max()) if delta.size else 0.0
+    scale = peak / 127 if peak else 1.0
+    return np.clip(np.rint(delta / scale), -127, 127).astype(np.int8), np.float32(scale)
+
+
+def encode_delta(base, updated, quantize=None, top_k=None):
+    """
+    Build a delta archive (bytes) from two parameter dicts.
+    `quantize` is None (float32), "float16" or "int8"; `top_k` keeps only the
+    k largest-magnitude entries of each parameter.
+    """
+    arrays = {}
+    for name in PARAMETERS:
+        delta = np.asarray(updated[name], dtype=np.float64) - np.asarray(base[name], dtype=np.float64)
+        if top_k is not None and top_k < delta.size:
+            flat = delta.ravel()
+            idx = np.argpartition(np.abs(flat), -top_k)[-top_k:]
+            arrays[f"{name}.idx"] = idx.astype(np.int64)
+            arrays[f"{name}.val"] = flat[idx].astype(np.float16 if quantize == "float16" else np.float32)
+        elif quantize == "int8":
+            arrays[f"{name}.q"], arrays[f"{name}.scale"] = _quantize_int8(delta)
+        else:
+            arrays[f"{name}.dense"] = delta.astype(np.float16 if quantize == "float16" else np.float32)
+
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, **arrays)
+    return buffer.getvalue()
+
+
+def _read(archive, key, kinds="iuf"):
+    """archive[key] as an ndarray of one of the dtype `kinds`; DeltaError for anything else."""
+    if key not in archive.files:
+        raise DeltaError(f"{key} is missing.")
+    try:
+        array = archive[key]
+    except (ValueError, OSError, EOFError, zipfile.BadZipFile) as e:
+        raise DeltaError(f"{key} is not a readable array: {e}") from None
+    if array.dtype.kind not in kinds:
+        raise DeltaError(f"{key} has unsupported dtype {array.dtype}.")
+    return array
+
+
+def decode_delta(data, base):
+    """
+    Return {parameter: delta} for a delta archive applied to `base` parameters.
+    Anything malformed (wrong dtype, size or bounds, a missing companion array,
+    non-finite values) raises DeltaError.
+    """
+    try:
+        archive = np.load(io.BytesIO(data), allow_pickle=False)
+    except (ValueError, OSError, EOFError, zipfile.BadZipFile) as e:
+        raise DeltaError(f"Delta is not a valid .npz archive: {e}") from None
+    if not isinstance(archive, np.lib.npyio.NpzFile):
+        raise DeltaError("Delta is not a .npz archive.")
+
+    deltas = {}
+    with archive:
+        keys = set(archive.files)
+        for name in PARAMETERS:
+            size = base[name].size
+            if f"{name}.dense" in keys:
+                delta = _read(archive, f"{name}.dense").astype(np.float64)
+            elif f"{name}.q" in keys:
+                q = _read(archive, f"{name}.q", kinds="iu")
+                scale = _read(archive, f"{name}.scale")
+                if scale.size != 1:
+                    raise DeltaError(f"{name}.scale must be a single value.")
+                delta = q.astype(np.float64) * float(scale.reshape(()))
+            elif f"{name}.idx" in keys:
+                idx = _read(archive, f"{name}.idx", kinds="iu")
+                val = _read(archive, f"{name}.val")
+                if idx.ndim != 1 or val.shape != idx.shape:
+                    raise DeltaError(f"{name}: sparse indices and values must be 1-D and the same length.")
+                if idx.size and (idx.min() < 0 or idx.max() >= size):
+                    raise DeltaError(f"{name}: sparse index out of range.")
+                delta = np.zeros(size)
+                delta[idx] = val.astype(np.float64)
+            else:
+                delta = np.zeros(size)
+            if delta.size != size:
+                raise DeltaError(f"{name}: delta has {delta.size} values, base has {size}.")
+            if not np.isfinite(delta).all():
+                raise DeltaError(f"{name}: delta has non-finite values.")
+            deltas[name] = delta.reshape(base[name].shape)
+    return deltas
+
+
+def apply_delta(base_estimator, data):
+    """Reconstruct the client's estimator from the base estimator and a delta archive."""
+    try:
+        base = extract_parameters(base_estimator)
+    except AggregationError as e:
+        raise DeltaError(str(e)) from None
+    deltas = decode_delta(data, base)
+    return build_estimator(base_estimator, {name: base[name] + deltas[name] for name in PARAMETERS})
@@ -0,0 +1,204 @@
+"""
+Server-side evaluation of client submissions on a held-out validation set.
+
+The metrics on a ClientModel are reported by the client; this scores each
+submission on data the central authority holds and stores the server's
+accuracy/precision/recall/F1 next to them (ClientModel.server_*).
+
+Validation sets are configured per inference model in EVALUATION_DATASETS.
+The held-out split is built once from the dataset's columnar store
+(api/datasets.py) and cached as .npy files under MEDIA_ROOT/<EVALUATION_CACHE_DIR>.
+Submissions are fanned out over a process pool of EVALUATION_WORKERS (0
+scores in-process). Each worker memory-maps the cached matrix read-only, so
+the split is built once and every worker shares its pages.
+
+Evaluation runs as a background job (api/jobs.py), queued when a client
+submits and by POST /central-models/<id>/evaluate/.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from . import safe_pickle
+from .datasets import dataset_spec, load_xy, source_digest, split_indices
+from .models import ClientModel
+from .pool import _init_worker
+from .registry import registry
+
+# Stored as ClientModel.server_<metric>.
+METRICS = ("accuracy", "precision", "recall", "f1_score")
+
+
+def dataset_for_domain(data_domain):
+    """Inference model name whose validation set scores `data_domain`, or None."""
+    name = registry.name_for_domain(data_domain)
+    return name if name in getattr(settings, "EVALUATION_DATASETS", {}) else None
+
+
+# ----- validation sets -----
+
+def build_validation_set(name):
+    """
+    The held-out (X, y) of dataset `name`: the rows of its spec's
+    train_test_split(test_size, random_state=seed) test side, so a model
+    trained on the rest of the file (as in the notebooks) is scored on rows it
+    never saw. Client partitions (api/datasets.py) leave these rows out.
+    """
+    X, y = load_xy(name)
+    _, validation = split_indices(name, len(y))
+    return np.ascontiguousarray(X[validation]), y[validation]
+
+
+def validation_set(name):
+    """Paths of the cached (X, y) .npy files of model `name`'s validation set, built on first use."""
+    digest = source_digest(dataset_spec(name))
+    directory = default_storage.path(getattr(settings, "EVALUATION_CACHE_DIR", "validation"))
+    x_path = os.path.join(directory, f"{name}-{digest}.X.npy")
+    y_path = os.path.join(directory, f"{name}-{digest}.y.npy")
+    if not (os.path.exists(x_path) and os.path.exists(y_path)):
+        X, y = build_validation_set(name)
+        os.makedirs(directory, exist_ok=True)
+        for path, array in ((x_path, X), (y_path, y)):
+            partial = f"{path}.{os.getpid()}.tmp"
+            with open(partial, "wb") as f:
+                np.save(f, array)
+            os.replace(partial, path)
+    return x_path, y_path
+
+
+# ----- scoring (pool workers or in-process) -----
+
+_arrays = {}
+
+
+def _mapped(path):
+    array = _arrays.get(path)
+    if array is None:
+        array = _arrays[path] = np.load(path, mmap_mode="r")
+    return array
+
+
+def metrics(y_true, y_pred):
+    from sklearn.metrics import accuracy_score, f1_score, precision_score, recall_score
+
+    return {
+        "accuracy": float(accuracy_score(y_true, y_pred)),
+        "precision": float(precision_score(y_true, y_pred, zero_division=0)),
+        "recall": float(recall_score(y_true, y_pred, zero_division=0)),
+        "f1_score": float(f1_score(y_true, y_pred, zero_division=0)),
+    }
+
+
+def evaluate_file(name, model_path, x_path, y_path):
+    """
+    Metrics of the pickled model at `model_path` on a cached validation set.
+    The file is a client upload, so it is read with the restricted unpickler.
+    """
+    from .inference import score
+    from .schemas import get_schema
+
+    with open(model_path, "rb") as f:
+        estimator = safe_pickle.load(f)
+    estimator = get_schema(name).bind(estimator)
+    labels, _ = score(estimator, _mapped(x_path))
+    return metrics(_mapped(y_path), labels)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def evaluation_executor():
+    """Process pool shared by evaluation jobs in this process, or None to score in-process."""
+    global _executor
+    workers = getattr(settings, "EVALUATION_WORKERS", 0)
+    if workers <= 0:
+        return None
+    with _executor_lock:
+        if _executor is None:
+            os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+            _executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                # Sets Django up before any task (and so this module) is unpickled.
+                initializer=_init_worker,
+                initargs=({"MEDIA_ROOT": settings.MEDIA_ROOT}, ()),
+            )
+    return _executor
+
+
+def shutdown_executor():
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(cancel_futures=True)
+
+
+# ----- submissions -----
+
+def evaluate_submissions(submissions, progress=None):
+    """
+    Score `submissions` (ClientModels) and store the server metrics on each.
+    Submissions whose domain has no validation set, or whose model cannot be
+    scored, are marked evaluated with an evaluation_error. `progress(done,
+    total)` is called as results arrive. Returns the number scored.
+    """
+    submissions = list(submissions)
+    sets = {}
+    tasks = []
+    for client_model in submissions:
+        name = dataset_for_domain(client_model.assignment.data_domain)
+        if name is None:
+            _store(client_model, error=f"No validation set for domain '{client_model.assignment.data_domain}'.")
+            continue
+        if name not in sets:
+            sets[name] = validation_set(name)
+        tasks.append((client_model, (name, client_model.model_file.path, *sets[name])))
+
+    executor = evaluation_executor()
+    if executor is None:
+        outcomes = ((client_model, _outcome(lambda: evaluate_file(*args))) for client_model, args in tasks)
+    else:
+        futures = {executor.submit(evaluate_file, *args): client_model for client_model, args in tasks}
+        outcomes = ((futures[f], _outcome(f.result)) for f in as_completed(futures))
+
+    scored = 0
+    for done, (client_model, (result, error)) in enumerate(outcomes, start=1):
+        _store(client_model, result, error)
+        scored += error is None
+        if progress is not None:
+            progress(done, len(tasks))
+    return scored
+
+
+def _outcome(call):
+    try:
+        return call(), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+
+def _store(client_model, result=None, error=None):
+    fields = {f"server_{metric}": (result or {}).get(metric) for metric in METRICS}
+    ClientModel.objects.filter(pk=client_model.pk).update(
+        evaluated_at=timezone.now(), evaluation_error=(error or "")[:255], **fields
+    )
+
+
+def pending_submissions(central_auth_id, iteration_name):
+    return (
+        ClientModel.objects.filter(
+            assignment__central_auth_id=central_auth_id,
+            assignment__iteration_name=iteration_name,
+            evaluated_at__isnull=True,
+        )
+        .select_related("assignment")
+        .order_by("id")
+    )
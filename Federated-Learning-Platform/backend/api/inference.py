@@ -0,0 +1,63 @@
+"""
+Vectorized scoring shared by the single-record and batch inference endpoints.
+
+Batch requests are encoded a chunk at a time, through the model's feature
+schema (schemas.py), into one feature matrix and scored with a single
+predict_proba pass; the predicted class is taken from the
+probabilities instead of a second predict call.
+"""
+import json
+import time
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+from .metrics import observe_inference
+from .schemas import get_schema
+
+
+def chunk_size():
+    return getattr(settings, "INFERENCE_BATCH_CHUNK_SIZE", 2048)
+
+
+def score(estimator, X):
+    """Return (predicted labels, positive-class probabilities) from one predict_proba pass."""
+    proba = np.asarray(estimator.predict_proba(X))
+    classes = np.asarray(getattr(estimator, "classes_", np.arange(proba.shape[1])))
+    return classes[proba.argmax(axis=1)], proba[:, 1]
+
+
+def iter_json_chunks(records, size=None):
+    size = size or chunk_size()
+    for start in range(0, len(records), size):
+        yield pd.DataFrame.from_records(records[start:start + size])
+
+
+def iter_csv_chunks(file, sep=",", size=None):
+    yield from pd.read_csv(file, sep=sep, dtype=str, chunksize=size or chunk_size())
+
+
+def stream_predictions(name, model, chunks):
+    """Yield one NDJSON line per input row, scoring each chunk with `model` (a LoadedModel) in a single pass."""
+    schema = get_schema(name)
+    row = 0
+    for frame in chunks:
+        encoded, invalid = schema.encode_frame(frame.reset_index(drop=True))
+        valid = ~invalid
+        labels = probabilities = ()
+        if valid.any():
+            started = time.perf_counter()
+            labels, probabilities = score(model.estimator, encoded[valid])
+            observe_inference(model, time.perf_counter() - started, len(labels))
+
+        lines = []
+        scored = iter(zip(labels, probabilities))
+        for is_invalid in invalid:
+            if is_invalid:
+                lines.append(json.dumps({"row": row, "error": "Non-numeric feature value."}))
+            else:
+                label, probability = next(scored)
+                lines.append(json.dumps({"row": row, name: int(label), "probability": float(probability)}))
+            row += 1
+        yield ("\n".join(lines) + "\n").encode()
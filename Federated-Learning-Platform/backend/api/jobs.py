@@ -0,0 +1,278 @@
+"""
+Background jobs, stored in the database and run by `manage.py run_jobs`.
+
+Views enqueue slow work (aggregation, evaluation, artifact conversion) as Job rows and
+answer 202 with the job's status URL (/jobs/<id>/) instead of holding a
+request thread. Any number of workers may run against the same database:
+
+    python manage.py run_jobs
+
+A worker claims the oldest due job with SELECT ... FOR UPDATE SKIP LOCKED, so
+concurrent workers never block on or double-claim a row. SQLite has no row
+locks; there the claim is a compare-and-swap UPDATE on the row's status and
+attempt count. A claim is a lease of JOB_LEASE_SECONDS, renewed by every
+progress report: a job whose worker died is claimed again once it expires.
+
+A failed attempt is retried after JOB_RETRY_BACKOFF seconds, doubling each
+time up to JOB_RETRY_BACKOFF_MAX, until the job's max_attempts is used up.
+Errors a task declares permanent (bad input) fail the job at once. A worker
+only records the outcome while it still holds the lease; one that overran it
+leaves the job to the worker that claimed it since.
+
+At most one job per key is queued at a time (a partial unique constraint), so
+concurrent enqueues of the same key agree on a single row.
+"""
+import logging
+import os
+import socket
+import traceback
+from contextlib import nullcontext
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .aggregation import AggregationError, aggregate_iteration
+from .artifacts import ArtifactError, convert_pickle
+from .datasets import DatasetError
+from .evaluation import dataset_for_domain, evaluate_submissions, pending_submissions
+from .models import CentralAuthModel, Job
+from .serializer import CentralAuthModelSerializer
+
+logger = logging.getLogger(__name__)
+
+# Unfinished states; a job key is unique among these.
+ACTIVE = (Job.QUEUED, Job.RUNNING)
+
+# Fields run() writes when an attempt ends.
+OUTCOME_FIELDS = (
+    "status", "result", "error", "progress", "message", "run_after", "locked_by", "locked_at", "finished_at",
+)
+
+
+class Task:
+    def __init__(self, kind, func, permanent=()):
+        self.kind = kind
+        self.func = func
+        self.permanent = permanent
+
+
+TASKS = {}
+
+
+def task(kind, permanent=()):
+    """
+    Register `func(job, **payload)` as the handler of `kind` jobs. Its return
+    value (JSON-serialisable) is stored as the job's result; exceptions of the
+    `permanent` types fail the job without a retry.
+    """
+    def decorator(func):
+        TASKS[kind] = Task(kind, func, tuple(permanent))
+        return func
+    return decorator
+
+
+def enqueue(kind, payload=None, key="", delay=0, max_attempts=None, dedupe=ACTIVE):
+    """
+    Queue a `kind` job and return it. With a `key`, a job with the same key in
+    one of the `dedupe` states is returned instead of queueing a duplicate.
+    """
+    if kind not in TASKS:
+        raise KeyError(f"No task registered for {kind!r}.")
+    while True:
+        if key:
+            existing = Job.objects.filter(key=key, status__in=dedupe).first()
+            if existing is not None:
+                return existing
+        try:
+            # In a transaction, a savepoint keeps a conflict from aborting it; in
+            # autocommit (on_commit callbacks) the INSERT is its own transaction.
+            with transaction.atomic() if connection.in_atomic_block else nullcontext():
+                return Job.objects.create(
+                    kind=kind,
+                    payload=payload or {},
+                    key=key,
+                    run_after=timezone.now() + timedelta(seconds=delay),
+                    max_attempts=max_attempts or getattr(settings, "JOB_MAX_ATTEMPTS", 5),
+                )
+        except IntegrityError:
+            # Another enqueue queued this key first; it is returned on the next pass
+            # (or, if a worker claimed it meanwhile, a new job is queued).
+            if not key or Job.QUEUED not in dedupe:
+                raise
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _claimable(now):
+    expired = now - timedelta(seconds=getattr(settings, "JOB_LEASE_SECONDS", 600))
+    return Q(status=Job.QUEUED, run_after__lte=now) | Q(status=Job.RUNNING, locked_at__lt=expired)
+
+
+def claim(worker):
+    """Lease the oldest due job to `worker` and return it, or None if none is due."""
+    now = timezone.now()
+    due = Job.objects.filter(_claimable(now)).order_by("run_after", "created_at")
+    claimed = {
+        "status": Job.RUNNING,
+        "locked_by": worker,
+        "locked_at": now,
+    }
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            job = due.select_for_update(skip_locked=True).first()
+            if job is None:
+                return None
+            for field, value in claimed.items():
+                setattr(job, field, value)
+            job.attempts += 1
+            job.save(update_fields=[*claimed, "attempts"])
+            return job
+
+    # No row locks (SQLite): the UPDATE only wins if nobody claimed the row first.
+    for job in due[:10]:
+        won = Job.objects.filter(pk=job.pk, status=job.status, attempts=job.attempts).update(
+            attempts=job.attempts + 1, **claimed
+        )
+        if won:
+            job.refresh_from_db()
+            return job
+    return None
+
+
+def report(job, progress, message=""):
+    """Record a running job's progress (0..1) and renew its lease."""
+    job.progress = progress
+    job.message = message[:255]
+    job.locked_at = timezone.now()
+    Job.objects.filter(pk=job.pk, locked_by=job.locked_by).update(
+        progress=job.progress, message=job.message, locked_at=job.locked_at
+    )
+
+
+def backoff(attempts):
+    """Seconds to wait before retrying after the `attempts`-th failed attempt."""
+    base = getattr(settings, "JOB_RETRY_BACKOFF", 5)
+    return min(base * 2 ** (attempts - 1), getattr(settings, "JOB_RETRY_BACKOFF_MAX", 300))
+
+
+def run(job):
+    """Run a claimed job to success, retry or failure."""
+    spec = TASKS.get(job.kind)
+    try:
+        if spec is None:
+            raise KeyError(f"No task registered for {job.kind!r}.")
+        result = spec.func(job, **job.payload)
+    except Exception as e:
+        retry = spec is not None and not isinstance(e, spec.permanent) and job.attempts < job.max_attempts
+        job.error = "".join(traceback.format_exception_only(e)).strip()
+        if retry:
+            job.status = Job.QUEUED
+            job.run_after = timezone.now() + timedelta(seconds=backoff(job.attempts))
+            logger.warning("Job %s (%s) attempt %d failed, retrying: %s", job.id, job.kind, job.attempts, job.error)
+        else:
+            job.status = Job.FAILED
+            job.finished_at = timezone.now()
+            job.message = str(e)[:255]
+            logger.error("Job %s (%s) failed: %s", job.id, job.kind, job.error)
+    else:
+        job.status = Job.SUCCEEDED
+        job.result = result
+        job.error = ""
+        job.progress = 1
+        job.finished_at = timezone.now()
+    if not _finish(job):
+        logger.warning("Job %s (%s) lost its lease to another worker; outcome not recorded", job.id, job.kind)
+    return job
+
+
+def _finish(job):
+    """Store a run's outcome if `job.locked_by` still holds the lease; False if it was lost."""
+    mine = Job.objects.filter(pk=job.pk, locked_by=job.locked_by, attempts=job.attempts)
+    job.locked_by = ""
+    job.locked_at = None
+    try:
+        with transaction.atomic():
+            return bool(mine.update(**{field: getattr(job, field) for field in OUTCOME_FIELDS}))
+    except IntegrityError:
+        # Requeued for a retry, but a newer job with the same key is already queued and covers it.
+        job.status = Job.FAILED
+        job.finished_at = timezone.now()
+        job.message = "Superseded by a queued job with the same key"
+        return bool(mine.update(**{field: getattr(job, field) for field in OUTCOME_FIELDS}))
+
+
+def run_pending(worker=None, limit=None):
+    """Claim and run due jobs until none is left (or `limit` ran); returns how many ran."""
+    worker = worker or default_worker_id()
+    ran = 0
+    while limit is None or ran < limit:
+        job = claim(worker)
+        if job is None:
+            break
+        run(job)
+        ran += 1
+    return ran
+
+
+# ----- tasks -----
+
+@task("aggregate_iteration", permanent=(AggregationError, CentralAuthModel.DoesNotExist))
+def aggregate(job, iteration_id):
+    iteration = CentralAuthModel.objects.select_related("central_auth").get(id=iteration_id)
+    report(job, 0.1, "Averaging client submissions")
+    global_model = aggregate_iteration(iteration)
+    report(job, 0.9, f"Stored version {global_model.version}")
+    enqueue_conversion(global_model)
+    return CentralAuthModelSerializer(global_model).data
+
+
+@task("convert_model", permanent=(FileNotFoundError,))
+def convert_model(job, name):
+    """Write the memory-mapped artifact of a stored model so inference never converts on first use."""
+    try:
+        return {"artifact": convert_pickle(default_storage.path(name))}
+    except ArtifactError as e:
+        return {"artifact": None, "skipped": str(e)}  # served from the pickle
+
+
+def enqueue_conversion(model):
+    """Queue artifact conversion of a CentralAuthModel/ClientModel file once it is committed."""
+    if not getattr(settings, "INFERENCE_USE_ARTIFACTS", True) or not model.model_file:
+        return
+    name = model.model_file.name
+    transaction.on_commit(lambda: enqueue("convert_model", {"name": name}, key=f"convert_model:{name}"))
+
+
+@task("evaluate_submissions", permanent=(DatasetError,))
+def evaluate(job, central_auth_id, iteration_name):
+    """Score the iteration's not yet evaluated submissions on the server's validation set."""
+    def progress(done, total):
+        report(job, done / total, f"Evaluated {done} of {total} submissions")
+
+    scored = evaluate_submissions(pending_submissions(central_auth_id, iteration_name), progress)
+    return {"evaluated": scored}
+
+
+def enqueue_evaluation(central_auth_id, iteration_name):
+    """
+    Queue evaluation of an iteration's pending submissions. A job that is
+    already running may have missed the new rows, so only a queued one is reused.
+    """
+    return enqueue(
+        "evaluate_submissions", {"central_auth_id": central_auth_id, "iteration_name": iteration_name},
+        key=f"evaluate_submissions:{central_auth_id}:{iteration_name}", dedupe=(Job.QUEUED,),
+    )
+
+
+def evaluate_on_commit(client_model):
+    """Queue evaluation of a new submission once it is committed, if its domain has a validation set."""
+    assignment = client_model.assignment
+    if dataset_for_domain(assignment.data_domain) is not None:
+        transaction.on_commit(lambda: enqueue_evaluation(assignment.central_auth_id, assignment.iteration_name))
@@ -0,0 +1,75 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from api import views
+from api.models import UserProfile, CentralAuthModel, CentralClientAssignment
+
+
+class Command(BaseCommand):
+    help = (
+        "Time current_client_iterations and client_dashboard_data while a client's "
+        "assignment history grows. Runs in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="10,100,1000", help="Comma-separated history sizes.")
+        parser.add_argument("--repeat", type=int, default=50, help="Requests timed per endpoint and size.")
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(s) for s in options["sizes"].split(","))
+        factory = RequestFactory()
+        endpoints = {
+            "current_client_iterations": views.current_client_iterations,
+            "client_dashboard_data": views.client_dashboard_data,
+        }
+
+        self.stdout.write(f"{'endpoint':<28}{'history':>8}{'queries':>9}{'p50 ms':>9}{'p95 ms':>9}")
+        with transaction.atomic():
+            central = UserProfile.objects.create(email="bench-central@example.invalid", password="!", role="central")
+            client = UserProfile.objects.create(email="bench-client@example.invalid", password="!", role="client")
+            created = 0
+            for size in sizes:
+                self._grow_history(central, client, created, size)
+                created = size
+                for name, view in endpoints.items():
+                    queries, timings, data = self._time(view, factory, client.email, options["repeat"])
+                    if name == "current_client_iterations" and len(data) != 1:
+                        raise CommandError(f"Expected one running round, the endpoint returned {len(data)}.")
+                    p50 = statistics.median(timings)
+                    p95 = statistics.quantiles(timings, n=20)[-1] if len(timings) > 1 else p50
+                    self.stdout.write(f"{name:<28}{size:>8}{queries:>9}{p50:>9.2f}{p95:>9.2f}")
+            transaction.set_rollback(True)
+
+    def _grow_history(self, central, client, start, end):
+        # Every past round is finalized; the newest one is still running.
+        CentralAuthModel.objects.filter(central_auth=central, version__gt=0).update(version=0)
+        iterations = CentralAuthModel.objects.bulk_create(
+            CentralAuthModel(
+                central_auth=central, iteration_name=f"bench-round-{i}", model_name="bench",
+                model_file="central_models/bench.pkl", version=1 if i == end - 1 else 0,
+            )
+            for i in range(start, end)
+        )
+        # Linked through the iteration FK, which the client endpoints join on.
+        CentralClientAssignment.objects.bulk_create(
+            CentralClientAssignment(
+                client=client, central_auth=central, data_domain="bench",
+                model_name="bench", iteration_name=iteration.iteration_name, iteration=iteration,
+            )
+            for iteration in iterations
+        )
+
+    def _time(self, view, factory, email, repeat):
+        timings = []
+        for _ in range(repeat):
+            request = factory.get("/")
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = view(request, email=email).render()
+                timings.append(1000 * (time.perf_counter() - started))
+        return len(queries), timings, response.data
@@ -0,0 +1,39 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.artifacts import ArtifactError, convert_pickle
+from api.models import CentralAuthModel, ClientModel
+
+
+class Command(BaseCommand):
+    help = (
+        "Convert pickled models (bundled inference models, central and client models) "
+        "into memory-mappable artifacts so workers do not convert on first use."
+    )
+
+    def handle(self, *args, **options):
+        paths = [str(spec["fallback"]) for spec in settings.INFERENCE_MODELS.values()]
+        for model in (CentralAuthModel, ClientModel):
+            for row in model.objects.exclude(model_file="").only("model_file").iterator():
+                paths.append(row.model_file.path)
+
+        converted = skipped = 0
+        for path in dict.fromkeys(paths):
+            if not os.path.exists(path):
+                self.stderr.write(f"missing  {path}")
+                continue
+            try:
+                directory = convert_pickle(path)
+            except ArtifactError as e:
+                skipped += 1
+                self.stdout.write(f"skipped  {path}: {e}")
+            except Exception as e:  # unpicklable or needs a library not installed here
+                skipped += 1
+                self.stdout.write(f"skipped  {path}: {type(e).__name__}: {e}")
+            else:
+                converted += 1
+                self.stdout.write(f"ok       {path} -> {directory}")
+
+        self.stdout.write(self.style.SUCCESS(f"{converted} converted, {skipped} left as pickles."))
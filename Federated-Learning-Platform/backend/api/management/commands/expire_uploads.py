@@ -0,0 +1,26 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.uploads import expire_sessions
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete chunked uploads left uncommitted for longer than UPLOAD_SESSION_MAX_AGE, "
+        "with their partial files, and partial files no open upload owns."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Report what would be deleted.")
+
+    def handle(self, *args, **options):
+        dry_run = options["dry_run"]
+        sessions, orphans = expire_sessions(dry_run=dry_run)
+        for session in sessions:
+            self.stdout.write(f"expire upload {session.id} ({session.bytes_received} bytes)")
+        for path in orphans:
+            self.stdout.write(f"delete orphan {os.path.relpath(path, settings.MEDIA_ROOT)}")
+        verb = "Would expire" if dry_run else "Expired"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {len(sessions)} uploads and {len(orphans)} orphan files."))
@@ -0,0 +1,82 @@
+import os
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from api.models import Blob, CentralAuthModel, ClientModel
+from api.storage import BLOB_DIR
+
+
+class Command(BaseCommand):
+    help = "Delete model blobs that no CentralAuthModel or ClientModel row references."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Report what would be deleted.")
+        parser.add_argument(
+            "--recount", action="store_true",
+            help="Recompute every ref_count from the model rows before collecting.",
+        )
+        parser.add_argument(
+            "--grace-seconds", type=int, default=None,
+            help="Keep unreferenced blobs younger than this (default BLOB_GC_GRACE_SECONDS).",
+        )
+
+    def handle(self, *args, **options):
+        grace = options["grace_seconds"]
+        if grace is None:
+            grace = getattr(settings, "BLOB_GC_GRACE_SECONDS", 3600)
+        cutoff = timezone.now() - timedelta(seconds=grace)
+        dry_run = options["dry_run"]
+
+        if options["recount"]:
+            self._recount(dry_run)
+
+        freed = 0
+        collectable = Blob.objects.filter(ref_count__lte=0, stored_at__lt=cutoff)
+        for blob in list(collectable):
+            if not dry_run:
+                # Re-checked under the row lock that storing the same bytes takes,
+                # so a blob referenced or stored again since the query is kept.
+                with transaction.atomic():
+                    if not collectable.filter(pk=blob.pk).select_for_update():
+                        continue
+                    Blob.objects.filter(pk=blob.pk).delete()
+                    default_storage.delete(blob.name)
+            freed += blob.size
+            self.stdout.write(f"delete {blob.name}")
+
+        # Files without a Blob row, e.g. left by a crash between write and insert
+        known = set(Blob.objects.values_list("name", flat=True))
+        root = default_storage.path(BLOB_DIR)
+        for directory, _, files in os.walk(root):
+            for filename in files:
+                path = os.path.join(directory, filename)
+                name = os.path.relpath(path, settings.MEDIA_ROOT).replace(os.sep, "/")
+                if name in known or os.path.getmtime(path) > time.time() - grace:
+                    continue
+                freed += os.path.getsize(path)
+                self.stdout.write(f"delete orphan {name}")
+                if not dry_run:
+                    os.remove(path)
+
+        verb = "Would free" if dry_run else "Freed"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {freed} bytes."))
+
+    def _recount(self, dry_run):
+        counts = Counter()
+        for model in (CentralAuthModel, ClientModel):
+            for row in model.objects.values("model_file").annotate(n=Count("id")):
+                counts[row["model_file"]] += row["n"]
+
+        for blob in Blob.objects.all():
+            if blob.ref_count != counts[blob.name]:
+                self.stdout.write(f"recount {blob.name}: {blob.ref_count} -> {counts[blob.name]}")
+                if not dry_run:
+                    Blob.objects.filter(pk=blob.pk).update(ref_count=counts[blob.name])
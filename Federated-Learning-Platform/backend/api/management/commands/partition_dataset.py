@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.datasets import SCHEMES, DatasetError, convert, open_shard, partition, write_parquet
+
+
+class Command(BaseCommand):
+    help = (
+        "Convert a reference dataset (EVALUATION_DATASETS) to columnar .npy files and shard "
+        "its training rows into memory-mappable client partitions."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("dataset", help="Dataset name, e.g. heartdisease.")
+        parser.add_argument("--clients", type=int, default=10, help="Number of client shards.")
+        parser.add_argument("--scheme", choices=SCHEMES, default="iid")
+        parser.add_argument(
+            "--alpha", type=float, default=0.5,
+            help="Dirichlet concentration for --scheme dirichlet; smaller is more label skew.",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--min-size", type=int, default=1, help="Fewest rows any client may get.")
+        parser.add_argument(
+            "--include-validation", action="store_true",
+            help="Also hand out the rows of the server's validation split.",
+        )
+        parser.add_argument("--parquet", action="store_true", help="Also export the dataset as Parquet.")
+
+    def handle(self, *args, **options):
+        name = options["dataset"]
+        try:
+            self.stdout.write(f"columns  {convert(name)}")
+            if options["parquet"]:
+                self.stdout.write(f"parquet  {write_parquet(name)}")
+            directory = partition(
+                name,
+                options["clients"],
+                scheme=options["scheme"],
+                alpha=options["alpha"],
+                seed=options["seed"],
+                min_size=options["min_size"],
+                include_validation=options["include_validation"],
+            )
+        except DatasetError as e:
+            raise CommandError(str(e))
+
+        for client in range(options["clients"]):
+            X, y = open_shard(directory, client)
+            labels = ", ".join(f"{label}: {int((y == label).sum())}" for label in sorted(set(y.tolist())))
+            self.stdout.write(f"client {client:>3}  {len(y):>7} rows  {{{labels}}}")
+        self.stdout.write(self.style.SUCCESS(f"Partition written to {directory}"))
@@ -0,0 +1,53 @@
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.jobs import claim, default_worker_id, run
+
+
+class Command(BaseCommand):
+    help = (
+        "Run queued background jobs (aggregation, evaluation, model conversion). Start "
+        "as many workers as needed; each claims jobs without blocking the others."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Run the jobs that are due, then exit.")
+        parser.add_argument("--max-jobs", type=int, default=None, help="Exit after running this many jobs.")
+        parser.add_argument(
+            "--poll-interval", type=float, default=None,
+            help="Seconds to sleep when no job is due (default JOB_POLL_INTERVAL).",
+        )
+        parser.add_argument("--worker-id", default=None, help="Name recorded on claimed jobs (default host:pid).")
+
+    def handle(self, *args, **options):
+        worker = options["worker_id"] or default_worker_id()
+        interval = options["poll_interval"]
+        if interval is None:
+            interval = getattr(settings, "JOB_POLL_INTERVAL", 1)
+        max_jobs = options["max_jobs"]
+
+        # Finish the running job on SIGTERM/SIGINT, then exit.
+        self._stopping = False
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, self._stop)
+
+        self.stdout.write(f"Worker {worker} started.")
+        ran = 0
+        while not self._stopping and (max_jobs is None or ran < max_jobs):
+            job = claim(worker)
+            if job is None:
+                if options["once"]:
+                    break
+                time.sleep(interval)
+                continue
+            job = run(job)
+            ran += 1
+            self.stdout.write(f"{job.status:<9} {job.kind} {job.id} (attempt {job.attempts})")
+
+        self.stdout.write(self.style.SUCCESS(f"Worker {worker} ran {ran} jobs."))
+
+    def _stop(self, signum, frame):
+        self._stopping = True
@@ -0,0 +1,86 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.simulation import ENDPOINTS, TRANSPORTS, RoundSimulator, compare, load_baselines, save_baseline
+
+
+class Command(BaseCommand):
+    help = (
+        "Simulate a federated round of N clients through the real endpoints (assign, poll, "
+        "submit, list submissions) and report latency, SQL queries and peak RSS. Fails when "
+        "the run regresses against the stored baseline of the same scenario."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clients", type=int, default=50)
+        parser.add_argument("--concurrency", type=int, default=8, help="Clients in flight at once.")
+        parser.add_argument(
+            "--transport", choices=TRANSPORTS, default="wsgi",
+            help="Django test client (threads) or async client through the ASGI handler.",
+        )
+        parser.add_argument("--train", action="store_true", help="Fit client models on partition shards.")
+        parser.add_argument("--domain", default="heartdisease")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--baselines", default=None,
+            help="Baseline file (default SIMULATION_BASELINES); runs are compared by scenario.",
+        )
+        parser.add_argument("--save-baseline", action="store_true", help="Store this run as its scenario's baseline.")
+        parser.add_argument(
+            "--tolerance", type=float, default=None,
+            help="Allowed latency/time/RSS increase as a fraction (default SIMULATION_TOLERANCE).",
+        )
+        parser.add_argument("--json", action="store_true", help="Print the report as JSON.")
+
+    def handle(self, *args, **options):
+        simulator = RoundSimulator(
+            options["clients"],
+            concurrency=options["concurrency"],
+            transport=options["transport"],
+            train=options["train"],
+            domain=options["domain"],
+            seed=options["seed"],
+        )
+        report = simulator.run()
+
+        if options["json"]:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self._print(report)
+
+        path = options["baselines"] or getattr(settings, "SIMULATION_BASELINES", None)
+        if options["save_baseline"]:
+            if not path:
+                raise CommandError("No baseline file; pass --baselines.")
+            save_baseline(path, report)
+            self.stdout.write(self.style.SUCCESS(f"Saved baseline {report['scenario']} to {path}"))
+            return
+
+        baseline = load_baselines(path).get(report["scenario"]) if path else None
+        tolerance = options["tolerance"]
+        if tolerance is None:
+            tolerance = getattr(settings, "SIMULATION_TOLERANCE", 0.5)
+        problems = compare(report, baseline or {}, tolerance)
+        if problems:
+            raise CommandError("Regressions:\n  " + "\n  ".join(problems))
+        if baseline is None:
+            self.stdout.write(f"No baseline for {report['scenario']}; run with --save-baseline to store one.")
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Within baseline {report['scenario']}."))
+
+    def _print(self, report):
+        self.stdout.write(
+            f"{report['scenario']}: {report['clients']} clients, round {report['wall_clock_s']:.2f} s, "
+            f"peak RSS {report['peak_rss_mb']:.0f} MB"
+        )
+        self.stdout.write(
+            f"{'endpoint':<32}{'requests':>9}{'errors':>7}{'queries':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+        )
+        for name in ENDPOINTS:
+            stats = report["endpoints"][name]
+            self.stdout.write(
+                f"{name:<32}{stats['requests']:>9}{stats['errors']:>7}{stats['max_queries']:>8}"
+                f"{stats['p50_ms']:>9.2f}{stats['p95_ms']:>9.2f}{stats['p99_ms']:>9.2f}"
+            )
@@ -0,0 +1,297 @@
+"""
+Request and inference metrics, exposed in the Prometheus text format at /metrics.
+
+RequestMetricsMiddleware records, per resolved URL name (the view's dotted
+path for unnamed routes, "unresolved" for 404s):
+
+    http_request_duration_seconds   latency histogram, by view and method
+    http_requests_total             requests by view, method and status code
+    http_request_db_queries         SQL statements per request
+    http_request_db_seconds         time spent in SQL per request
+    http_response_size_bytes        body size (streamed bodies once fully sent)
+
+and the inference paths (api/batching.py, api/pool.py, api/inference.py) add
+inference_seconds / inference_rows_total per model and version (the
+CentralAuthModel id served, or "bundled" for the file in pkl files).
+
+SQL is measured by an execute wrapper on every connection, attributed to the
+request through a context variable, so queries run by async views through
+sync_to_async land on the request that made them.
+
+Metrics live in process memory: each server process exposes its own, and a
+multi-process server should be scraped per worker.
+"""
+import contextvars
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+INFERENCE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for labels, value in sorted(values.items()):
+            yield f"{self.name}{_labels(self.labels, labels)} {_number(value)}"
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.bounds = tuple(buckets) + (float("inf"),)
+        # labels -> [per-bucket counts, sum, count]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.bounds), 0.0, 0]
+            for i, bound in enumerate(self.bounds):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def count(self, *labels):
+        series = self._series.get(labels)
+        return series[2] if series else 0
+
+    def samples(self):
+        with self._lock:
+            series = {labels: (list(counts), total, n) for labels, (counts, total, n) in self._series.items()}
+        for labels, (counts, total, n) in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.bounds, counts):
+                cumulative += count
+                le = _labels(self.labels, labels, [("le", _number(bound))])
+                yield f"{self.name}_bucket{le} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labels, labels)} {_number(total)}"
+            yield f"{self.name}_count{_labels(self.labels, labels)} {n}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, labels=()):
+        return self.register(Counter(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+request_duration = metrics.histogram(
+    "http_request_duration_seconds", "Time to the response, by resolved URL name.", ("view", "method"),
+)
+requests_total = metrics.counter(
+    "http_requests_total", "Requests by resolved URL name and status code.", ("view", "method", "status"),
+)
+request_queries = metrics.histogram(
+    "http_request_db_queries", "SQL statements run per request.", ("view",), QUERY_BUCKETS,
+)
+request_db_seconds = metrics.histogram(
+    "http_request_db_seconds", "Time spent in SQL per request.", ("view",),
+)
+response_bytes = metrics.histogram(
+    "http_response_size_bytes", "Response body size.", ("view",), SIZE_BUCKETS,
+)
+inference_seconds = metrics.histogram(
+    "inference_seconds", "Time to score one batch of rows, by model version.", ("model", "version"),
+    INFERENCE_BUCKETS,
+)
+inference_rows = metrics.counter(
+    "inference_rows_total", "Rows scored, by model version.", ("model", "version"),
+)
+
+
+def observe_inference(model, seconds, rows):
+    """Record a scoring pass of `rows` rows by `model` (a LoadedModel)."""
+    version = "bundled" if model.iteration_id is None else str(model.iteration_id)
+    inference_seconds.observe(seconds, model.name, version)
+    inference_rows.inc(model.name, version, amount=rows)
+
+
+# ----- SQL attribution -----
+
+class _QueryStats:
+    __slots__ = ("count", "seconds")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+
+_request_queries = contextvars.ContextVar("request_queries", default=None)
+
+
+def _time_query(execute, sql, params, many, context):
+    stats = _request_queries.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.count += 1
+        stats.seconds += time.perf_counter() - started
+
+
+def instrument_connection(sender=None, connection=None, **kwargs):
+    if _time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_time_query)
+
+
+def instrument_connections():
+    """Time SQL on every connection, open or opened later."""
+    connection_created.connect(instrument_connection)
+    for connection in connections.all(initialized_only=True):
+        instrument_connection(connection=connection)
+
+
+# ----- middleware -----
+
+def _view_name(request):
+    match = getattr(request, "resolver_match", None)
+    return match.view_name if match is not None else "unresolved"
+
+
+class RequestMetricsMiddleware:
+    """Latency, SQL and response size of every request, labelled by URL name."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, "METRICS_ENABLED", True)
+        if self.enabled:
+            instrument_connections()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.enabled:
+            return self.get_response(request)
+        stats = _QueryStats()
+        token = _request_queries.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_queries.reset(token)
+        self._record(request, response, started, stats)
+        return response
+
+    async def __acall__(self, request):
+        if not self.enabled:
+            return await self.get_response(request)
+        stats = _QueryStats()
+        token = _request_queries.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_queries.reset(token)
+        self._record(request, response, started, stats)
+        return response
+
+    def _record(self, request, response, started, stats):
+        view = _view_name(request)
+        request_duration.observe(time.perf_counter() - started, view, request.method)
+        requests_total.inc(view, request.method, str(response.status_code))
+        request_queries.observe(stats.count, view)
+        request_db_seconds.observe(stats.seconds, view)
+        if not response.streaming:
+            response_bytes.observe(len(response.content), view)
+        elif response.is_async:
+            response.streaming_content = _acounted(response.streaming_content, view)
+        else:
+            response.streaming_content = _counted(response.streaming_content, view)
+
+
+def _counted(chunks, view):
+    size = 0
+    try:
+        for chunk in chunks:
+            size += len(chunk)
+            yield chunk
+    finally:
+        response_bytes.observe(size, view)
+
+
+async def _acounted(chunks, view):
+    size = 0
+    try:
+        async for chunk in chunks:
+            size += len(chunk)
+            yield chunk
+    finally:
+        response_bytes.observe(size, view)
+
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_alter_centralclientassignment_unique_together'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='clientmodel',
+            name='num_samples',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
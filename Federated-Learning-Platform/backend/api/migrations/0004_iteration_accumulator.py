@@ -0,0 +1,36 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_clientmodel_num_samples'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IterationAccumulator',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('iteration_name', models.CharField(max_length=255, unique=True)),
+                ('weighted_sum', models.BinaryField(default=b'')),
+                ('total_weight', models.FloatField(default=0)),
+                ('template', models.BinaryField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AccumulatorContribution',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weight', models.FloatField()),
+                ('parameters', models.BinaryField()),
+                ('assignment', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to='api.centralclientassignment')),
+                ('client_model', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.clientmodel')),
+                ('accumulator', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='contributions', to='api.iterationaccumulator')),
+            ],
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def link_assignments(apps, schema_editor):
+    """Point every assignment at the newest row of its iteration, matched by iteration_name."""
+    CentralAuthModel = apps.get_model('api', 'CentralAuthModel')
+    CentralClientAssignment = apps.get_model('api', 'CentralClientAssignment')
+
+    newest = CentralAuthModel.objects.filter(iteration_name=OuterRef('iteration_name')).order_by('-created_at', '-id')
+    same_auth = newest.filter(central_auth=OuterRef('central_auth'))
+    CentralClientAssignment.objects.update(
+        iteration=Coalesce(Subquery(same_auth.values('id')[:1]), Subquery(newest.values('id')[:1]))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_iteration_accumulator'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='centralclientassignment',
+            name='iteration',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='assignments', to='api.centralauthmodel'),
+        ),
+        migrations.RunPython(link_assignments, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='centralauthmodel',
+            index=models.Index(fields=['iteration_name', 'version'], name='api_central_iterati_1cd02b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='centralclientassignment',
+            index=models.Index(fields=['client', 'iteration'], name='api_central_client__def418_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='clientmodel',
+            index=models.Index(fields=['assignment', 'created_at'], name='api_clientm_assignm_a40108_idx'),
+        ),
+    ]
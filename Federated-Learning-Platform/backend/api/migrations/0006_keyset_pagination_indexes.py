@@ -0,0 +1,25 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_assignment_iteration_fk'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='centralauthmodel',
+            index=models.Index(fields=['central_auth', 'created_at', 'id'], name='api_central_central_9ca42b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='centralclientassignment',
+            index=models.Index(fields=['central_auth', 'assigned_at', 'id'], name='api_central_central_fe16bc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(fields=['role', 'created_at', 'id'], name='api_userpro_role_fc9b96_idx'),
+        ),
+    ]
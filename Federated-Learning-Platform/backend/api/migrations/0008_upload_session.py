@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-18 12:06
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_userprofile_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadSession',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('central', 'Central model'), ('client', 'Client model')], max_length=20)),
+                ('filename', models.CharField(max_length=255)),
+                ('expected_size', models.BigIntegerField(blank=True, null=True)),
+                ('expected_sha256', models.CharField(blank=True, max_length=64)),
+                ('next_chunk', models.PositiveIntegerField(default=0)),
+                ('bytes_received', models.BigIntegerField(default=0)),
+                ('sha256', models.CharField(blank=True, max_length=64)),
+                ('committed', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
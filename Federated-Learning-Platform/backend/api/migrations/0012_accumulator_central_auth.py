@@ -0,0 +1,74 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:05
+
+import io
+
+import django.db.models.deletion
+import numpy as np
+from django.db import migrations, models
+
+
+def _unpack(data):
+    if not data:
+        return {}
+    with np.load(io.BytesIO(bytes(data))) as archive:
+        return {name: archive[name] for name in archive.files}
+
+
+def _pack(parameters):
+    buffer = io.BytesIO()
+    np.savez(buffer, **parameters)
+    return buffer.getvalue()
+
+
+def split_by_central(apps, schema_editor):
+    """
+    Give each accumulator its central authority. One that collected the
+    contributions of several centrals (same round name) is split into one per
+    central, its sums recomputed from the stored contributions. Accumulators
+    with no contributions are dropped; aggregation rebuilds a missing one.
+    """
+    IterationAccumulator = apps.get_model('api', 'IterationAccumulator')
+    AccumulatorContribution = apps.get_model('api', 'AccumulatorContribution')
+
+    for accumulator in IterationAccumulator.objects.all():
+        groups = {}
+        for contribution in AccumulatorContribution.objects.filter(accumulator=accumulator).select_related('assignment'):
+            groups.setdefault(contribution.assignment.central_auth_id, []).append(contribution)
+        if not groups:
+            accumulator.delete()
+            continue
+
+        for i, (central_auth_id, contributions) in enumerate(groups.items()):
+            target = accumulator if i == 0 else IterationAccumulator(
+                iteration_name=accumulator.iteration_name, template=accumulator.template
+            )
+            sums = {}
+            for contribution in contributions:
+                for name, value in _unpack(contribution.parameters).items():
+                    sums[name] = sums.get(name, 0) + contribution.weight * value
+            target.central_auth_id = central_auth_id
+            target.weighted_sum = _pack(sums)
+            target.total_weight = sum(c.weight for c in contributions)
+            target.save()
+            AccumulatorContribution.objects.filter(pk__in=[c.pk for c in contributions]).update(accumulator=target)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_clientmodel_server_metrics'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='iterationaccumulator',
+            name='central_auth',
+            field=models.ForeignKey(null=True, limit_choices_to={'role': 'central'}, on_delete=django.db.models.deletion.CASCADE, related_name='accumulators', to='api.userprofile'),
+        ),
+        migrations.AlterField(
+            model_name='iterationaccumulator',
+            name='iteration_name',
+            field=models.CharField(max_length=255),
+        ),
+        migrations.RunPython(split_by_central, migrations.RunPython.noop),
+    ]
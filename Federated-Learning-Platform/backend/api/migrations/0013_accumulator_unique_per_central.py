@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_accumulator_central_auth'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='iterationaccumulator',
+            name='central_auth',
+            field=models.ForeignKey(limit_choices_to={'role': 'central'}, on_delete=django.db.models.deletion.CASCADE, related_name='accumulators', to='api.userprofile'),
+        ),
+        migrations.AddConstraint(
+            model_name='iterationaccumulator',
+            constraint=models.UniqueConstraint(fields=('central_auth', 'iteration_name'), name='unique_accumulator_per_iteration'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+from django.db import migrations
+
+
+# search_clients' icontains arm compiles to UPPER(col::text) LIKE UPPER('%x%'),
+# which the raw-column indexes of 0007 cannot serve; these index that expression.
+UPPER_TRIGRAM_INDEXES = {
+    'api_userprofile_email_upper_trgm': 'email',
+    'api_userprofile_hospital_upper_trgm': 'hospital',
+}
+
+
+def create_upper_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, column in UPPER_TRIGRAM_INDEXES.items():
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON api_userprofile USING gin ((UPPER({column}::text)) gin_trgm_ops)'
+        )
+
+
+def drop_upper_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name in UPPER_TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_accumulator_unique_per_central'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_upper_trigram_indexes, drop_upper_trigram_indexes),
+    ]
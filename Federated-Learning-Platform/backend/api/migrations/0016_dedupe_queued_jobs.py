@@ -0,0 +1,27 @@
+from django.db import migrations
+from django.utils import timezone
+
+
+def fail_duplicates(apps, schema_editor):
+    """Keep the oldest queued job of each key; the unique constraint that follows allows only one."""
+    Job = apps.get_model('api', 'Job')
+    kept = set()
+    for job in Job.objects.filter(status='queued').exclude(key='').order_by('created_at', 'id'):
+        if job.key not in kept:
+            kept.add(job.key)
+            continue
+        job.status = 'failed'
+        job.message = 'Duplicate of a queued job with the same key'
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'message', 'finished_at'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_blob_stored_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(fail_duplicates, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,8 @@
+import uuid
+
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.utils import timezone
 from django.contrib import admin
 
 class UserProfile(models.Model):
@@ -11,6 +15,11 @@ class UserProfile(models.Model):
     ])
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['role', 'created_at', 'id']),
+        ]
+
     def __str__(self):
         return self.email
 
@@ -25,6 +34,12 @@ class CentralAuthModel(models.Model):
     version = models.IntegerField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['iteration_name', 'version']),
+            models.Index(fields=['central_auth', 'created_at', 'id']),
+        ]
+
     def __str__(self):
         return f"{self.model_name} v{self.version} ({self.central_auth.email})"
 
@@ -46,9 +61,21 @@ class CentralClientAssignment(models.Model):
     data_domain = models.CharField(max_length=255)  
     model_name = models.CharField(max_length=255)   
     iteration_name = models.CharField(max_length=255)
+    # Current version row of the iteration; follows it when aggregation adds a version.
+    iteration = models.ForeignKey(
+        CentralAuthModel,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='assignments'
+    )
     assigned_at = models.DateTimeField(auto_now_add=True)
 
-    
+    class Meta:
+        indexes = [
+            models.Index(fields=['client', 'iteration']),
+            models.Index(fields=['central_auth', 'assigned_at', 'id']),
+        ]
 
     def __str__(self):
         return f"{self.client.email} -> {self.central_auth.email} ({self.model_name})"
@@ -64,15 +91,144 @@ class ClientModel(models.Model):
     precision = models.FloatField(blank=True, null=True)
     recall = models.FloatField(blank=True, null=True)
     f1_score = models.FloatField(blank=True, null=True)
+    # Local training-set size, used to weight the client in FedAvg.
+    num_samples = models.PositiveIntegerField(blank=True, null=True)
+    # Computed by the server on its held-out validation set (api/evaluation.py).
+    server_accuracy = models.FloatField(blank=True, null=True)
+    server_precision = models.FloatField(blank=True, null=True)
+    server_recall = models.FloatField(blank=True, null=True)
+    server_f1_score = models.FloatField(blank=True, null=True)
+    evaluated_at = models.DateTimeField(blank=True, null=True)
+    evaluation_error = models.CharField(max_length=255, blank=True)
     version = models.IntegerField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['assignment', 'created_at']),
+        ]
+
     def __str__(self):
         return f"{self.assignment.client.email} - {self.assignment.model_name} v{self.version}"
 
 
+# Running FedAvg state for an iteration, folded in as client models arrive.
+# Round names are only unique per central authority, so both key the row.
+class IterationAccumulator(models.Model):
+    central_auth = models.ForeignKey(
+        UserProfile,
+        on_delete=models.CASCADE,
+        limit_choices_to={'role': 'central'},
+        related_name='accumulators'
+    )
+    iteration_name = models.CharField(max_length=255)
+    weighted_sum = models.BinaryField(default=b"")  # npz of sum(weight * params)
+    total_weight = models.FloatField(default=0)
+    template = models.BinaryField(blank=True, null=True)  # pickled estimator the averages are written into
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['central_auth', 'iteration_name'], name='unique_accumulator_per_iteration'),
+        ]
+
+    def __str__(self):
+        return f"{self.iteration_name} ({self.contributions.count()} clients)"
+
+
+# One client's current share of an accumulator; replaced when the client resubmits.
+class AccumulatorContribution(models.Model):
+    accumulator = models.ForeignKey(IterationAccumulator, on_delete=models.CASCADE, related_name='contributions')
+    assignment = models.OneToOneField(CentralClientAssignment, on_delete=models.CASCADE)
+    client_model = models.ForeignKey(ClientModel, on_delete=models.CASCADE)
+    weight = models.FloatField()
+    parameters = models.BinaryField()  # npz of the client's unweighted params
+
+    def __str__(self):
+        return f"{self.assignment} x{self.weight:g}"
+
+
+# Chunked, resumable upload of a model file; the model row is created on commit.
+class UploadSession(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    kind = models.CharField(max_length=20, choices=[
+        ('central', 'Central model'),
+        ('client', 'Client model'),
+    ])
+    filename = models.CharField(max_length=255)
+    expected_size = models.BigIntegerField(blank=True, null=True)
+    expected_sha256 = models.CharField(max_length=64, blank=True)
+    next_chunk = models.PositiveIntegerField(default=0)
+    bytes_received = models.BigIntegerField(default=0)
+    sha256 = models.CharField(max_length=64, blank=True)
+    committed = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.kind} upload {self.filename} ({self.bytes_received} bytes)"
+
+
+# A stored model artifact, deduplicated by content (see api/storage.py).
+class Blob(models.Model):
+    sha256 = models.CharField(max_length=64, db_index=True)
+    name = models.CharField(max_length=255, unique=True)
+    size = models.BigIntegerField()
+    ref_count = models.IntegerField(default=0)  # CentralAuthModel/ClientModel rows using this file
+    created_at = models.DateTimeField(auto_now_add=True)
+    stored_at = models.DateTimeField(default=timezone.now)  # last time the file was written or reused
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} refs)"
+
+
+# Background work run by `manage.py run_jobs` (see api/jobs.py).
+class Job(models.Model):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    kind = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    # Jobs sharing a key are not queued twice while one is unfinished (at most one is ever queued).
+    key = models.CharField(max_length=255, blank=True, db_index=True)
+    status = models.CharField(max_length=20, default=QUEUED, choices=[
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    ])
+    progress = models.FloatField(default=0)
+    message = models.CharField(max_length=255, blank=True)
+    result = models.JSONField(blank=True, null=True, encoder=DjangoJSONEncoder)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=255, blank=True)
+    locked_at = models.DateTimeField(blank=True, null=True)  # claim time, renewed by progress reports
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_after']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['key'], condition=models.Q(status='queued') & ~models.Q(key=''), name='unique_queued_job_key',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.id} ({self.status})"
+
+
 # Admin registration
 admin.site.register(UserProfile)
 admin.site.register(CentralAuthModel)
 admin.site.register(CentralClientAssignment)
 admin.site.register(ClientModel)
+admin.site.register(Job)
@@ -0,0 +1,129 @@
+"""
+Keyset (cursor) pagination for the list endpoints.
+
+Pages are ordered by (timestamp, id) and the cursor encodes the last row's
+pair, so a deep page is an index range scan rather than an OFFSET. Pagination
+is opt-in: without `cursor` or `page_size` an endpoint returns its full list as
+before, and with either it returns {"results": [...], "next": <cursor|null>}.
+"""
+import base64
+import json
+
+from django.conf import settings
+from django.db.models import Q
+from django.http import JsonResponse
+from django.utils.dateparse import parse_datetime
+from rest_framework import status
+from rest_framework.response import Response
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(timestamp, pk):
+    raw = json.dumps([timestamp.isoformat(), pk], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        timestamp, pk = json.loads(raw)
+        parsed = parse_datetime(timestamp)
+        if parsed is None or not isinstance(pk, int):
+            raise ValueError
+    except (ValueError, TypeError):
+        raise InvalidCursor("Invalid cursor.") from None
+    return parsed, pk
+
+
+def is_paginated(request):
+    return "cursor" in request.GET or "page_size" in request.GET
+
+
+def page_size(request):
+    default = getattr(settings, "API_PAGE_SIZE", 50)
+    maximum = getattr(settings, "API_MAX_PAGE_SIZE", 500)
+    try:
+        size = int(request.GET.get("page_size", default))
+    except ValueError:
+        size = default
+    return max(1, min(size, maximum))
+
+
+def _page_queryset(queryset, cursor, size, time_field, descending):
+    if descending:
+        queryset = queryset.order_by(f"-{time_field}", "-id")
+    else:
+        queryset = queryset.order_by(time_field, "id")
+
+    if cursor:
+        timestamp, pk = decode_cursor(cursor)
+        op = "lt" if descending else "gt"
+        queryset = queryset.filter(
+            Q(**{f"{time_field}__{op}": timestamp}) | Q(**{time_field: timestamp, f"id__{op}": pk})
+        )
+    return queryset[:size + 1]
+
+
+def _split_page(rows, size, time_field):
+    if len(rows) <= size:
+        return rows, None
+    rows = rows[:size]
+    last = rows[-1]
+    return rows, encode_cursor(getattr(last, time_field), last.pk)
+
+
+def keyset_page(queryset, cursor=None, size=50, time_field="created_at", descending=True):
+    """Return (rows, next_cursor) for the page after `cursor`."""
+    rows = list(_page_queryset(queryset, cursor, size, time_field, descending))
+    return _split_page(rows, size, time_field)
+
+
+async def akeyset_page(queryset, cursor=None, size=50, time_field="created_at", descending=True):
+    """keyset_page over the async ORM."""
+    rows = [row async for row in _page_queryset(queryset, cursor, size, time_field, descending)]
+    return _split_page(rows, size, time_field)
+
+
+def paginated_response(request, queryset, serializer_class, time_field="created_at", descending=True):
+    """
+    Serialize one keyset page of `queryset`, or the whole queryset when the
+    request does not ask for pagination.
+    """
+    if not is_paginated(request):
+        return Response(serializer_class(queryset, many=True).data)
+
+    try:
+        rows, next_cursor = keyset_page(
+            queryset,
+            cursor=request.GET.get("cursor"),
+            size=page_size(request),
+            time_field=time_field,
+            descending=descending,
+        )
+    except InvalidCursor as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response({"results": serializer_class(rows, many=True).data, "next": next_cursor})
+
+
+async def apaginated_response(request, queryset, serializer_class, time_field="created_at", descending=True):
+    """paginated_response for the async views: same payloads, as a JsonResponse."""
+    if not is_paginated(request):
+        rows = [row async for row in queryset]
+        return JsonResponse(serializer_class(rows, many=True).data, safe=False)
+
+    try:
+        rows, next_cursor = await akeyset_page(
+            queryset,
+            cursor=request.GET.get("cursor"),
+            size=page_size(request),
+            time_field=time_field,
+            descending=descending,
+        )
+    except InvalidCursor as e:
+        return JsonResponse({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    return JsonResponse({"results": serializer_class(rows, many=True).data, "next": next_cursor})
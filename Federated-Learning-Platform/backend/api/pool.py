@@ -0,0 +1,262 @@
+"""
+Process pool for model scoring.
+
+With INFERENCE_POOL_WORKERS > 0, predictions run in dedicated worker
+processes instead of the web worker, so a burst of CatBoost/sklearn work does
+not hold the GIL that every other endpoint needs. Workers load models by path
+(through the memory-mapped artifacts when enabled) and keep them warm; a
+hot-swapped model is loaded by each worker on first use.
+
+Admission is bounded: at most INFERENCE_POOL_QUEUE_SIZE rows may be queued or
+running. Beyond that `admit` raises PoolSaturated, and the views answer 503
+with Retry-After instead of letting requests pile up.
+
+If a worker dies (killed, out of memory, a native crash) the executor is
+broken for good; the pool replaces it and retries the affected request once.
+"""
+import logging
+import multiprocessing
+import os
+import pickle
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+
+from .metrics import observe_inference
+
+logger = logging.getLogger(__name__)
+
+# Models each worker keeps loaded (older sources are dropped after a hot swap).
+WORKER_MODEL_SLOTS = 4
+
+# Settings the workers take from the web process (test overrides included).
+WORKER_SETTINGS = ("MEDIA_ROOT", "MODEL_ARTIFACT_DIR", "INFERENCE_USE_ARTIFACTS")
+
+# Upper bounds (ms) of the queue-wait histogram buckets.
+QUEUE_WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+
+class PoolSaturated(Exception):
+    """The inference queue is full; retry after `retry_after` seconds."""
+
+    def __init__(self, retry_after):
+        super().__init__("Inference queue is full, retry later.")
+        self.retry_after = retry_after
+
+
+# ----- worker process -----
+
+_worker_models = {}
+
+
+def _init_worker(overrides, sources):
+    import django
+
+    django.setup()
+    for name, value in overrides.items():
+        setattr(settings, name, value)
+    for name, source in sources:
+        try:
+            _worker_model(name, source)
+        except Exception:
+            # The request that needs it loads it again, and reports the error then.
+            logger.exception("Worker %s could not preload %s from %s", os.getpid(), name, source)
+
+
+def _worker_model(name, source):
+    from .schemas import SCHEMAS
+
+    estimator = _worker_models.get(source)
+    if estimator is None:
+        if getattr(settings, "INFERENCE_USE_ARTIFACTS", True):
+            from .artifacts import load_model
+
+            estimator = load_model(source)
+        else:
+            with open(source, "rb") as f:
+                estimator = pickle.load(f)
+        if name in SCHEMAS:
+            estimator = SCHEMAS[name].bind(estimator)
+        while len(_worker_models) >= WORKER_MODEL_SLOTS:
+            _worker_models.pop(next(iter(_worker_models)))
+        _worker_models[source] = estimator
+    return estimator
+
+
+def _ping():
+    return os.getpid()
+
+
+def _score_in_worker(name, source, X):
+    from .inference import score
+
+    started = time.time()
+    labels, probabilities = score(_worker_model(name, source), X)
+    return labels, probabilities, started, time.time()
+
+
+# ----- web process side -----
+
+class InferencePool:
+    def __init__(self, workers, max_queue, retry_after=1):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self._executor = None
+        self._sources = ()
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._created_at = time.monotonic()
+        self._tasks = 0
+        self._rejected = 0
+        self._busy_seconds = 0.0
+        self._wait_seconds = 0.0
+        self._wait_histogram = dict.fromkeys(QUEUE_WAIT_BUCKETS_MS + (float("inf"),), 0)
+
+    def start(self, sources=None):
+        with self._lock:
+            if sources is not None:
+                self._sources = tuple(sources)
+            if self._executor is None:
+                os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(
+                        {name: getattr(settings, name) for name in WORKER_SETTINGS if hasattr(settings, name)},
+                        self._sources,
+                    ),
+                )
+                # Spawn (and warm) every worker now rather than on the first requests.
+                for _ in range(self.workers):
+                    self._executor.submit(_ping)
+        return self
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    def admit(self, rows=1):
+        """Reserve queue room for `rows`; raises PoolSaturated when full."""
+        with self._lock:
+            if self._pending + rows > self.max_queue:
+                self._rejected += rows
+                raise PoolSaturated(self.retry_after)
+            self._pending += rows
+
+    def release(self, rows=1):
+        with self._lock:
+            self._pending -= rows
+
+    def submit(self, model, X):
+        """Score `X` with `model` (a LoadedModel) in a worker; a future of (labels, probabilities)."""
+        result = Future()
+        self._submit(model, X, result, time.time(), retry=True)
+        return result
+
+    def _submit(self, model, X, result, submitted, retry):
+        executor = self.start()._executor
+        try:
+            task = executor.submit(_score_in_worker, model.name, model.source, X)
+        except BrokenProcessPool as exc:
+            self._broken(executor, model, X, result, submitted, retry, exc)
+            return
+
+        def done(task):
+            try:
+                labels, probabilities, started, finished = task.result()
+            except BrokenProcessPool as exc:
+                self._broken(executor, model, X, result, submitted, retry, exc)
+                return
+            except Exception as exc:
+                result.set_exception(exc)
+                return
+            self._record(max(0.0, started - submitted), finished - started)
+            observe_inference(model, finished - started, len(X))
+            result.set_result((labels, probabilities))
+
+        task.add_done_callback(done)
+
+    def _broken(self, executor, model, X, result, submitted, retry, exc):
+        """Replace a broken executor and, the first time, submit the request again."""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+        if not retry:
+            result.set_exception(exc)
+            return
+        logger.warning("Inference worker died (%s); restarting the pool and retrying %s", exc, model.name)
+        try:
+            self._submit(model, X, result, submitted, retry=False)
+        except Exception as exc:
+            result.set_exception(exc)
+
+    def _record(self, wait, busy):
+        with self._lock:
+            self._tasks += 1
+            self._busy_seconds += busy
+            self._wait_seconds += wait
+            for bound in self._wait_histogram:
+                if wait * 1000 <= bound:
+                    self._wait_histogram[bound] += 1
+                    break
+
+    def stats(self):
+        with self._lock:
+            elapsed = max(time.monotonic() - self._created_at, 1e-9)
+            return {
+                "workers": self.workers,
+                "queue_limit": self.max_queue,
+                "queued_or_running": self._pending,
+                "tasks": self._tasks,
+                "rejected": self._rejected,
+                "utilisation": min(1.0, self._busy_seconds / (elapsed * self.workers)),
+                "mean_queue_wait_ms": 1000 * self._wait_seconds / self._tasks if self._tasks else 0.0,
+                "queue_wait_ms_histogram": {
+                    ("+Inf" if bound == float("inf") else str(bound)): count
+                    for bound, count in self._wait_histogram.items()
+                },
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def inference_pool():
+    """The process pool, or None when INFERENCE_POOL_WORKERS is 0 (score in-process)."""
+    global _pool
+    workers = getattr(settings, "INFERENCE_POOL_WORKERS", 0)
+    if workers <= 0:
+        return None
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = InferencePool(
+                    workers,
+                    getattr(settings, "INFERENCE_POOL_QUEUE_SIZE", 256),
+                    getattr(settings, "INFERENCE_POOL_RETRY_AFTER", 1),
+                )
+    return _pool
+
+
+def start_pool():
+    """Start the pool (if enabled) with the currently served models preloaded in each worker."""
+    from .registry import registry
+
+    pool = inference_pool()
+    if pool is not None:
+        pool.start((name, registry.get(name).source) for name in registry.names() if registry.is_loaded(name))
+    return pool
+
+
+def pool_stats():
+    pool = inference_pool()
+    return pool.stats() if pool else None
@@ -0,0 +1,112 @@
+"""
+Memoized single-record predictions.
+
+The single-record endpoints see the same low-cardinality profiles over and
+over, so results are kept in a per-process LRU with a TTL, keyed on the model
+that produced them (name, source, iteration) plus the canonical feature tuple.
+A repeated profile skips the batcher, the pool and the model entirely. The
+registry drops a model's entries when it swaps that model.
+
+INFERENCE_CACHE_SIZE bounds the entries (0 disables the cache) and
+INFERENCE_CACHE_TTL bounds their age in seconds.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+
+def canonical_features(X):
+    """The feature tuple of a one-row input (ints and floats compare equal), or None."""
+    values = X.to_numpy() if isinstance(X, pd.DataFrame) else np.asarray(X)
+    if values.ndim != 2 or values.shape[0] != 1:
+        return None
+    try:
+        features = tuple(float(v) for v in values.ravel())
+    except (TypeError, ValueError):
+        return None
+    if any(math.isnan(v) for v in features):
+        return None
+    return features
+
+
+class PredictionCache:
+    def __init__(self, max_size=None, ttl=None):
+        self._max_size = max_size
+        self._ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    @property
+    def max_size(self):
+        return self._max_size if self._max_size is not None else getattr(settings, "INFERENCE_CACHE_SIZE", 4096)
+
+    @property
+    def ttl(self):
+        return self._ttl if self._ttl is not None else getattr(settings, "INFERENCE_CACHE_TTL", 3600)
+
+    def key(self, model, X):
+        """Cache key for `X` scored by `model` (a LoadedModel), or None if it cannot be cached."""
+        if self.max_size <= 0:
+            return None
+        features = canonical_features(X)
+        if features is None:
+            return None
+        return model.name, model.source, model.iteration_id, features
+
+    def get(self, key):
+        if key is None:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or now - entry[0] > self.ttl:
+                if entry is not None:
+                    del self._entries[key]
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        if key is None:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def invalidate(self, name=None):
+        """Drop the entries of model `name` (all entries if None)."""
+        with self._lock:
+            stale = [key for key in self._entries if name is None or key[0] == name]
+            for key in stale:
+                del self._entries[key]
+            self._invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations,
+            }
+
+
+prediction_cache = PredictionCache()
@@ -0,0 +1,198 @@
+"""
+In-process registry of the models served by the inference endpoints.
+
+Each worker loads a model once and keeps it warm, memory-mapping its native
+artifact where the model type has one (see api/artifacts.py). A model is
+resolved from the newest finalized (version=0) CentralAuthModel whose
+dataset_domain matches settings.INFERENCE_MODELS, falling back to the bundled
+pickle in `pkl files/`.
+Swaps are atomic: the new model is fully loaded before the reference changes,
+so requests in flight keep using the old one.
+"""
+import logging
+import pickle
+import threading
+import time
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.db.models import Q
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .artifacts import load_model
+from .models import CentralAuthModel
+from .prediction_cache import prediction_cache
+
+logger = logging.getLogger(__name__)
+
+
+class ModelNotRegistered(KeyError):
+    pass
+
+
+@dataclass(frozen=True)
+class LoadedModel:
+    name: str
+    estimator: object
+    source: str
+    # CentralAuthModel pk the estimator came from, None for the bundled fallback.
+    iteration_id: int | None = None
+    loaded_at: float = field(default_factory=time.monotonic)
+
+
+class ModelRegistry:
+    def __init__(self, specs=None, refresh_interval=None):
+        self._specs = specs
+        self._refresh_interval = refresh_interval
+        self._models = {}
+        self._checked_at = {}
+        self._lock = threading.Lock()
+        self._refreshing = set()
+
+    @property
+    def specs(self):
+        return self._specs if self._specs is not None else settings.INFERENCE_MODELS
+
+    @property
+    def refresh_interval(self):
+        if self._refresh_interval is not None:
+            return self._refresh_interval
+        return getattr(settings, "INFERENCE_REFRESH_SECONDS", 30)
+
+    def names(self):
+        return list(self.specs)
+
+    def get(self, name):
+        """Return the warm LoadedModel for `name`, loading it on first use."""
+        entry = self._models.get(name)
+        if entry is None:
+            with self._lock:
+                entry = self._models.get(name)
+                if entry is None:
+                    entry = self._load(name)
+            return entry
+
+        if time.monotonic() - self._checked_at.get(name, 0) > self.refresh_interval:
+            self._refresh_in_background(name)
+        return entry
+
+    def is_loaded(self, name):
+        return name in self._models
+
+    def warm(self):
+        """Load every configured model; failures are logged, not raised."""
+        for name in self.names():
+            try:
+                self.get(name)
+            except Exception:
+                logger.exception("Could not warm model %r", name)
+
+    def reload(self, name=None):
+        """Re-resolve and swap `name` (or every loaded model) if its source changed."""
+        for model_name in [name] if name else list(self._models):
+            with self._lock:
+                self._load(model_name, current=self._models.get(model_name))
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+            self._checked_at.clear()
+        prediction_cache.invalidate()
+
+    def name_for_domain(self, dataset_domain):
+        domain = (dataset_domain or "").strip().lower()
+        for name, spec in self.specs.items():
+            if domain in (d.lower() for d in spec.get("domains", [])):
+                return name
+        return None
+
+    # ----- internals -----
+
+    def _spec(self, name):
+        try:
+            return self.specs[name]
+        except KeyError:
+            raise ModelNotRegistered(name) from None
+
+    def _resolve(self, name):
+        """Return (iteration_id, path) of the model that should be serving `name`."""
+        spec = self._spec(name)
+        domains = spec.get("domains", [])
+        finalized = (
+            CentralAuthModel.objects.filter(version=0)
+            .exclude(model_file="")
+            .order_by("-created_at", "-id")
+        )
+        query = Q()
+        for domain in domains:
+            query |= Q(dataset_domain__iexact=domain)
+        if domains:
+            row = finalized.filter(query).values_list("id", "model_file").first()
+            if row:
+                iteration_id, model_file = row
+                return iteration_id, default_storage.path(model_file)
+        return None, str(spec["fallback"])
+
+    def _load(self, name, current=None):
+        # Caller holds self._lock.
+        iteration_id, path = self._resolve(name)
+        self._checked_at[name] = time.monotonic()
+        if current is not None and current.iteration_id == iteration_id and current.source == path:
+            return current
+
+        if getattr(settings, "INFERENCE_USE_ARTIFACTS", True):
+            estimator = load_model(path)
+        else:
+            with open(path, "rb") as f:
+                estimator = pickle.load(f)
+        from .schemas import SCHEMAS
+
+        if name in SCHEMAS:
+            estimator = SCHEMAS[name].bind(estimator)
+        entry = LoadedModel(name=name, estimator=estimator, source=path, iteration_id=iteration_id)
+        self._models[name] = entry
+        prediction_cache.invalidate(name)
+        logger.info("Serving %s from %s (iteration %s)", name, path, iteration_id)
+        return entry
+
+    def _refresh_in_background(self, name):
+        with self._lock:
+            if name in self._refreshing:
+                return
+            self._refreshing.add(name)
+            self._checked_at[name] = time.monotonic()
+
+        def refresh():
+            try:
+                self.reload(name)
+            except Exception:
+                logger.exception("Could not refresh model %r", name)
+            finally:
+                self._refreshing.discard(name)
+                connections.close_all()
+
+        threading.Thread(target=refresh, name=f"registry-refresh-{name}", daemon=True).start()
+
+
+registry = ModelRegistry()
+
+
+@receiver(post_save, sender=CentralAuthModel)
+def reload_on_finalize(sender, instance, **kwargs):
+    """Hot-swap the serving model as soon as a matching iteration is finalized."""
+    if instance.version != 0:
+        return
+    name = registry.name_for_domain(instance.dataset_domain)
+    if name is None:
+        return
+
+    def swap():
+        try:
+            registry.reload(name)
+        except Exception:
+            logger.exception("Could not hot-swap model %r", name)
+
+    transaction.on_commit(swap)
@@ -0,0 +1,62 @@
+"""
+Loading model pickles that come from API callers.
+
+pickle.load runs whatever the stream tells it to, so client submissions are
+never unpickled with it. RestrictedUnpickler only resolves the globals a
+fitted model needs: numpy's array, dtype and scalar reconstructors, the
+scikit-learn linear-model estimators that FedAvg averages, and
+CatBoostClassifier (whose pickle wraps its native .cbm bytes). Any other
+global (os.system, builtins.eval, an arbitrary class...) is refused with
+UnsafeModel before anything in the stream runs.
+"""
+import importlib
+import io
+import pickle
+
+# (module, name) pairs a model pickle may reference, besides ESTIMATOR_MODULES.
+ALLOWED_GLOBALS = {
+    ("numpy", "ndarray"),
+    ("numpy", "dtype"),
+    ("numpy.core.multiarray", "_reconstruct"),
+    ("numpy.core.multiarray", "scalar"),
+    ("numpy.core.numeric", "_frombuffer"),
+    # numpy >= 2 pickles name numpy._core
+    ("numpy._core.multiarray", "_reconstruct"),
+    ("numpy._core.multiarray", "scalar"),
+    ("numpy._core.numeric", "_frombuffer"),
+    ("catboost.core", "CatBoostClassifier"),
+}
+
+# Estimator classes (BaseEstimator subclasses only) may come from these packages.
+ESTIMATOR_MODULES = ("sklearn.linear_model.",)
+
+
+class UnsafeModel(Exception):
+    pass
+
+
+class RestrictedUnpickler(pickle.Unpickler):
+    def find_class(self, module, name):
+        if (module, name) in ALLOWED_GLOBALS:
+            return super().find_class(module, name)
+        if module.startswith(ESTIMATOR_MODULES):
+            from sklearn.base import BaseEstimator
+
+            found = getattr(importlib.import_module(module), name, None)
+            if isinstance(found, type) and issubclass(found, BaseEstimator):
+                return found
+        raise UnsafeModel(f"Model files may not reference {module}.{name}.")
+
+
+def load(file):
+    """Unpickle a model from a binary file object; UnsafeModel for anything but an allowed model."""
+    try:
+        return RestrictedUnpickler(file).load()
+    except UnsafeModel:
+        raise
+    except Exception as e:
+        raise UnsafeModel(f"Not a readable model pickle: {type(e).__name__}: {e}") from None
+
+
+def loads(data):
+    return load(io.BytesIO(data))
@@ -0,0 +1,143 @@
+"""
+Declarative feature schemas for the served models.
+
+A schema lists a model's features in training order, each with its dtype, the
+request field names it accepts (aliases) and a default for missing fields.
+Requests are encoded straight into a float64 row; the sync views reuse one
+preallocated buffer per thread. Serving a new model takes an INFERENCE_MODELS
+entry in settings plus a `register(...)` call here, and is then reachable at
+/predict/<model>/ and /predict/<model>/batch/.
+"""
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from .registry import ModelNotRegistered
+
+
+@dataclass(frozen=True)
+class Feature:
+    name: str  # model column
+    dtype: type = float
+    aliases: tuple = ()  # request field names, tried before `name`
+    default: float = 0
+
+    @property
+    def keys(self):
+        return (*self.aliases, self.name)
+
+
+class SchemaMismatch(ValueError):
+    pass
+
+
+class FeatureSchema:
+    def __init__(self, model, features):
+        self.model = model
+        self.features = tuple(features)
+        self.columns = [f.name for f in self.features]
+        self._local = threading.local()
+
+    def _buffer(self):
+        buffer = getattr(self._local, "buffer", None)
+        if buffer is None:
+            buffer = self._local.buffer = np.empty((1, len(self.features)), dtype=np.float64)
+        return buffer
+
+    def encode(self, data, reuse=True):
+        """
+        Encode one request record as a (1, n) float64 row. With `reuse` the
+        row is this thread's buffer, valid until the thread encodes again;
+        callers that do not wait for the prediction pass reuse=False.
+        """
+        out = self._buffer() if reuse else np.empty((1, len(self.features)), dtype=np.float64)
+        row = out[0]
+        for i, feature in enumerate(self.features):
+            for key in feature.keys:
+                if key in data:
+                    row[i] = feature.dtype(data[key])
+                    break
+            else:
+                row[i] = feature.default
+        return out
+
+    def encode_frame(self, frame):
+        """
+        Encode a frame of request records. Returns the (rows, n) matrix and a
+        boolean mask of rows holding a non-numeric value.
+        """
+        out = np.empty((len(frame), len(self.features)), dtype=np.float64)
+        invalid = np.zeros(len(frame), dtype=bool)
+        for i, feature in enumerate(self.features):
+            source = next((key for key in feature.keys if key in frame.columns), None)
+            if source is None:
+                out[:, i] = feature.default
+                continue
+            raw = frame[source]
+            numeric = pd.to_numeric(raw, errors="coerce")
+            present = raw.notna() & (raw.astype(str).str.strip() != "")
+            invalid |= (present & numeric.isna()).to_numpy()
+            values = numeric.fillna(feature.default).to_numpy(dtype=np.float64)
+            out[:, i] = np.trunc(values) if feature.dtype is int else values
+        return out, invalid
+
+    def bind(self, estimator):
+        """
+        Check that the estimator was fitted on the schema's columns (else
+        SchemaMismatch) and prepare it for positional rows: sklearn's fitted
+        names are dropped, which only served to warn about unnamed input.
+        """
+        fitted = getattr(estimator, "feature_names_in_", None)
+        if fitted is None:
+            fitted = getattr(estimator, "feature_names_", None)
+        if fitted is not None and [str(c) for c in fitted] != self.columns:
+            raise SchemaMismatch(f"{self.model}: model columns {list(fitted)} do not match the schema.")
+        if hasattr(estimator, "feature_names_in_"):
+            del estimator.feature_names_in_
+        return estimator
+
+
+SCHEMAS = {}
+
+
+def register(schema):
+    SCHEMAS[schema.model] = schema
+    return schema
+
+
+def get_schema(name):
+    try:
+        return SCHEMAS[name]
+    except KeyError:
+        raise ModelNotRegistered(name) from None
+
+
+register(FeatureSchema("diabetes", [
+    Feature("GenHlth", int, ("genHlth",)),
+    Feature("BMI", float, ("bmi",)),
+    Feature("Age", int, ("age",)),
+    Feature("HighBP", int, ("highBP",)),
+    Feature("HighChol", int, ("highChol",)),
+    Feature("CholCheck", int, ("cholCheck",)),
+    Feature("HvyAlcoholConsump", int, ("hvyAlcoholConsump",)),
+    Feature("Sex", int, ("sex",)),
+    Feature("Income", int, ("income",)),
+    Feature("HeartDiseaseorAttack", int, ("heartDiseaseValue",)),
+    Feature("PhysHlth", int, ("physHlth",)),
+]))
+
+register(FeatureSchema("heartdisease", [
+    Feature("age", int),
+    Feature("gender", int),
+    Feature("height", int),
+    Feature("weight", int),
+    Feature("systolic_pressure", int, ("systolicBP",)),
+    Feature("diastolic_pressure", int, ("diastolicBP",)),
+    Feature("cholesterol", int),
+    Feature("glucose", int),
+    Feature("smoker", int, ("smoke",)),
+    Feature("alcohol", int),
+    Feature("active", int),
+]))
@@ -0,0 +1,58 @@
+"""
+Client lookup for the assignment typeahead.
+
+On PostgreSQL, email and hospital carry pg_trgm GIN indexes on the columns
+(migration 0007, for the trigram_similar arm) and on UPPER(column) (migration
+0014, for the icontains arm, which compiles to UPPER(col::text) LIKE ...), so
+substring and fuzzy matches are index scans ranked by trigram similarity.
+Other databases (SQLite test runs) fall back to case-insensitive substring
+matching ranked by prefix hits. Results are capped at CLIENT_SEARCH_LIMIT.
+"""
+from django.conf import settings
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import connections
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import UserProfile
+
+
+def search_limit(requested=None):
+    maximum = getattr(settings, "CLIENT_SEARCH_LIMIT", 20)
+    try:
+        return max(1, min(int(requested), maximum))
+    except (TypeError, ValueError):
+        return maximum
+
+
+def _prefix_rank(text):
+    return Case(
+        When(email__istartswith=text, then=Value(0)),
+        When(hospital__istartswith=text, then=Value(1)),
+        default=Value(2),
+        output_field=IntegerField(),
+    )
+
+
+def search_clients(text, limit=None):
+    """Return at most `limit` clients matching `text`, best match first."""
+    limit = search_limit(limit)
+    clients = UserProfile.objects.filter(role="client")
+    matches = Q(email__icontains=text) | Q(hospital__icontains=text)
+
+    if connections[clients.db].vendor == "postgresql":
+        clients = clients.filter(
+            matches | Q(email__trigram_similar=text) | Q(hospital__trigram_similar=text)
+        ).annotate(
+            similarity=Greatest(
+                TrigramSimilarity("email", text),
+                TrigramSimilarity(Coalesce("hospital", Value("")), text),
+            ),
+            prefix_rank=_prefix_rank(text),
+        ).order_by("prefix_rank", "-similarity", "email")
+    else:
+        clients = clients.filter(matches).annotate(
+            prefix_rank=_prefix_rank(text),
+        ).order_by("prefix_rank", "email")
+
+    return clients[:limit]
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from django.contrib.auth.hashers import make_password
-from .models import UserProfile, CentralClientAssignment, CentralAuthModel, ClientModel
+from .models import UserProfile, CentralClientAssignment, CentralAuthModel, ClientModel, Job
+from . import safe_pickle
 
 
 # ---------------------------
@@ -44,6 +45,7 @@ class CentralClientAssignmentSerializer(serializers.ModelSerializer):
             "data_domain",
             "model_name",
             "iteration_name",
+            "iteration",
             "assigned_at",
         ]
         read_only_fields = [
@@ -51,7 +53,8 @@ class CentralClientAssignmentSerializer(serializers.ModelSerializer):
             "client_email",
             "client_hospital",
             "central_auth_email",
-            "iteration_name"
+            "iteration_name",
+            "iteration",
             "assigned_at",
         ]
 
@@ -115,7 +118,51 @@ class ClientModelSerializer(serializers.ModelSerializer):
             "precision",
             "recall",
             "f1_score",
+            "num_samples",
+            "server_accuracy",
+            "server_precision",
+            "server_recall",
+            "server_f1_score",
+            "evaluated_at",
+            "evaluation_error",
             "version",
             "created_at"
         ]
-        read_only_fields = ["id", "client_email", "iteration_name", "model_name", "created_at"]
+        read_only_fields = [
+            "id", "client_email", "iteration_name", "model_name", "created_at",
+            "server_accuracy", "server_precision", "server_recall", "server_f1_score",
+            "evaluated_at", "evaluation_error",
+        ]
+
+    def validate_model_file(self, value):
+        """Only accept models the server can read without executing the upload (api/safe_pickle.py)."""
+        try:
+            safe_pickle.load(value)
+        except safe_pickle.UnsafeModel as e:
+            raise serializers.ValidationError(str(e))
+        finally:
+            value.seek(0)
+        return value
+
+
+# ---------------------------
+# ✅ Job Serializer
+# ---------------------------
+class JobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Job
+        fields = [
+            "id",
+            "kind",
+            "status",
+            "progress",
+            "message",
+            "result",
+            "error",
+            "attempts",
+            "max_attempts",
+            "run_after",
+            "created_at",
+            "finished_at",
+        ]
+        read_only_fields = fields
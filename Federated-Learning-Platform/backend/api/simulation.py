@@ -0,0 +1,377 @@
+"""
+End-to-end simulation of a federated round against the real endpoints.
+
+N simulated hospitals go through one round: the central user assigns each
+client (assign_client), the client polls its work (current_client_iterations)
+and submits a model (submit_client_model), and the central user reads the
+round's submissions (current_iteration_submissions). Requests go through
+Django's test client (WSGI, one thread per concurrent client) or its async
+client (ASGI, one task per concurrent client), against the configured
+database, so the whole stack — middleware, auth, ORM, storage — is measured.
+Uploads are stored under a temporary MEDIA_ROOT, removed with the rows the
+round created, so a run leaves nothing in the real media directory.
+
+The report has the round's wall-clock time, per-endpoint latency percentiles
+and SQL queries per request, and the process's peak RSS. `compare` checks a
+report against a stored baseline: more queries per request than the baseline
+is a regression, as is latency, wall-clock time or RSS beyond the tolerance.
+
+    python manage.py simulate_round --clients 500 --concurrency 32
+"""
+import asyncio
+import contextvars
+import json
+import pickle
+import resource
+import shutil
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, connections
+from django.db.models import Q
+from django.db.backends.signals import connection_created
+from django.test import AsyncClient, Client, override_settings
+
+from .auth import issue_token
+from .models import Blob, CentralAuthModel, ClientModel, IterationAccumulator, Job, UserProfile
+
+ENDPOINTS = ("assign_client", "current_client_iterations", "submit_client_model", "current_iteration_submissions")
+TRANSPORTS = ("wsgi", "asgi")
+
+# Queries of the request being timed in this context (a one-item list), or None.
+_queries = contextvars.ContextVar("simulation_queries", default=None)
+
+
+def _count_query(execute, sql, params, many, context):
+    counter = _queries.get()
+    if counter is not None:
+        counter[0] += 1
+    return execute(sql, params, many, context)
+
+
+def _instrument(sender=None, connection=None, **kwargs):
+    if _count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_query)
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+def peak_rss_mb():
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class RoundSimulator:
+    def __init__(self, clients, concurrency=8, transport="wsgi", train=False, domain="heartdisease", seed=0):
+        if transport not in TRANSPORTS:
+            raise ValueError(f"transport must be one of {', '.join(TRANSPORTS)}")
+        self.n_clients = clients
+        self.concurrency = max(1, concurrency)
+        self.transport = transport
+        self.train = train
+        self.domain = domain
+        self.seed = seed
+        self.prefix = f"sim-{uuid.uuid4().hex[:8]}"
+        self.samples = []  # (endpoint, ms, queries, status)
+
+    # ----- setup -----
+
+    def _models(self):
+        """Pickled client models: fitted on partition shards with `train`, else random weights."""
+        from sklearn.linear_model import LogisticRegression
+
+        from .schemas import get_schema
+
+        n_features = len(get_schema(self.domain).columns)
+        rng = np.random.default_rng(self.seed)
+        if self.train:
+            from .datasets import open_shard, partition
+
+            directory = partition(self.domain, self.n_clients, seed=self.seed)
+        models = []
+        for client in range(self.n_clients):
+            model = LogisticRegression(max_iter=200)
+            if self.train:
+                X, y = open_shard(directory, client)
+                model.fit(X, y)
+                samples = len(y)
+            else:
+                model.classes_ = np.array([0, 1])
+                model.coef_ = rng.normal(size=(1, n_features))
+                model.intercept_ = rng.normal(size=1)
+                samples = int(rng.integers(100, 5000))
+            models.append((pickle.dumps(model), samples))
+        return models
+
+    def setup(self):
+        password = make_password(None)  # unusable; users authenticate with tokens
+        self.central = UserProfile.objects.create(
+            email=f"{self.prefix}-central@example.invalid", password=password, role="central", hospital="sim",
+        )
+        UserProfile.objects.bulk_create(
+            UserProfile(email=f"{self.prefix}-client-{i}@example.invalid", password=password, role="client",
+                        hospital=f"Hospital {i}")
+            for i in range(self.n_clients)
+        )
+        self.clients = list(UserProfile.objects.filter(email__startswith=f"{self.prefix}-client-").order_by("id"))
+        self.central_token = issue_token(self.central)
+        self.tokens = {client.id: issue_token(client) for client in self.clients}
+        self.models = self._models()
+
+        response = Client().post(
+            "/central-models/start/",
+            {
+                "central_auth": self.central.id,
+                "iteration_name": f"{self.prefix}-round",
+                "model_name": "simulated",
+                "dataset_domain": self.domain,
+                "version": 1,
+                "model_file": SimpleUploadedFile("global.pkl", self.models[0][0]),
+            },
+            headers={"authorization": f"Bearer {self.central_token}"},
+        )
+        if response.status_code != 201:
+            raise RuntimeError(f"Could not start the simulated iteration: {response.status_code} {response.content!r}")
+        self.iteration_id = response.json()["id"]
+
+    def teardown(self):
+        """Delete everything the simulation created, with the Blob rows of files only it used."""
+        mine = f"{self.prefix}-"
+        files = [
+            *CentralAuthModel.objects.filter(central_auth__email__startswith=mine).values_list("model_file", flat=True),
+            *ClientModel.objects.filter(assignment__client__email__startswith=mine).values_list("model_file", flat=True),
+        ]
+        Job.objects.filter(
+            Q(key__contains=self.prefix) | Q(key__in=[f"convert_model:{name}" for name in files])
+        ).delete()
+        IterationAccumulator.objects.filter(iteration_name__startswith=self.prefix).delete()
+        UserProfile.objects.filter(email__startswith=mine).delete()
+        # The files themselves go with the temporary MEDIA_ROOT
+        Blob.objects.filter(name__in=files, ref_count__lte=0).delete()
+
+    # ----- one client's round -----
+
+    def _requests(self, index):
+        client = self.clients[index]
+        model, samples = self.models[index]
+        central = {"authorization": f"Bearer {self.central_token}"}
+        own = {"authorization": f"Bearer {self.tokens[client.id]}"}
+        yield "assign_client", "post", "/assign_client/", {
+            "data": {
+                "client_id": client.id,
+                "data_domain": self.domain,
+                "model_name": "simulated",
+                "iteration_name": f"{self.prefix}-round",
+            },
+            "content_type": "application/json",
+            "headers": central,
+        }
+        assignment = yield "current_client_iterations", "get", f"/client/current-iterations/{client.email}/", {
+            "headers": own,
+        }
+        yield "submit_client_model", "post", "/client/submit-model/", {
+            "data": {
+                "assignment": assignment,
+                "model_file": SimpleUploadedFile(f"{client.id}.pkl", model),
+                "num_samples": samples,
+                "accuracy": 0.8,
+                "precision": 0.8,
+                "recall": 0.8,
+                "f1_score": 0.8,
+                "version": 1,
+            },
+            "headers": own,
+        }
+        yield "current_iteration_submissions", "get", f"/central-models/{self.iteration_id}/submissions/", {
+            "headers": central,
+        }
+
+    @staticmethod
+    def _assignment_id(endpoint, response):
+        if endpoint == "current_client_iterations" and response.status_code == 200:
+            rows = response.json()
+            if rows:
+                return rows[0]["assignment_id"]
+        return ""  # submit_client_model then fails, and is counted as an error
+
+    def _record(self, endpoint, started, counter, status):
+        self.samples.append((endpoint, 1000 * (time.perf_counter() - started), counter[0], status))
+
+    def _run_client(self, client, index):
+        steps = self._requests(index)
+        result = None
+        try:
+            while True:
+                endpoint, method, path, kwargs = steps.send(result)
+                counter = [0]
+                token = _queries.set(counter)
+                started = time.perf_counter()
+                try:
+                    response = getattr(client, method)(path, **kwargs)
+                finally:
+                    _queries.reset(token)
+                self._record(endpoint, started, counter, response.status_code)
+                result = self._assignment_id(endpoint, response)
+        except StopIteration:
+            pass
+
+    async def _arun_client(self, client, index, slots):
+        async with slots:
+            steps = self._requests(index)
+            result = None
+            try:
+                while True:
+                    endpoint, method, path, kwargs = steps.send(result)
+                    counter = [0]
+                    token = _queries.set(counter)
+                    started = time.perf_counter()
+                    try:
+                        response = await getattr(client, method)(path, **kwargs)
+                    finally:
+                        _queries.reset(token)
+                    self._record(endpoint, started, counter, response.status_code)
+                    result = self._assignment_id(endpoint, response)
+            except StopIteration:
+                pass
+
+    # ----- the round -----
+
+    def _run_wsgi(self):
+        if self.concurrency == 1:
+            client = Client()
+            for index in range(self.n_clients):
+                self._run_client(client, index)
+            return
+
+        def worker(indices):
+            client = Client()
+            try:
+                for index in indices:
+                    self._run_client(client, index)
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            batches = [range(i, self.n_clients, self.concurrency) for i in range(self.concurrency)]
+            for future in [executor.submit(worker, batch) for batch in batches]:
+                future.result()
+
+    async def _run_asgi(self):
+        client = AsyncClient()
+        slots = asyncio.Semaphore(self.concurrency)
+        await asyncio.gather(*(self._arun_client(client, index, slots) for index in range(self.n_clients)))
+
+    def run(self):
+        """Set up, run and tear down one round; returns the report."""
+        media = tempfile.mkdtemp(prefix=f"{self.prefix}-media-")
+        # The test clients send Host: testserver, as under the test runner.
+        overrides = override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"], MEDIA_ROOT=media)
+        overrides.enable()
+        connection_created.connect(_instrument)
+        for existing in connections.all(initialized_only=True):
+            _instrument(connection=existing)
+        try:
+            self.setup()
+            started = time.perf_counter()
+            if self.transport == "asgi":
+                asyncio.run(self._run_asgi())
+            else:
+                self._run_wsgi()
+            wall_clock = time.perf_counter() - started
+        finally:
+            connection_created.disconnect(_instrument)
+            for existing in connections.all(initialized_only=True):
+                if _count_query in existing.execute_wrappers:
+                    existing.execute_wrappers.remove(_count_query)
+            self.teardown()
+            overrides.disable()
+            shutil.rmtree(media, ignore_errors=True)
+        return self.report(wall_clock)
+
+    def scenario(self):
+        """Baseline key: runs are only compared with runs of the same workload and stack."""
+        transport = "asgi+async" if self.transport == "asgi" and settings.ASYNC_VIEWS else self.transport
+        trained = "-train" if self.train else ""
+        return f"{transport}-{connection.vendor}-n{self.n_clients}-c{self.concurrency}{trained}"
+
+    def report(self, wall_clock):
+        endpoints = {}
+        for name in ENDPOINTS:
+            rows = [s for s in self.samples if s[0] == name]
+            timings = [s[1] for s in rows]
+            queries = [s[2] for s in rows]
+            endpoints[name] = {
+                "requests": len(rows),
+                "errors": sum(1 for s in rows if s[3] >= 400),
+                "p50_ms": percentile(timings, 50),
+                "p95_ms": percentile(timings, 95),
+                "p99_ms": percentile(timings, 99),
+                "max_ms": max(timings, default=0.0),
+                "queries_per_request": float(np.mean(queries)) if queries else 0.0,
+                "max_queries": max(queries, default=0),
+            }
+        return {
+            "scenario": self.scenario(),
+            "clients": self.n_clients,
+            "concurrency": self.concurrency,
+            "transport": self.transport,
+            "database": connection.vendor,
+            "wall_clock_s": wall_clock,
+            "peak_rss_mb": peak_rss_mb(),
+            "endpoints": endpoints,
+        }
+
+
+# ----- baselines -----
+
+def load_baselines(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_baseline(path, report):
+    baselines = load_baselines(path)
+    baselines[report["scenario"]] = report
+    with open(path, "w") as f:
+        json.dump(baselines, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def compare(report, baseline, tolerance=0.5):
+    """
+    Regressions of `report` against `baseline`, as messages (empty if none).
+    Failed requests and any rise in queries per request always count;
+    latency, wall-clock time and peak RSS may exceed the baseline by
+    `tolerance` (a fraction) before they do.
+    """
+    problems = []
+    limit = 1 + tolerance
+
+    def slower(label, value, base):
+        if base and value > base * limit:
+            problems.append(f"{label}: {value:.1f} vs baseline {base:.1f} (+{100 * (value / base - 1):.0f}%)")
+
+    for name, stats in report["endpoints"].items():
+        if stats["errors"]:
+            problems.append(f"{name}: {stats['errors']} of {stats['requests']} requests failed")
+        base = baseline.get("endpoints", {}).get(name)
+        if base is None:
+            continue
+        if stats["max_queries"] > base["max_queries"]:
+            problems.append(f"{name}: {stats['max_queries']} queries per request vs baseline {base['max_queries']}")
+        slower(f"{name} p50 ms", stats["p50_ms"], base["p50_ms"])
+        slower(f"{name} p95 ms", stats["p95_ms"], base["p95_ms"])
+    slower("round wall-clock s", report["wall_clock_s"], baseline.get("wall_clock_s"))
+    slower("peak RSS MB", report["peak_rss_mb"], baseline.get("peak_rss_mb"))
+    return problems
@@ -0,0 +1,99 @@
+"""
+Content-addressed, deduplicated storage for model artifacts.
+
+Files are named by the SHA-256 of their bytes (blobs/ab/<sha256>.pkl), so a
+resubmitted or re-uploaded model is stored once. Each stored file has a Blob
+row whose ref_count tracks how many CentralAuthModel/ClientModel rows point at
+it; `manage.py gc_blobs` removes blobs nobody references any more.
+
+Storing a file upserts its Blob row in one statement (INSERT ... ON CONFLICT
+refreshes stored_at), which locks the row, before the file is reused or moved
+into place; the collector deletes a row and its file only under the same lock
+and only if the row is still unreferenced and stale. A blob stored again while
+the collector runs is therefore either kept, or collected first and then
+written afresh.
+"""
+import hashlib
+import os
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.db.models import F
+from django.utils import timezone
+from django.utils.deconstruct import deconstructible
+
+BLOB_DIR = "blobs"
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    def get_available_name(self, name, max_length=None):
+        # Names are derived from content in _save; identical bytes share a name.
+        return name
+
+    def _save(self, name, content):
+        from .models import Blob
+
+        if hasattr(content, "seek"):
+            content.seek(0)
+        extension = os.path.splitext(name)[1].lower()
+        blob_dir = self.path(BLOB_DIR)
+        os.makedirs(blob_dir, exist_ok=True)
+
+        hasher = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=blob_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                for chunk in content.chunks():
+                    hasher.update(chunk)
+                    tmp.write(chunk)
+                    size += len(chunk)
+            digest = hasher.hexdigest()
+            blob_name = f"{BLOB_DIR}/{digest[:2]}/{digest}{extension}"
+            final_path = self.path(blob_name)
+            # Reused blobs get a fresh stored_at, so they are no longer stale candidates for gc_blobs.
+            Blob.objects.bulk_create(
+                [Blob(name=blob_name, sha256=digest, size=size, stored_at=timezone.now())],
+                update_conflicts=True, unique_fields=["name"], update_fields=["stored_at"],
+            )
+            if os.path.exists(final_path):
+                os.remove(tmp_path)
+                os.utime(final_path)
+            else:
+                os.makedirs(os.path.dirname(final_path), exist_ok=True)
+                os.replace(tmp_path, final_path)
+                if self.file_permissions_mode is not None:
+                    os.chmod(final_path, self.file_permissions_mode)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return blob_name
+
+
+def add_reference(name, delta):
+    from .models import Blob
+
+    if name:
+        Blob.objects.filter(name=name).update(ref_count=F("ref_count") + delta)
+
+
+def track_model_file(sender, instance, **kwargs):
+    """post_init: remember the stored name so a changed file can be re-counted on save."""
+    instance._stored_model_file = instance.model_file.name if instance.model_file else ""
+
+
+def count_model_file(sender, instance, created, **kwargs):
+    """post_save: move one reference from the old blob to the new one."""
+    current = instance.model_file.name if instance.model_file else ""
+    previous = "" if created else getattr(instance, "_stored_model_file", "")
+    if current != previous:
+        add_reference(current, 1)
+        add_reference(previous, -1)
+    instance._stored_model_file = current
+
+
+def release_model_file(sender, instance, **kwargs):
+    """post_delete: drop the deleted row's reference."""
+    add_reference(instance.model_file.name if instance.model_file else "", -1)
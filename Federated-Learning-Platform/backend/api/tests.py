@@ -1,3 +1,1591 @@
-from django.test import TestCase
+import hashlib
+import io
+import json
+import os
+import pickle
+import shutil
+import signal
+import tempfile
+import threading
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.core.management import CommandError, call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import AsyncRequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from django.utils import timezone
+
+from . import async_views
+from .auth import issue_token
+from .models import Blob, Job, UploadSession, UserProfile, CentralAuthModel, CentralClientAssignment, ClientModel, IterationAccumulator
+from .registry import LoadedModel, ModelRegistry, registry
+from .batching import MicroBatcher
+from .inference import score
+from .schemas import SCHEMAS, Feature, FeatureSchema, SchemaMismatch, get_schema, register
+from .pool import InferencePool, PoolSaturated, _ping
+from .prediction_cache import PredictionCache
+from .aggregation import weighted_average
+from .datasets import DatasetError, convert, load_columns, load_xy, open_shard, partition, split_indices
+from .evaluation import build_validation_set, evaluate_submissions, shutdown_executor
+from .metrics import Histogram, inference_rows, request_queries, requests_total, response_bytes
+from .simulation import ENDPOINTS, RoundSimulator, compare, load_baselines, save_baseline
+from .jobs import TASKS, backoff, claim, enqueue, run, run_pending, task
+from . import uploads
+from .uploads import partial_path, write_chunk
+from .delta import DeltaError, decode_delta, encode_delta
+from .artifacts import artifact_dir_for, load_model
+
+
+class Constant:
+    """Picklable stand-in estimator that always predicts `value`."""
+
+    def __init__(self, value):
+        self.value = value
+
+    def predict(self, X):
+        return [self.value] * len(X)
+
+    def predict_proba(self, X):
+        return [[1 - self.value, self.value]] * len(X)
+
+
+class Exploit:
+    """Pickle that creates `path` when loaded with pickle.load."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def __reduce__(self):
+        return open, (self.path, "w")
+
+
+def pickled(estimator, name="model.pkl"):
+    return SimpleUploadedFile(name, pickle.dumps(estimator))
+
+
+class MediaTestCase(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls._media = tempfile.mkdtemp()
+        cls._media_override = override_settings(
+            MEDIA_ROOT=cls._media,
+            CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+            EVALUATION_WORKERS=0,
+        )
+        cls._media_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._media_override.disable()
+        shutil.rmtree(cls._media, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        registry.clear()
+        cache.clear()
+        self.central = UserProfile.objects.create(email="central@example.com", password="x", role="central")
+
+
+class ModelRegistryTests(MediaTestCase):
+    def test_falls_back_to_bundled_pickle(self):
+        entry = ModelRegistry().get("diabetes")
+        self.assertIsNone(entry.iteration_id)
+        self.assertEqual(entry.source, str(settings.INFERENCE_MODELS["diabetes"]["fallback"]))
+
+    def test_model_is_loaded_once(self):
+        reg = ModelRegistry()
+        self.assertIs(reg.get("diabetes"), reg.get("diabetes"))
+
+    def test_resolves_latest_finalized_iteration(self):
+        CentralAuthModel.objects.create(
+            central_auth=self.central, iteration_name="round-1", model_name="lr",
+            dataset_domain="Diabetes", model_file=pickled(Constant(1)), version=0,
+        )
+        CentralAuthModel.objects.create(
+            central_auth=self.central, iteration_name="round-2", model_name="lr",
+            dataset_domain="diabetes", model_file=pickled(Constant(0)), version=3,
+        )
+        entry = ModelRegistry().get("diabetes")
+        self.assertEqual(entry.estimator.value, 1)
+
+    def test_finalizing_iteration_hot_swaps(self):
+        before = registry.get("diabetes")
+        iteration = CentralAuthModel.objects.create(
+            central_auth=self.central, iteration_name="round-1", model_name="lr",
+            dataset_domain="diabetes", model_file=pickled(Constant(1)), version=2,
+        )
+        self.assertIs(registry.get("diabetes"), before)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            iteration.version = 0
+            iteration.save()
+
+        after = registry.get("diabetes")
+        self.assertEqual(after.iteration_id, iteration.id)
+        self.assertEqual(after.estimator.value, 1)
+
+
+class InferenceEndpointTests(MediaTestCase):
+    def test_diabetes_uses_registry_model(self):
+        CentralAuthModel.objects.create(
+            central_auth=self.central, iteration_name="round-1", model_name="lr",
+            dataset_domain="diabetes", model_file=pickled(Constant(1)), version=0,
+        )
+        response = self.client.post("/diabetes/", {"bmi": 31.5, "age": 9}, content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"diabetes": 1, "probability": 1.0})
+
+    def test_heartdisease_bundled_model(self):
+        response = self.client.post(
+            "/heartdisease/",
+            {"age": 50, "gender": 1, "height": 170, "weight": 80, "systolicBP": 140, "diastolicBP": 90,
+             "cholesterol": 2, "glucose": 1, "smoke": 0, "alcohol": 0, "active": 1},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(response.json()["heartdisease"], (0, 1))
+
+
+class FeatureSchemaTests(MediaTestCase):
+    HEART = {"age": 50, "gender": 1, "height": 170, "weight": 80, "cholesterol": 2, "glucose": 1, "active": 1}
+
+    def test_generic_route_accepts_aliases_and_columns(self):
+        named = self.client.post(
+            "/heartdisease/", {**self.HEART, "systolicBP": 140, "smoke": 1}, content_type="application/json"
+        ).json()
+        generic = self.client.post(
+            "/predict/heartdisease/", {**self.HEART, "systolic_pressure": 140, "smoker": 1},
+            content_type="application/json",
+        ).json()
+        self.assertEqual(generic, named)
+        self.assertEqual(self.client.post("/predict/nope/", {}, content_type="application/json").status_code, 404)
+        self.assertEqual(self.client.post("/predict/nope/batch/", [], content_type="application/json").status_code, 404)
+
+    def test_encode_uses_a_reusable_buffer(self):
+        schema = get_schema("heartdisease")
+        first = schema.encode({"age": 50, "systolicBP": "140"})
+        self.assertIs(schema.encode({"age": 51}), first)
+        self.assertIsNot(schema.encode({"age": 51}, reuse=False), first)
+        self.assertEqual(first.dtype, np.float64)
+        self.assertEqual(first[0, 0], 51)
+        self.assertEqual(first[0, schema.columns.index("systolic_pressure")], 0)  # default
+        with self.assertRaises(ValueError):
+            schema.encode({"age": "old"})
+
+    def test_registering_a_schema_serves_a_new_model(self):
+        path = os.path.join(self._media, "toy.pkl")
+        with open(path, "wb") as f:
+            pickle.dump(Constant(1), f)
+        register(FeatureSchema("toy", [Feature("x", float, ("X",)), Feature("y", int, default=3)]))
+        self.addCleanup(SCHEMAS.pop, "toy")
+        models = {**settings.INFERENCE_MODELS, "toy": {"domains": ["toy"], "fallback": path}}
+        with override_settings(INFERENCE_MODELS=models):
+            response = self.client.post("/predict/toy/", {"X": 0.5}, content_type="application/json")
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json(), {"toy": 1, "probability": 1.0})
+
+    def test_bind_rejects_models_fitted_on_other_columns(self):
+        model = linear_model([1, 1], 0)
+        model.feature_names_in_ = np.array(["a", "b"], dtype=object)
+        with self.assertRaises(SchemaMismatch):
+            get_schema("diabetes").bind(model)
+
+
+class BatchInferenceTests(MediaTestCase):
+    def read_ndjson(self, response):
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        body = b"".join(response.streaming_content).decode()
+        return [json.loads(line) for line in body.splitlines()]
+
+    @override_settings(INFERENCE_BATCH_CHUNK_SIZE=2)
+    def test_json_batch_matches_single_record_endpoint(self):
+        records = [{"bmi": 22, "age": 3}, {"bmi": 35.5, "age": 11, "highBP": 1}, {"genHlth": 5, "bmi": 40}]
+        response = self.client.post("/diabetes/batch/", records, content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+
+        lines = self.read_ndjson(response)
+        self.assertEqual([line["row"] for line in lines], [0, 1, 2])
+        for record, line in zip(records, lines):
+            single = self.client.post("/diabetes/", record, content_type="application/json").json()
+            self.assertEqual(line["diabetes"], single["diabetes"])
+            self.assertAlmostEqual(line["probability"], single["probability"])
+
+    def test_csv_upload_reports_invalid_rows(self):
+        csv = SimpleUploadedFile(
+            "clinic.csv",
+            b"age;gender;systolicBP;diastolicBP\n50;1;140;90\nold;2;120;80\n61;2;;85\n",
+            content_type="text/csv",
+        )
+        response = self.client.post("/heartdisease/batch/?sep=;", {"file": csv})
+        lines = self.read_ndjson(response)
+        self.assertEqual(len(lines), 3)
+        self.assertIn("heartdisease", lines[0])
+        self.assertIn("error", lines[1])
+        self.assertIn("heartdisease", lines[2])
+
+    def test_rejects_non_record_payload(self):
+        response = self.client.post("/diabetes/batch/", {"bmi": 22}, content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+
+
+class Echo:
+    """Estimator whose positive-class probability is the first feature; counts calls."""
+
+    def __init__(self):
+        self.calls = []
+
+    def predict_proba(self, X):
+        self.calls.append(len(X))
+        p = np.asarray(X, dtype=float)[:, 0]
+        return np.column_stack([1 - p, p])
+
+
+class MicroBatcherTests(TestCase):
+    def test_concurrent_requests_share_one_batch(self):
+        model = LoadedModel(name="echo", estimator=Echo(), source="memory")
+        batcher = MicroBatcher("echo", window=0.2, max_size=8)
+        values = [i / 10 for i in range(8)]
+        results = {}
+
+        def call(v):
+            results[v] = batcher.predict(model, np.array([[v, 0.0]]))
+
+        threads = [threading.Thread(target=call, args=(v,)) for v in values]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        for v in values:
+            self.assertAlmostEqual(results[v][1], v)
+            self.assertEqual(results[v][0], int(v > 0.5))
+        self.assertEqual(sum(model.estimator.calls), 8)
+        self.assertLess(len(model.estimator.calls), 8)
+
+        stats = batcher.stats()
+        self.assertEqual(stats["requests"], 8)
+        self.assertEqual(stats["queue_depth"], 0)
+        self.assertEqual(stats["batches"], len(model.estimator.calls))
+
+    def test_scoring_errors_reach_every_caller(self):
+        model = LoadedModel(name="broken", estimator=object(), source="memory")
+        future = MicroBatcher("broken", window=0).submit(model, np.array([[1.0]]))
+        with self.assertRaises(AttributeError):
+            future.result(timeout=5)
+
+
+class InferencePoolTests(MediaTestCase):
+    FEATURES = {"bmi": 31.5, "age": 9}
+
+    def test_admission_is_bounded(self):
+        pool = InferencePool(workers=1, max_queue=2)
+        pool.admit()
+        pool.admit()
+        with self.assertRaises(PoolSaturated):
+            pool.admit()
+        pool.release()
+        pool.admit()
+        self.assertEqual(pool.stats()["queued_or_running"], 2)
+        self.assertEqual(pool.stats()["rejected"], 1)
+
+    @override_settings(INFERENCE_POOL_WORKERS=1)
+    def test_full_queue_sheds_load_with_503(self):
+        with mock.patch("api.pool._pool", InferencePool(workers=1, max_queue=0, retry_after=3)):
+            response = self.client.post("/diabetes/", self.FEATURES, content_type="application/json")
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response["Retry-After"], "3")
+            self.assertEqual(self.client.get("/inference/metrics/").json()["pool"]["rejected"], 1)
+
+    def test_worker_process_scores_like_in_process(self):
+        model = registry.get("diabetes")
+        X = get_schema("diabetes").encode(self.FEATURES, reuse=False)
+        pool = InferencePool(workers=1, max_queue=4)
+        try:
+            labels, probabilities = pool.submit(model, X).result(timeout=120)
+        finally:
+            pool.shutdown()
+        expected_labels, expected_probabilities = score(model.estimator, X)
+        self.assertEqual(list(labels), list(expected_labels))
+        self.assertAlmostEqual(probabilities[0], expected_probabilities[0])
+        self.assertEqual(pool.stats()["tasks"], 1)
+
+
+    def test_dead_worker_is_replaced_and_the_request_retried(self):
+        model = registry.get("diabetes")
+        X = get_schema("diabetes").encode(self.FEATURES, reuse=False)
+        pool = InferencePool(workers=1, max_queue=4)
+        try:
+            pid = pool.start()._executor.submit(_ping).result(timeout=120)
+            os.kill(pid, signal.SIGKILL)
+            with self.assertLogs("api.pool", "WARNING"):
+                labels, _ = pool.submit(model, X).result(timeout=120)
+            self.assertEqual(list(labels), list(score(model.estimator, X)[0]))
+            self.assertNotEqual(pool._executor.submit(_ping).result(timeout=120), pid)
+        finally:
+            pool.shutdown()
+
+class PredictionCacheTests(MediaTestCase):
+    def predict(self, **features):
+        response = self.client.post("/diabetes/", features, content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def finalize(self, value, name):
+        with self.captureOnCommitCallbacks(execute=True):
+            CentralAuthModel.objects.create(
+                central_auth=self.central, iteration_name=name, model_name="lr",
+                dataset_domain="diabetes", model_file=pickled(Constant(value)), version=0,
+            )
+
+    def test_repeated_profile_skips_the_model(self):
+        before = self.client.get("/inference/metrics/").json()["cache"]
+        with mock.patch("api.batching.score", wraps=score) as scored:
+            first = self.predict(bmi=31.5, age=9)
+            self.assertEqual(self.predict(bmi="31.50", age=9.0), first)
+        self.assertEqual(scored.call_count, 1)
+        after = self.client.get("/inference/metrics/").json()["cache"]
+        self.assertEqual(after["hits"] - before["hits"], 1)
+        self.assertEqual(after["misses"] - before["misses"], 1)
+        self.assertGreater(after["hit_rate"], 0)
+
+    def test_model_swap_invalidates_entries(self):
+        self.finalize(1, "round-1")
+        self.assertEqual(self.predict(bmi=30)["diabetes"], 1)
+        self.finalize(0, "round-2")
+        self.assertEqual(self.predict(bmi=30)["diabetes"], 0)
+
+    def test_lru_eviction_and_ttl(self):
+        cache_ = PredictionCache(max_size=2, ttl=60)
+        model = LoadedModel(name="m", estimator=None, source="memory")
+        keys = [cache_.key(model, np.array([[float(i)]])) for i in range(3)]
+        cache_.put(keys[0], (0, 0.0))
+        cache_.put(keys[1], (1, 1.0))
+        cache_.get(keys[0])  # most recently used
+        cache_.put(keys[2], (2, 2.0))
+        self.assertIsNone(cache_.get(keys[1]))
+        self.assertEqual(cache_.get(keys[0]), (0, 0.0))
+        self.assertEqual(cache_.stats()["evictions"], 1)
+
+        expired = PredictionCache(max_size=2, ttl=-1)
+        expired.put(keys[0], (0, 0.0))
+        self.assertIsNone(expired.get(keys[0]))
+        self.assertIsNone(cache_.key(model, np.array([[1.0], [2.0]])))  # only single rows
+
+
+def linear_model(coef, intercept):
+    from sklearn.linear_model import LogisticRegression
+
+    model = LogisticRegression()
+    model.classes_ = np.array([0, 1])
+    model.coef_ = np.array([coef], dtype=float)
+    model.intercept_ = np.array([intercept], dtype=float)
+    return model
+
+
+class IterationTestCase(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.iteration = CentralAuthModel.objects.create(
+            central_auth=self.central, iteration_name="round-1", model_name="lr",
+            dataset_domain="diabetes", model_file=pickled(linear_model([0, 0], 0)), version=1,
+        )
+
+    def submit(self, email, coef, intercept, num_samples=None):
+        client, _ = UserProfile.objects.get_or_create(email=email, defaults={"password": "x", "role": "client"})
+        assignment, _ = CentralClientAssignment.objects.get_or_create(
+            client=client, central_auth=self.central, iteration_name="round-1",
+            defaults={"data_domain": "diabetes", "model_name": "lr", "iteration": self.iteration},
+        )
+        return ClientModel.objects.create(
+            assignment=assignment, model_file=pickled(linear_model(coef, intercept)),
+            num_samples=num_samples, version=1,
+        )
+
+    def aggregate(self):
+        """Queue aggregation, run the job and return its final status."""
+        response = self.client.post(f"/central-models/{self.iteration.id}/aggregate/", {"central_auth_id": self.central.id})
+        self.assertEqual(response.status_code, 202, response.content)
+        run_pending()
+        return self.client.get(response["Location"]).json()
+
+
+class AggregationTests(IterationTestCase):
+    def test_weighted_average_is_sample_weighted(self):
+        averaged = weighted_average({"coef_": np.array([[1.0, 2.0], [3.0, 6.0]])}, [1, 3])
+        np.testing.assert_allclose(averaged["coef_"], [2.5, 5.0])
+
+    def test_aggregate_creates_next_version_from_latest_submissions(self):
+        self.submit("a@example.com", [9, 9], 9, num_samples=10)  # superseded below
+        self.submit("a@example.com", [1, 2], 1, num_samples=100)
+        self.submit("b@example.com", [3, 4], 3, num_samples=300)
+
+        job = self.aggregate()
+        self.assertEqual(job["status"], "succeeded")
+        self.assertEqual(job["result"]["version"], 2)
+
+        global_model = CentralAuthModel.objects.get(id=job["result"]["id"])
+        with global_model.model_file.open("rb") as f:
+            estimator = pickle.load(f)
+        np.testing.assert_allclose(estimator.coef_, [[2.5, 3.5]])
+        np.testing.assert_allclose(estimator.intercept_, [2.5])
+
+    def test_aggregate_without_submissions(self):
+        response = self.client.post(f"/central-models/{self.iteration.id}/aggregate/", {"central_auth_id": self.central.id})
+        self.assertEqual(response.status_code, 400)
+
+    def test_same_round_name_of_another_central_is_not_averaged_in(self):
+        other = UserProfile.objects.create(email="other@example.com", password="x", role="central")
+        other_iteration = CentralAuthModel.objects.create(
+            central_auth=other, iteration_name="round-1", model_name="lr",
+            dataset_domain="diabetes", model_file=pickled(linear_model([0, 0], 0)), version=1,
+        )
+        client = UserProfile.objects.create(email="c@example.com", password="x", role="client")
+        ClientModel.objects.create(
+            assignment=CentralClientAssignment.objects.create(
+                client=client, central_auth=other, iteration_name="round-1",
+                data_domain="diabetes", model_name="lr", iteration=other_iteration,
+            ),
+            model_file=pickled(linear_model([100, 100], 100)), version=1,
+        )
+        response = self.client.post(f"/central-models/{self.iteration.id}/aggregate/", {"central_auth_id": self.central.id})
+        self.assertEqual(response.status_code, 400)  # only the other central has submissions
+
+        self.submit("a@example.com", [1, 2], 1)
+        job = self.aggregate()
+        with CentralAuthModel.objects.get(id=job["result"]["id"]).model_file.open("rb") as f:
+            np.testing.assert_allclose(pickle.load(f).coef_, [[1, 2]])
+
+    def test_non_linear_models_are_rejected(self):
+        self.submit("a@example.com", [1, 2], 1)
+        ClientModel.objects.create(
+            assignment=CentralClientAssignment.objects.get(), model_file=pickled(Constant(1)), version=2,
+        )
+        job = self.aggregate()
+        self.assertEqual((job["status"], job["attempts"]), ("failed", 1))
+        self.assertIn("may not reference api.tests.Constant", job["error"])
+
+        from sklearn.linear_model import LogisticRegression
+
+        ClientModel.objects.create(
+            assignment=CentralClientAssignment.objects.get(), model_file=pickled(LogisticRegression()), version=3,
+        )
+        job = self.aggregate()
+        self.assertEqual((job["status"], job["attempts"]), ("failed", 1))  # not retried
+        self.assertIn("only linear models", job["error"])
+
+
+class RunningAggregationTests(IterationTestCase):
+    def upload(self, assignment, coef, intercept, num_samples):
+        return self.client.post("/client/submit-model/", {
+            "assignment": assignment.id,
+            "model_file": pickled(linear_model(coef, intercept)),
+            "num_samples": num_samples,
+            "version": 1,
+        })
+
+    def test_submissions_fold_into_accumulator(self):
+        a = self.submit("a@example.com", [0, 0], 0).assignment
+        b = self.submit("b@example.com", [0, 0], 0).assignment
+        ClientModel.objects.all().delete()
+
+        self.assertEqual(self.upload(a, [9, 9], 9, 100).status_code, 201)
+        self.assertEqual(self.upload(a, [1, 2], 1, 100).status_code, 201)  # replaces the first
+        self.assertEqual(self.upload(b, [3, 4], 3, 300).status_code, 201)
+
+        accumulator = IterationAccumulator.objects.get(iteration_name="round-1")
+        self.assertEqual(accumulator.total_weight, 400)
+        self.assertEqual(accumulator.contributions.count(), 2)
+
+        # Closing the round reads the accumulator only, not the client files.
+        for client_model in ClientModel.objects.all():
+            client_model.model_file.delete(save=False)
+        job = self.aggregate()
+        self.assertEqual(job["status"], "succeeded")
+        with CentralAuthModel.objects.get(id=job["result"]["id"]).model_file.open("rb") as f:
+            estimator = pickle.load(f)
+        np.testing.assert_allclose(estimator.coef_, [[2.5, 3.5]])
+
+    def test_same_round_name_of_another_central_has_its_own_accumulator(self):
+        a = self.submit("a@example.com", [0, 0], 0).assignment
+        other = UserProfile.objects.create(email="other@example.com", password="x", role="central")
+        client = UserProfile.objects.create(email="c@example.com", password="x", role="client")
+        b = CentralClientAssignment.objects.create(
+            client=client, central_auth=other, iteration_name="round-1", data_domain="diabetes", model_name="lr",
+        )
+        self.assertEqual(self.upload(a, [1, 2], 1, 100).status_code, 201)
+        self.assertEqual(self.upload(b, [9, 9], 9, 100).status_code, 201)
+
+        accumulators = IterationAccumulator.objects.filter(iteration_name="round-1")
+        self.assertEqual(sorted(acc.central_auth_id for acc in accumulators), sorted([self.central.id, other.id]))
+        job = self.aggregate()
+        with CentralAuthModel.objects.get(id=job["result"]["id"]).model_file.open("rb") as f:
+            np.testing.assert_allclose(pickle.load(f).coef_, [[1, 2]])
+
+    def test_deleting_a_contributing_client_withdraws_its_weight(self):
+        a = self.submit("a@example.com", [0, 0], 0).assignment
+        b = self.submit("b@example.com", [0, 0], 0).assignment
+        ClientModel.objects.all().delete()
+        self.assertEqual(self.upload(a, [1, 2], 1, 100).status_code, 201)
+        self.assertEqual(self.upload(b, [9, 9], 9, 300).status_code, 201)
+
+        b.client.delete()  # cascades to the assignment, its model and its contribution
+        accumulator = IterationAccumulator.objects.get(iteration_name="round-1")
+        self.assertEqual((accumulator.total_weight, accumulator.contributions.count()), (100, 1))
+        job = self.aggregate()
+        self.assertEqual(job["status"], "succeeded")
+        with CentralAuthModel.objects.get(id=job["result"]["id"]).model_file.open("rb") as f:
+            estimator = pickle.load(f)
+        np.testing.assert_allclose(estimator.coef_, [[1, 2]])
+        np.testing.assert_allclose(estimator.intercept_, [1])
+
+    def test_non_linear_submission_is_still_stored(self):
+        from sklearn.linear_model import LogisticRegression
+
+        a = self.submit("a@example.com", [0, 0], 0).assignment
+        response = self.client.post("/client/submit-model/", {
+            "assignment": a.id, "model_file": pickled(LogisticRegression()), "version": 2,
+        })
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(IterationAccumulator.objects.exists())
+
+    def test_pickles_naming_other_code_are_rejected_unrun(self):
+        a = self.submit("a@example.com", [0, 0], 0).assignment
+        marker = os.path.join(self._media, "pwned")
+        for estimator in (Exploit(marker), Constant(1)):
+            response = self.client.post("/client/submit-model/", {
+                "assignment": a.id, "model_file": pickled(estimator), "version": 2,
+            })
+            self.assertEqual(response.status_code, 400)
+            self.assertIn("may not reference", response.json()["model_file"][0])
+        self.assertFalse(os.path.exists(marker))
+        self.assertEqual(ClientModel.objects.count(), 1)
+
+
+class QueryCountTests(IterationTestCase):
+    def add_clients(self, count, start=0):
+        for i in range(start, start + count):
+            self.submit(f"client{i}@example.com", [i, i], i)
+
+    def test_submissions_query_count_is_constant(self):
+        url = f"/central-models/{self.iteration.id}/submissions/?user_id={self.central.id}"
+        self.add_clients(2)
+        with self.assertNumQueries(3):
+            self.assertEqual(len(self.client.get(url).json()), 2)
+        self.add_clients(20, start=2)
+        self.submit("client0@example.com", [7, 7], 7)  # resubmission: still one row per client
+        with self.assertNumQueries(3):
+            rows = self.client.get(url).json()
+        self.assertEqual(len(rows), 22)
+        self.assertEqual(rows[0]["client_email"], "client0@example.com")
+
+    def test_iteration_clients_query_count_is_constant(self):
+        url = f"/central-models/{self.iteration.id}/clients/?user_id={self.central.id}"
+        self.add_clients(2)
+        with self.assertNumQueries(3):
+            self.client.get(url)
+        self.add_clients(20, start=2)
+        with self.assertNumQueries(3):
+            self.assertEqual(len(self.client.get(url).json()), 22)
+
+
+class IterationOwnershipTests(IterationTestCase):
+    def setUp(self):
+        super().setUp()
+        self.other = UserProfile.objects.create(email="other@example.com", password="x", role="central")
+        self.submit("client0@example.com", [1, 1], 1)
+
+    def patch(self, data, **extra):
+        return self.client.patch(
+            f"/central-models/{self.iteration.id}/",
+            encode_multipart(BOUNDARY, data), content_type=MULTIPART_CONTENT, **extra,
+        )
+
+    def test_only_the_owner_reads_an_iteration(self):
+        for path in ("clients", "submissions"):
+            url = f"/central-models/{self.iteration.id}/{path}/"
+            with self.subTest(path):
+                self.assertEqual(self.client.get(url).status_code, 401)
+                self.assertEqual(self.client.get(f"{url}?user_id={self.other.id}").status_code, 403)
+                token = issue_token(self.other)
+                self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION=f"Bearer {token}").status_code, 403)
+                token = issue_token(self.central)
+                response = self.client.get(url, HTTP_AUTHORIZATION=f"Bearer {token}")
+                self.assertEqual(len(response.json()), 1)
+
+    def test_only_the_owner_aggregates_or_evaluates_an_open_iteration(self):
+        for action in ("aggregate", "evaluate"):
+            url = f"/central-models/{self.iteration.id}/{action}/"
+            with self.subTest(action):
+                self.assertEqual(self.client.post(url).status_code, 401)
+                self.assertEqual(self.client.post(url, {"central_auth_id": self.other.id}).status_code, 403)
+                token = issue_token(self.other)
+                self.assertEqual(self.client.post(url, HTTP_AUTHORIZATION=f"Bearer {token}").status_code, 403)
+        self.assertFalse(Job.objects.filter(kind__in=["aggregate_iteration", "evaluate_submissions"]).exists())
+
+        self.iteration.version = 0
+        self.iteration.save()
+        response = self.client.post(f"/central-models/{self.iteration.id}/aggregate/", {"central_auth_id": self.central.id})
+        self.assertEqual(response.status_code, 400)
+        self.iteration.refresh_from_db()
+        self.assertEqual(self.iteration.version, 0)
+
+    def test_only_the_owner_updates_an_iteration(self):
+        self.assertEqual(self.patch({"version": 5}).status_code, 400)
+        self.assertEqual(self.patch({"central_auth": self.other.id, "version": 5}).status_code, 403)
+        token = issue_token(self.other)
+        # A body naming the owner does not stand in for the token's user
+        response = self.patch({"central_auth": self.central.id, "version": 5}, HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.assertEqual(response.status_code, 403)
+        self.iteration.refresh_from_db()
+        self.assertEqual(self.iteration.version, 1)
+
+        token = issue_token(self.central)
+        self.assertEqual(self.patch({"version": 5}, HTTP_AUTHORIZATION=f"Bearer {token}").status_code, 200)
+        self.iteration.refresh_from_db()
+        self.assertEqual(self.iteration.version, 5)
+
+
+class ClientEndpointQueryTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client_user = UserProfile.objects.create(email="client@example.com", password="x", role="client")
+
+    def add_rounds(self, start, end):
+        for i in range(start, end):
+            CentralAuthModel.objects.filter(version__gt=0).update(version=0)
+            iteration = CentralAuthModel.objects.create(
+                central_auth=self.central, iteration_name=f"round-{i}", model_name="lr",
+                model_file="central_models/lr.pkl", version=i + 1,
+            )
+            CentralClientAssignment.objects.create(
+                client=self.client_user, central_auth=self.central, data_domain="diabetes",
+                model_name="lr", iteration_name=f"round-{i}", iteration=iteration,
+            )
+
+    def test_current_client_iterations_query_count_is_constant(self):
+        url = "/client/current-iterations/client@example.com/"
+        self.add_rounds(0, 2)
+        with self.assertNumQueries(2):
+            self.client.get(url)
+        self.add_rounds(2, 30)
+        with self.assertNumQueries(2):
+            rows = self.client.get(url).json()
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["iteration_name"], "round-29")
+        self.assertEqual(rows[0]["version"], 30)
+        self.assertEqual(rows[0]["central_auth_email"], "central@example.com")
+
+    def test_client_dashboard_data_query_count_is_constant(self):
+        url = "/client-dashboard-data/client@example.com/"
+        self.add_rounds(0, 2)
+        with self.assertNumQueries(2):
+            self.client.get(url)
+        self.add_rounds(2, 30)
+        with self.assertNumQueries(2):
+            data = self.client.get(url).json()
+        self.assertEqual(data["total_rounds"], 30)
+        self.assertEqual(data["current_running_rounds"], 1)
+        self.assertEqual(data["total_finalized_models"], 29)
+
+    def test_benchmark_fixtures_reach_the_joined_rows(self):
+        out = io.StringIO()
+        call_command("bench_client_endpoints", "--sizes", "3", "--repeat", "1", stdout=out)
+        self.assertIn("current_client_iterations", out.getvalue())
+        self.assertFalse(UserProfile.objects.filter(email__startswith="bench-").exists())  # rolled back
+
+
+class AssignmentIterationLinkTests(IterationTestCase):
+    def assign(self, email, iteration_name):
+        client, _ = UserProfile.objects.get_or_create(email=email, defaults={"password": "x", "role": "client"})
+        return self.client.post("/assign_client/", {
+            "central_auth_id": self.central.id, "client_id": client.id, "data_domain": "diabetes",
+            "model_name": "lr", "iteration_name": iteration_name,
+        }, content_type="application/json")
+
+    def test_assignment_links_to_iteration(self):
+        response = self.assign("a@example.com", "round-1")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["iteration"], self.iteration.id)
+
+        # Already in a running iteration
+        self.assertEqual(self.assign("a@example.com", "round-1").status_code, 400)
+
+        self.iteration.version = 0
+        self.iteration.save()
+        self.assertEqual(self.assign("a@example.com", "round-2").status_code, 201)
+
+    def test_start_iteration_links_earlier_assignments(self):
+        self.assertIsNone(self.assign("a@example.com", "round-2").json()["iteration"])
+        response = self.client.post("/central-models/start/", {
+            "central_auth": self.central.id, "iteration_name": "round-2", "model_name": "lr",
+            "dataset_domain": "diabetes", "version": 1, "model_file": pickled(linear_model([0, 0], 0)),
+        })
+        self.assertEqual(response.status_code, 201)
+        assignment = CentralClientAssignment.objects.get(iteration_name="round-2")
+        self.assertEqual(assignment.iteration_id, response.json()["id"])
+
+    def test_aggregated_version_carries_assignments(self):
+        self.submit("a@example.com", [1, 1], 1)
+        job = self.aggregate()
+        self.assertEqual(CentralClientAssignment.objects.get().iteration_id, job["result"]["id"])
+
+
+class JobQueueTests(IterationTestCase):
+    def setUp(self):
+        super().setUp()
+        self.calls = []
+
+        @task("flaky", permanent=(LookupError,))
+        def flaky(job, fail=0, error="ValueError"):
+            self.calls.append(job.attempts)
+            if len(self.calls) <= fail:
+                raise {"ValueError": ValueError, "LookupError": LookupError}[error]("boom")
+            return {"calls": len(self.calls)}
+
+        self.addCleanup(TASKS.pop, "flaky")
+
+    def test_aggregation_returns_202_and_reports_progress(self):
+        self.submit("a@example.com", [1, 1], 1)
+        response = self.client.post(f"/central-models/{self.iteration.id}/aggregate/", {"central_auth_id": self.central.id})
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()["status"], "queued")
+        self.assertEqual(CentralAuthModel.objects.count(), 1)  # nothing ran in the request
+
+        again = self.client.post(f"/central-models/{self.iteration.id}/aggregate/", {"central_auth_id": self.central.id})
+        self.assertEqual(again.json()["id"], response.json()["id"])  # not queued twice
+
+        with self.captureOnCommitCallbacks(execute=True):
+            run_pending()
+        job = self.client.get(response["Location"]).json()
+        self.assertEqual((job["status"], job["progress"]), ("succeeded", 1.0))
+        self.assertEqual(job["result"]["version"], 2)
+        # The new version's artifact conversion was queued after it committed
+        run_pending()
+        self.assertTrue(Job.objects.filter(kind="convert_model", status="succeeded").exists())
+        self.assertEqual(self.client.get(f"/jobs/{Job.objects.model().id}/").status_code, 404)
+
+    def test_failed_attempts_are_retried_with_backoff(self):
+        job = enqueue("flaky", {"fail": 2}, max_attempts=3)
+        with override_settings(JOB_RETRY_BACKOFF=10):
+            self.assertEqual(run_pending(), 1)
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts), ("queued", 1))
+            self.assertGreater((job.run_after - job.created_at).total_seconds(), 9)
+            self.assertEqual(run_pending(), 0)  # not due yet
+            self.assertEqual(backoff(3), 40)
+
+        Job.objects.filter(pk=job.pk).update(run_after=job.created_at)
+        run_pending()
+        Job.objects.filter(pk=job.pk).update(run_after=job.created_at)
+        run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.result), ("succeeded", {"calls": 3}))
+        self.assertEqual(self.calls, [1, 2, 3])
+
+    def test_permanent_errors_and_exhausted_attempts_fail(self):
+        permanent = enqueue("flaky", {"fail": 1, "error": "LookupError"})
+        exhausted = enqueue("flaky", {"fail": 5}, max_attempts=1)
+        run_pending()
+        for job in (permanent, exhausted):
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts), ("failed", 1))
+            self.assertIn("boom", job.error)
+
+    def test_expired_lease_is_reclaimed(self):
+        job = enqueue("flaky")
+        self.assertEqual(claim("dead-worker").pk, job.pk)
+        self.assertIsNone(claim("other"))  # leased
+        with override_settings(JOB_LEASE_SECONDS=-1):
+            reclaimed = claim("other")
+        self.assertEqual((reclaimed.pk, reclaimed.locked_by, reclaimed.attempts), (job.pk, "other", 2))
+
+    def test_racing_enqueues_share_the_queued_job(self):
+        queued = enqueue("flaky", key="k")
+        filter = Job.objects.filter
+        lookups = []
+
+        def racing_filter(*args, **kwargs):
+            lookups.append(kwargs)
+            return Job.objects.none() if len(lookups) == 1 else filter(*args, **kwargs)
+
+        # The first lookup misses, as if the other enqueue had not committed yet
+        with mock.patch.object(Job.objects, "filter", side_effect=racing_filter):
+            self.assertEqual(enqueue("flaky", key="k").pk, queued.pk)
+        self.assertEqual(Job.objects.filter(key="k").count(), 1)
+
+    def test_worker_that_lost_its_lease_does_not_record_an_outcome(self):
+        job = enqueue("flaky")
+        stale = claim("slow-worker")
+        with override_settings(JOB_LEASE_SECONDS=-1):
+            claim("other")
+        with self.assertLogs("api.jobs", "WARNING"):
+            run(stale)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.locked_by, job.result), ("running", "other", None))
+
+    def test_retry_is_dropped_when_a_newer_job_is_queued(self):
+        running = enqueue("flaky", {"fail": 1}, key="k", dedupe=(Job.QUEUED,))
+        claimed = claim("worker")
+        newer = enqueue("flaky", key="k", dedupe=(Job.QUEUED,))
+        self.assertNotEqual(newer.pk, running.pk)
+        run(claimed)
+        running.refresh_from_db()
+        self.assertEqual((running.status, running.locked_by), ("failed", ""))
+        self.assertIn("Superseded", running.message)
+        self.assertEqual(Job.objects.get(key="k", status="queued").pk, newer.pk)
+
+    def test_run_jobs_command(self):
+        enqueue("flaky")
+        out = io.StringIO()
+        call_command("run_jobs", "--once", stdout=out)
+        self.assertIn("succeeded flaky", out.getvalue())
+        self.assertIn("ran 1 jobs", out.getvalue())
+
+
+def reference_dataset(test, rows=200):
+    """Serve a synthetic diabetes reference CSV, labelled by its HighBP flag, for the rest of `test`."""
+    columns = get_schema("diabetes").columns
+    rng = np.random.default_rng(0)
+    frame = pd.DataFrame(rng.integers(0, 2, size=(rows, len(columns))), columns=columns)
+    frame.insert(0, "id", range(rows))
+    frame["label"] = frame["HighBP"]
+    path = os.path.join(test._media, "reference.csv")
+    frame.to_csv(path, sep=";", index=False)
+    datasets = {"diabetes": {"path": path, "sep": ";", "target": "label", "test_size": 0.25, "seed": 1}}
+    test.enterContext(override_settings(EVALUATION_DATASETS=datasets))
+    return frame
+
+
+class EvaluationTests(IterationTestCase):
+    COLUMNS = get_schema("diabetes").columns
+
+    def setUp(self):
+        super().setUp()
+        reference_dataset(self)
+
+    def model(self, coef_high_bp, intercept=0.0):
+        coef = np.zeros(len(self.COLUMNS))
+        coef[self.COLUMNS.index("HighBP")] = coef_high_bp
+        return linear_model(coef, intercept)
+
+    def upload(self, estimator, email="a@example.com"):
+        assignment = self.submit(email, [0, 0], 0).assignment
+        ClientModel.objects.filter(assignment=assignment).delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post("/client/submit-model/", {
+                "assignment": assignment.id, "model_file": pickled(estimator), "accuracy": 0.99, "version": 1,
+            })
+        self.assertEqual(response.status_code, 201)
+        return ClientModel.objects.get(assignment=assignment)
+
+    def test_submissions_are_scored_on_the_held_out_split(self):
+        good = self.upload(self.model(10, -5), "a@example.com")
+        bad = self.upload(self.model(-10, 5), "b@example.com")
+        jobs = Job.objects.filter(kind="evaluate_submissions")
+        self.assertEqual(jobs.count(), 1)  # the second submission joined the queued job
+
+        run_pending()
+        self.assertEqual(jobs.get().result, {"evaluated": 2})
+        good.refresh_from_db()
+        bad.refresh_from_db()
+        self.assertEqual((good.accuracy, good.server_accuracy, good.server_f1_score), (0.99, 1.0, 1.0))
+        self.assertEqual((bad.server_accuracy, bad.server_recall), (0.0, 0.0))
+
+        rows = self.client.get(f"/central-models/{self.iteration.id}/submissions/?user_id={self.central.id}").json()
+        self.assertEqual(sorted(r["server_accuracy"] for r in rows), [0.0, 1.0])
+        X, y = build_validation_set("diabetes")
+        self.assertEqual((X.shape, y.shape), ((50, len(self.COLUMNS)), (50,)))
+
+    def test_unscorable_submissions_record_an_error(self):
+        wrong_shape = self.upload(linear_model([1, 1], 0))
+        response = self.client.post(f"/central-models/{self.iteration.id}/evaluate/", {"central_auth_id": self.central.id})
+        self.assertEqual(response.status_code, 202)
+        run_pending()
+        wrong_shape.refresh_from_db()
+        self.assertIsNotNone(wrong_shape.evaluated_at)
+        self.assertIsNone(wrong_shape.server_accuracy)
+        self.assertIn("ValueError", wrong_shape.evaluation_error)
+
+        with override_settings(EVALUATION_DATASETS={}):
+            other = self.upload(self.model(1), "b@example.com")
+            self.assertFalse(Job.objects.filter(status="queued").exists())  # nothing to score it on
+            evaluate_submissions([other])
+        other.refresh_from_db()
+        self.assertIn("No validation set", other.evaluation_error)
+
+    def test_submission_files_are_never_unpickled_unrestricted(self):
+        marker = os.path.join(self._media, "evaluated")
+        planted = self.submit("a@example.com", [0, 0], 0)
+        # A file that predates upload validation, or was swapped on disk
+        with open(planted.model_file.path, "wb") as f:
+            pickle.dump(Exploit(marker), f)
+        evaluate_submissions([planted])
+        planted.refresh_from_db()
+        self.assertIn("may not reference", planted.evaluation_error)
+        self.assertFalse(os.path.exists(marker))
+
+    def test_process_pool_matches_in_process_scoring(self):
+        submissions = [self.upload(self.model(c, -c / 2), f"{i}@example.com") for i, c in enumerate((4, -4, 1))]
+        self.addCleanup(shutdown_executor)
+        with override_settings(EVALUATION_WORKERS=2):
+            self.assertEqual(evaluate_submissions(submissions), 3)
+        pooled = list(ClientModel.objects.order_by("id").values_list("server_accuracy", flat=True))
+        ClientModel.objects.update(server_accuracy=None)
+        evaluate_submissions(submissions)
+        self.assertEqual(list(ClientModel.objects.order_by("id").values_list("server_accuracy", flat=True)), pooled)
+        self.assertEqual(pooled[:2], [1.0, 0.0])
+
+
+class DatasetPartitionTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.frame = reference_dataset(self, rows=400)
+
+    def test_columns_are_converted_once(self):
+        directory = convert("diabetes")
+        columns = load_columns("diabetes", ["BMI", "label"])
+        self.assertIsInstance(columns["BMI"], np.memmap)
+        np.testing.assert_array_equal(columns["label"], self.frame["label"])
+        with mock.patch("api.datasets.read_reference") as read:
+            self.assertEqual(convert("diabetes"), directory)
+        read.assert_not_called()
+
+    def test_iid_shards_cover_the_training_rows(self):
+        directory = partition("diabetes", 4, seed=3)
+        train, validation = split_indices("diabetes", 400)
+        shards = [open_shard(directory, client) for client in range(4)]
+        self.assertEqual([len(y) for _, y in shards], [75, 75, 75, 75])
+        self.assertEqual(sum(len(y) for _, y in shards), len(train))
+        self.assertEqual(partition("diabetes", 4, seed=3), directory)
+
+        X, y = shards[1]
+        self.assertIsInstance(X, np.memmap)
+        self.assertFalse(X.flags.writeable)
+        X_all, _ = load_xy("diabetes")
+        handed_out = {tuple(row) for shard, _ in shards for row in np.asarray(shard)}
+        self.assertTrue(handed_out <= {tuple(row) for row in X_all[train]})
+
+        shutil.rmtree(directory)
+        np.testing.assert_array_equal(open_shard(partition("diabetes", 4, seed=3), 1)[0], X)  # same seed, same rows
+        with self.assertRaises(DatasetError):
+            open_shard(directory, 4)
+
+    def test_dirichlet_shards_are_label_skewed(self):
+        directory = partition("diabetes", 5, scheme="dirichlet", alpha=0.1, seed=0, min_size=5)
+        positive = [float(np.mean(open_shard(directory, client)[1])) for client in range(5)]
+        self.assertTrue(all(len(open_shard(directory, client)[1]) >= 5 for client in range(5)))
+        self.assertGreater(max(positive) - min(positive), 0.5)
+        self.assertNotEqual(directory, partition("diabetes", 5, scheme="dirichlet", alpha=0.1, seed=1, min_size=5))
+
+    def test_partition_dataset_command(self):
+        out = io.StringIO()
+        call_command("partition_dataset", "diabetes", "--clients", "3", stdout=out)
+        self.assertIn("client   2      100 rows", out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command("partition_dataset", "nope", stdout=out)
+
+
+class RoundSimulationTests(MediaTestCase):
+    def test_round_drives_every_endpoint_and_cleans_up(self):
+        report = RoundSimulator(3, concurrency=1).run()
+        self.assertEqual(report["scenario"], f"wsgi-{connection.vendor}-n3-c1")
+        for name in ENDPOINTS:
+            stats = report["endpoints"][name]
+            self.assertEqual((stats["requests"], stats["errors"]), (3, 0), name)
+            self.assertGreater(stats["max_queries"], 0, name)
+        self.assertGreater(report["peak_rss_mb"], 0)
+        self.assertFalse(UserProfile.objects.filter(email__startswith="sim-").exists())
+        self.assertFalse(ClientModel.objects.exists())
+        self.assertFalse(Job.objects.exists())
+        self.assertFalse(IterationAccumulator.objects.exists())
+        self.assertFalse(Blob.objects.exists())
+        self.assertFalse(os.path.exists(os.path.join(self._media, "blobs")))  # uploads went to a temporary root
+
+    def test_regressions_against_the_baseline(self):
+        stats = {"errors": 0, "requests": 10, "max_queries": 5, "p50_ms": 10.0, "p95_ms": 20.0}
+        baseline = {"wall_clock_s": 2.0, "peak_rss_mb": 100.0, "endpoints": {"assign_client": stats}}
+        self.assertEqual(compare(baseline, baseline), [])
+
+        report = {
+            "wall_clock_s": 3.5, "peak_rss_mb": 120.0,
+            "endpoints": {"assign_client": {**stats, "max_queries": 6, "p95_ms": 29.0, "errors": 1}},
+        }
+        problems = compare(report, baseline, tolerance=0.5)
+        self.assertEqual(len(problems), 3, problems)  # errors, queries, round time; p95 and RSS within tolerance
+        self.assertIn("6 queries per request vs baseline 5", problems[1])
+
+        path = os.path.join(self._media, "baselines.json")
+        save_baseline(path, {**baseline, "scenario": "wsgi-sqlite-n10-c1"})
+        with mock.patch("api.simulation.RoundSimulator.run", return_value={**report, "scenario": "wsgi-sqlite-n10-c1"}):
+            with self.assertRaisesMessage(CommandError, "Regressions"):
+                call_command("simulate_round", "--json", "--baselines", path, stdout=io.StringIO())
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}, EVALUATION_WORKERS=0,
+)
+class RoundBaselineTests(TransactionTestCase):
+    """The committed baseline has to match the tree it ships with."""
+
+    def test_committed_baseline_is_current(self):
+        # Real transactions, so each request issues the statements it does in
+        # production; sequential, as threads cannot share the test database.
+        # Latency, wall clock and RSS depend on the machine and are left to the
+        # simulate_round command.
+        scenario = f"wsgi-{connection.vendor}-n50-c8"
+        baseline = load_baselines(settings.SIMULATION_BASELINES).get(scenario)
+        if baseline is None:
+            self.skipTest(f"no committed baseline for {scenario}")
+        report = RoundSimulator(baseline["clients"], concurrency=1).run()
+        self.assertEqual(compare(report, baseline, tolerance=float("inf")), [])
+
+
+class RequestMetricsTests(IterationTestCase):
+    def test_requests_are_recorded_per_url_name(self):
+        url = f"/central-models/{self.iteration.id}/submissions/?user_id={self.central.id}"
+        self.submit("client0@example.com", [1, 1], 1)
+        requests, queries = requests_total.value("current_iteration_submissions", "GET", "200"), request_queries.count(
+            "current_iteration_submissions"
+        )
+        self.client.get(url)
+        self.assertEqual(requests_total.value("current_iteration_submissions", "GET", "200"), requests + 1)
+        self.assertEqual(request_queries.count("current_iteration_submissions"), queries + 1)
+
+        before = requests_total.value("unresolved", "GET", "404")
+        self.client.get("/no-such-page/")
+        self.assertEqual(requests_total.value("unresolved", "GET", "404"), before + 1)
+
+    def test_inference_is_recorded_per_model_version(self):
+        served = CentralAuthModel.objects.create(
+            central_auth=self.central, iteration_name="round-0", model_name="constant",
+            dataset_domain="diabetes", model_file=pickled(Constant(1)), version=0,
+        )
+        version = str(served.id)
+        rows = inference_rows.value("diabetes", version)
+        self.client.post("/diabetes/", {"bmi": 27.5, "age": 4}, content_type="application/json")
+        response = self.client.post("/diabetes/batch/", [{"bmi": 22}, {"bmi": 30}], content_type="application/json")
+        self.assertEqual(inference_rows.value("diabetes", version), rows + 1)
+
+        # Streamed bodies are measured once they have been sent.
+        sent = response_bytes.count("diabetes_batch")
+        b"".join(response.streaming_content)
+        response.close()
+        self.assertEqual(response_bytes.count("diabetes_batch"), sent + 1)
+        self.assertEqual(inference_rows.value("diabetes", version), rows + 3)
+
+    def test_prometheus_exposition(self):
+        self.client.get("/central-models/")
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        body = response.content.decode()
+        self.assertIn("# TYPE http_request_duration_seconds histogram", body)
+        self.assertIn('http_request_duration_seconds_bucket{view="list_central_models",method="GET",le="+Inf"}', body)
+
+        self.assertEqual(self.client.get("/metrics", REMOTE_ADDR="10.0.0.9").status_code, 403)
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = Histogram("latency", "Latency.", ("view",), buckets=(1, 5))
+        for value in (0.5, 3, 3, 9):
+            histogram.observe(value, 'say "hi"')
+        self.assertEqual(list(histogram.samples()), [
+            'latency_bucket{view="say \\"hi\\"",le="1"} 1',
+            'latency_bucket{view="say \\"hi\\"",le="5"} 3',
+            'latency_bucket{view="say \\"hi\\"",le="+Inf"} 4',
+            'latency_sum{view="say \\"hi\\""} 15.5',
+            'latency_count{view="say \\"hi\\""} 4',
+        ])
+
+
+class KeysetPaginationTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        for i in range(7):
+            CentralAuthModel.objects.create(
+                central_auth=self.central, iteration_name=f"round-{i}", model_name="lr",
+                model_file="central_models/lr.pkl", version=1,
+            )
+        self.url = f"/central-models/?user_id={self.central.id}"
+
+    def test_unpaginated_request_returns_full_list(self):
+        rows = self.client.get(self.url).json()
+        self.assertIsInstance(rows, list)
+        self.assertEqual(len(rows), 7)
+
+    def test_cursor_walks_every_row_once_in_order(self):
+        expected = list(CentralAuthModel.objects.order_by("-created_at", "-id").values_list("id", flat=True))
+        seen, url = [], self.url + "&page_size=3"
+        while url:
+            page = self.client.get(url).json()
+            self.assertLessEqual(len(page["results"]), 3)
+            seen += [row["id"] for row in page["results"]]
+            url = page["next"] and f"{self.url}&page_size=3&cursor={page['next']}"
+        self.assertEqual(seen, expected)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url + "&cursor=not-a-cursor")
+        self.assertEqual(response.status_code, 400)
+
+
+class ResponseCacheTests(IterationTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client_user = UserProfile.objects.create(email="client@example.com", password="x", role="client")
+        self.url = f"/central-models/running/?user_id={self.central.id}"
+
+    def test_unchanged_poll_is_304_without_queries(self):
+        first = self.client.get(self.url)
+        self.assertEqual(first.status_code, 200)
+        etag = first["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+        # A cached body is served to a poll without a matching validator
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), first.json())
+
+    def test_responses_are_cached_per_user_and_query(self):
+        other = UserProfile.objects.create(email="other@example.com", password="x", role="central")
+        etag = self.client.get(self.url)["ETag"]
+        response = self.client.get(f"/central-models/running/?user_id={other.id}", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), [])
+        response = self.client.get(self.url + "&page_size=1", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_writes_invalidate_affected_users(self):
+        client_url = f"/client-models/?user_id={self.client_user.id}"
+        assign_url = "/fetch_assign/central@example.com/"
+        etags = {url: self.client.get(url)["ETag"] for url in (self.url, client_url, assign_url)}
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/assign_client/", {
+                "central_auth_id": self.central.id, "client_id": self.client_user.id,
+                "data_domain": "diabetes", "model_name": "lr", "iteration_name": "round-1",
+            }, content_type="application/json")
+        for url in (client_url, assign_url):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etags[url])
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.json()), 1)
+            etags[url] = response["ETag"]
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etags[self.url]).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(
+                f"/central-models/{self.iteration.id}/",
+                encode_multipart(BOUNDARY, {"central_auth": self.central.id, "version": 2}), content_type=MULTIPART_CONTENT,
+            )
+        for url in (self.url, client_url):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etags[url])
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()[0]["version"], 2)
+
+    def test_error_responses_are_not_cached(self):
+        url = "/central-models/running/?user_id=999"
+        self.assertEqual(self.client.get(url).status_code, 404)
+        UserProfile.objects.create(id=999, email="late@example.com", password="x", role="central")
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+
+class TokenAuthTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.central.password = make_password("secret")
+        self.central.save()
+        self.client_user = UserProfile.objects.create(email="client@example.com", password="x", role="client")
+
+    def login(self):
+        response = self.client.post(
+            "/login/", {"email": "central@example.com", "password": "secret"}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()["token"]
+
+    def get(self, url, token, **extra):
+        return self.client.get(url, HTTP_AUTHORIZATION=f"Bearer {token}", **extra)
+
+    def test_token_identifies_user_without_a_query(self):
+        token = self.login()
+        with self.assertNumQueries(1):  # the iterations themselves
+            response = self.get("/central-models/running/", token)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get("/fetch_assign/central@example.com/", token).status_code, 200)
+
+    def test_token_cannot_read_other_users(self):
+        token = self.login()
+        response = self.get(f"/central-models/?user_id={self.client_user.id}", token)
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.get("/fetch_assign/other@example.com/", token).status_code, 403)
+        self.assertEqual(self.get("/client-models/", token).status_code, 403)
+
+    def test_invalid_and_expired_tokens_are_rejected(self):
+        token = self.login()
+        self.assertEqual(self.get("/central-models/running/", token[:-2] + "xx").status_code, 401)
+        with override_settings(AUTH_TOKEN_MAX_AGE=-1):
+            self.assertEqual(self.get("/central-models/running/", token).status_code, 401)
+
+    def test_requests_without_token_use_legacy_parameters(self):
+        response = self.client.get(f"/central-models/running/?user_id={self.central.id}")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get("/central-models/running/").status_code, 400)
+
+
+class AsyncViewTests(IterationTestCase):
+    """The ASGI views answer like their DRF counterparts."""
+
+    def setUp(self):
+        super().setUp()
+        self.factory = AsyncRequestFactory()
+
+    async def test_read_endpoint_matches_sync_view(self):
+        url = f"/central-models/running/?user_id={self.central.id}"
+        expected = (await self.async_client.get(url)).json()
+        response = await async_views.running_iterations(self.factory.get(url))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content), expected)
+
+        missing = await async_views.running_iterations(self.factory.get("/central-models/running/?user_id=999"))
+        self.assertEqual(missing.status_code, 404)
+
+    async def test_token_and_conditional_get(self):
+        token = issue_token(self.central)
+        def request(**headers):
+            headers["Authorization"] = f"Bearer {token}"
+            return self.factory.get("/central-models/running/", headers=headers)
+
+        first = await async_views.running_iterations(request())
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(len(json.loads(first.content)), 1)
+        again = await async_views.running_iterations(request(**{"If-None-Match": first["ETag"]}))
+        self.assertEqual(again.status_code, 304)
+
+        forbidden = await async_views.list_client_models(request())
+        self.assertEqual(forbidden.status_code, 403)
+
+    async def test_inference_awaits_the_batcher(self):
+        response = await async_views.diabetes(self.factory.post(
+            "/diabetes/", {"bmi": 31.5, "age": 9}, content_type="application/json"
+        ))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(json.loads(response.content)), {"diabetes", "probability"})
+
+        with override_settings(INFERENCE_BATCH_WINDOW_MS=0):
+            bad = await async_views.diabetes(self.factory.post(
+                "/diabetes/", {"bmi": "high"}, content_type="application/json"
+            ))
+        self.assertEqual(bad.status_code, 400)
+
+    async def test_chunk_upload(self):
+        session = await UploadSession.objects.acreate(kind="client", filename="model.pkl")
+        url = f"/uploads/{session.id}/chunks/0/"
+        response = await async_views.put_upload_chunk(
+            self.factory.put(url, b"abc", content_type="application/octet-stream"), session.id, 0
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)["bytes_received"], 3)
+
+        response = await async_views.put_upload_chunk(
+            self.factory.put(url, b"abc", content_type="application/octet-stream"), session.id, 2
+        )
+        self.assertEqual(response.status_code, 409)
+        status = await async_views.upload_status(self.factory.get(f"/uploads/{session.id}/"), session.id)
+        self.assertEqual(json.loads(status.content)["next_chunk"], 1)
+
+
+class ClientSearchTests(TestCase):
+    def setUp(self):
+        for email, hospital in [
+            ("zed@north.org", "Bir Hospital"),
+            ("bir.admin@south.org", "Patan Hospital"),
+            ("ann@east.org", "Teaching Hospital Bir"),
+            ("bob@west.org", "Grande"),
+        ]:
+            UserProfile.objects.create(email=email, password="x", hospital=hospital, role="client")
+        UserProfile.objects.create(email="bir@central.org", password="x", role="central")
+
+    def test_results_are_ranked_and_exclude_non_clients(self):
+        rows = self.client.get("/filter_client/?search=bir").json()
+        self.assertEqual(
+            [r["email"] for r in rows],
+            ["bir.admin@south.org", "zed@north.org", "ann@east.org"],
+        )
+
+    def test_limit(self):
+        rows = self.client.get("/filter_client/?search=hospital&limit=2").json()
+        self.assertEqual(len(rows), 2)
+
+    @override_settings(CLIENT_SEARCH_LIMIT=1)
+    def test_limit_is_capped(self):
+        rows = self.client.get("/filter_client/?search=hospital&limit=50").json()
+        self.assertEqual(len(rows), 1)
+
+    def test_empty_search_lists_all_clients(self):
+        self.assertEqual(len(self.client.get("/filter_client/?search=").json()), 4)
+
+
+class ChunkedUploadTests(IterationTestCase):
+    def open_upload(self, payload, **extra):
+        response = self.client.post("/uploads/", {
+            "kind": "client", "filename": "../model.pkl", "size": len(payload),
+            "sha256": hashlib.sha256(payload).hexdigest(), **extra,
+        }, content_type="application/json")
+        self.assertEqual(response.status_code, 201)
+        return response.json()["upload_id"]
+
+    def put(self, upload_id, index, data):
+        return self.client.put(
+            f"/uploads/{upload_id}/chunks/{index}/", data, content_type="application/octet-stream"
+        )
+
+    def test_resumed_upload_commits_client_model(self):
+        assignment = self.submit("a@example.com", [0, 0], 0).assignment
+        payload = pickle.dumps(linear_model([1, 2], 3))
+        chunks = [payload[i:i + 100] for i in range(0, len(payload), 100)]
+        upload_id = self.open_upload(payload)
+
+        self.assertEqual(self.put(upload_id, 0, chunks[0]).status_code, 200)
+        self.assertEqual(self.put(upload_id, 2, chunks[2]).status_code, 409)
+        self.assertEqual(self.put(upload_id, 0, chunks[0]).json()["next_chunk"], 1)  # duplicate is acked
+
+        # Resume from the server's view of progress, as after a dropped connection.
+        resume_at = self.client.get(f"/uploads/{upload_id}/").json()["next_chunk"]
+        for index in range(resume_at, len(chunks)):
+            self.assertEqual(self.put(upload_id, index, chunks[index]).status_code, 200)
+
+        before = ClientModel.objects.count()
+        response = self.client.post(f"/uploads/{upload_id}/commit/", {
+            "assignment": assignment.id, "version": 2, "num_samples": 10,
+        }, content_type="application/json")
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()["sha256"], hashlib.sha256(payload).hexdigest())
+        self.assertEqual(ClientModel.objects.count(), before + 1)
+
+        client_model = ClientModel.objects.get(id=response.json()["id"])
+        with client_model.model_file.open("rb") as f:
+            self.assertEqual(f.read(), payload)
+
+        again = self.client.post(f"/uploads/{upload_id}/commit/", {}, content_type="application/json")
+        self.assertEqual(again.status_code, 409)
+
+    def test_incomplete_upload_cannot_commit(self):
+        upload_id = self.open_upload(b"x" * 300, kind="central")
+        self.put(upload_id, 0, b"x" * 100)
+        response = self.client.post(f"/uploads/{upload_id}/commit/", {}, content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(CentralAuthModel.objects.count(), 1)
+
+    @override_settings(UPLOAD_MAX_CHUNK_BYTES=10)
+    def test_oversized_chunk_is_rejected(self):
+        upload_id = self.open_upload(b"x" * 20)
+        self.assertEqual(self.put(upload_id, 0, b"x" * 20).status_code, 413)
+        self.assertEqual(self.put(upload_id, 0, b"x" * 10).json()["bytes_received"], 10)
+
+
+    def test_chunk_body_is_read_outside_the_session_lock(self):
+        upload_id = self.open_upload(b"x" * 20)
+        depth = len(connection.atomic_blocks)
+        test = self
+
+        class SlowBody(io.BytesIO):
+            def read(self, size=-1):
+                test.assertEqual(len(connection.atomic_blocks), depth)  # no transaction of write_chunk's open
+                return super().read(size)
+
+        session = write_chunk(upload_id, 0, SlowBody(b"x" * 20))
+        self.assertEqual((session.next_chunk, session.bytes_received), (1, 20))
+        leftovers = [f for f in os.listdir(os.path.dirname(partial_path(session))) if f.startswith(upload_id)]
+        self.assertEqual(leftovers, [f"{upload_id}.part"])  # the chunk's own file is gone
+
+    def test_abandoned_uploads_expire(self):
+        stale = self.open_upload(b"x" * 20)
+        self.put(stale, 0, b"x" * 10)
+        aborted = self.open_upload(b"y" * 20)
+        self.put(aborted, 0, b"y" * 10)
+        fresh = self.open_upload(b"z" * 20)
+        self.put(fresh, 0, b"z" * 10)
+        session = UploadSession.objects.get(id=stale)
+        self.assertIn(session.id, uploads._hashers)
+
+        response = self.client.post(f"/uploads/{aborted}/abort/")
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(UploadSession.objects.filter(id=aborted).exists())
+
+        UploadSession.objects.filter(id=stale).update(updated_at=timezone.now() - timedelta(days=2))
+        stray = os.path.join(os.path.dirname(partial_path(session)), "gone.abc.chunk")
+        open(stray, "wb").close()
+        os.utime(stray, (0, 0))
+        call_command("expire_uploads", stdout=io.StringIO())
+
+        self.assertEqual(list(UploadSession.objects.values_list("id", flat=True)), [UploadSession.objects.get(id=fresh).id])
+        remaining = set(os.listdir(os.path.dirname(partial_path(session))))
+        self.assertIn(f"{fresh}.part", remaining)
+        self.assertFalse(remaining & {f"{stale}.part", f"{aborted}.part", "gone.abc.chunk"})
+        self.assertNotIn(session.id, uploads._hashers)
+
+class BlobStoreTests(IterationTestCase):
+    def test_identical_uploads_share_one_blob(self):
+        first = self.submit("a@example.com", [1, 2], 3)
+        second = self.submit("b@example.com", [1, 2], 3)
+        self.assertEqual(first.model_file.name, second.model_file.name)
+        self.assertTrue(first.model_file.name.startswith("blobs/"))
+
+        blob = Blob.objects.get(name=first.model_file.name)
+        self.assertEqual(blob.ref_count, 2)
+        self.assertEqual(blob.sha256, hashlib.sha256(pickle.dumps(linear_model([1, 2], 3))).hexdigest())
+
+    def test_gc_removes_only_unreferenced_blobs(self):
+        kept = self.submit("a@example.com", [1, 2], 3)
+        dropped = self.submit("b@example.com", [4, 5], 6)
+        dropped_name = dropped.model_file.name
+        dropped.delete()
+        self.assertEqual(Blob.objects.get(name=dropped_name).ref_count, 0)
+
+        call_command("gc_blobs", grace_seconds=0, stdout=io.StringIO())
+        self.assertFalse(Blob.objects.filter(name=dropped_name).exists())
+        self.assertFalse(default_storage.exists(dropped_name))
+        self.assertTrue(default_storage.exists(kept.model_file.name))
+
+    def test_storing_an_unreferenced_blob_again_keeps_it_from_gc(self):
+        dropped = self.submit("a@example.com", [4, 5], 6)
+        name = dropped.model_file.name
+        dropped.delete()
+        Blob.objects.filter(name=name).update(stored_at=timezone.now() - timedelta(days=1))
+
+        self.submit("b@example.com", [4, 5], 6)
+        Blob.objects.filter(name=name).update(ref_count=0)  # as if the new row were not counted yet
+        call_command("gc_blobs", grace_seconds=3600, stdout=io.StringIO())
+        self.assertTrue(Blob.objects.filter(name=name).exists())
+        self.assertTrue(default_storage.exists(name))
+
+    def test_recount_repairs_drifted_counts(self):
+        kept = self.submit("a@example.com", [1, 2], 3)
+        Blob.objects.filter(name=kept.model_file.name).update(ref_count=0)
+        call_command("gc_blobs", recount=True, grace_seconds=0, stdout=io.StringIO())
+        self.assertEqual(Blob.objects.get(name=kept.model_file.name).ref_count, 1)
+        self.assertTrue(default_storage.exists(kept.model_file.name))
+
+
+class DeltaSubmissionTests(IterationTestCase):
+    def setUp(self):
+        super().setUp()
+        self.iteration.model_file = pickled(linear_model([1.0, -2.0, 0.5, 0.0], 0.25))
+        self.iteration.save()
+        self.assignment = self.submit("a@example.com", [0, 0, 0, 0], 0).assignment
+        self.base = {"coef_": np.array([[1.0, -2.0, 0.5, 0.0]]), "intercept_": np.array([0.25])}
+        self.updated = {"coef_": np.array([[1.1, -2.5, 0.5, 0.01]]), "intercept_": np.array([0.3])}
+
+    def submit_delta(self, **encoding):
+        return self.client.post("/client/submit-delta/", {
+            "assignment": self.assignment.id, "base_model": self.iteration.id, "version": 2, "num_samples": 5,
+            "delta_file": SimpleUploadedFile("update.npz", encode_delta(self.base, self.updated, **encoding)),
+        })
+
+    def reconstructed(self):
+        with ClientModel.objects.latest("id").model_file.open("rb") as f:
+            return pickle.load(f)
+
+    def test_float16_delta_reconstructs_client_model(self):
+        self.assertEqual(self.submit_delta(quantize="float16").status_code, 201)
+        estimator = self.reconstructed()
+        np.testing.assert_allclose(estimator.coef_, self.updated["coef_"], atol=1e-3)
+        np.testing.assert_allclose(estimator.intercept_, self.updated["intercept_"], atol=1e-3)
+
+    def test_int8_delta(self):
+        self.assertEqual(self.submit_delta(quantize="int8").status_code, 201)
+        np.testing.assert_allclose(self.reconstructed().coef_, self.updated["coef_"], atol=0.5 / 127)
+
+    def test_top_k_delta_keeps_largest_changes(self):
+        self.assertEqual(self.submit_delta(top_k=1).status_code, 201)
+        np.testing.assert_allclose(self.reconstructed().coef_, [[1.0, -2.5, 0.5, 0.0]])
+
+    def test_delta_feeds_running_aggregation(self):
+        self.submit_delta()
+        accumulator = IterationAccumulator.objects.get(iteration_name="round-1")
+        self.assertEqual(accumulator.total_weight, 5)
+
+    def test_base_model_of_another_centrals_same_named_round_is_rejected(self):
+        other = UserProfile.objects.create(email="other@example.com", password="x", role="central")
+        foreign = CentralAuthModel.objects.create(
+            central_auth=other, iteration_name="round-1", model_name="lr",
+            dataset_domain="diabetes", model_file=pickled(linear_model([1.0, -2.0, 0.5, 0.0], 0.25)), version=1,
+        )
+        submitted = ClientModel.objects.count()
+        response = self.client.post("/client/submit-delta/", {
+            "assignment": self.assignment.id, "base_model": foreign.id, "version": 2, "num_samples": 5,
+            "delta_file": SimpleUploadedFile("update.npz", encode_delta(self.base, self.updated)),
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(ClientModel.objects.count(), submitted)
+
+    def test_malformed_delta(self):
+        response = self.client.post("/client/submit-delta/", {
+            "assignment": self.assignment.id, "base_model": self.iteration.id, "version": 2,
+            "delta_file": SimpleUploadedFile("update.npz", b"not an archive"),
+        })
+        self.assertEqual(response.status_code, 400)
+
+
+    def test_malformed_archive_contents_are_delta_errors(self):
+        def npz(**arrays):
+            buffer = io.BytesIO()
+            np.savez(buffer, **arrays)
+            return buffer.getvalue()
+
+        idx = np.array([0], dtype=np.int64)
+        bad = {
+            "npy": np.array([1.0]).tobytes(),
+            "missing_val": npz(**{"coef_.idx": idx}),
+            "float_idx": npz(**{"coef_.idx": np.array([0.5]), "coef_.val": np.array([1.0])}),
+            "ragged": npz(**{"coef_.idx": idx, "coef_.val": np.array([1.0, 2.0])}),
+            "missing_scale": npz(**{"coef_.q": np.zeros(4, dtype=np.int8)}),
+            "array_scale": npz(**{"coef_.q": np.zeros(4, dtype=np.int8), "coef_.scale": np.ones(2)}),
+            "strings": npz(**{"coef_.dense": np.array(["a", "b", "c", "d"])}),
+            "wrong_size": npz(**{"coef_.dense": np.zeros(3)}),
+            "nan": npz(**{"coef_.dense": np.full(4, np.nan)}),
+        }
+        for case, data in bad.items():
+            with self.subTest(case), self.assertRaises(DeltaError):
+                decode_delta(data, self.base)
+
+
+class ArtifactTests(MediaTestCase):
+    def test_linear_model_is_memory_mapped(self):
+        path = str(settings.INFERENCE_MODELS["diabetes"]["fallback"])
+        with open(path, "rb") as f:
+            original = pickle.load(f)
+        loaded = load_model(path)
+
+        self.assertIsInstance(loaded.coef_, np.memmap)
+        self.assertEqual(list(loaded.feature_names_in_), list(original.feature_names_in_))
+        X = np.array([[3, 28.5, 9, 1, 0, 1, 0, 1, 6, 0, 2], [1, 22.0, 4, 0, 0, 1, 0, 0, 8, 0, 0]], dtype=float)
+        np.testing.assert_allclose(loaded.predict_proba(X), original.predict_proba(X))
+        self.assertTrue(os.path.exists(os.path.join(artifact_dir_for(path), "manifest.json")))
+
+    def test_catboost_round_trips_through_native_format(self):
+        path = str(settings.INFERENCE_MODELS["heartdisease"]["fallback"])
+        with open(path, "rb") as f:
+            original = pickle.load(f)
+        loaded = load_model(path)
+        X = pd.DataFrame([[50, 1, 170, 80, 140, 90, 2, 1, 0, 0, 1]], columns=original.feature_names_)
+        np.testing.assert_allclose(loaded.predict_proba(X), original.predict_proba(X))
+
+    def test_unsupported_models_stay_pickled(self):
+        CentralAuthModel.objects.create(
+            central_auth=self.central, iteration_name="round-1", model_name="c",
+            dataset_domain="diabetes", model_file=pickled(Constant(1)), version=0,
+        )
+        self.assertEqual(ModelRegistry().get("diabetes").estimator.value, 1)
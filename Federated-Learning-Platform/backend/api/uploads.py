@@ -0,0 +1,200 @@
+"""
+Chunked, resumable model uploads.
+
+A client opens an UploadSession, PUTs numbered chunks and commits. Each chunk
+is streamed to a file of its own with no transaction open, so a slow client
+holds no database lock; the session row is then locked just long enough to
+check the offset, append the chunk to the partial file and advance
+next_chunk. A chunk that failed half-way is simply sent again, and the
+SHA-256 is advanced incrementally. The running hash lives in process memory;
+a worker that did not see the earlier chunks rebuilds it once from the
+partial file.
+
+Sessions not committed within UPLOAD_SESSION_MAX_AGE seconds of their last
+chunk are removed, with their files, by `manage.py expire_uploads`.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from .models import UploadSession
+
+READ_BLOCK = 64 * 1024
+
+# session id -> (bytes hashed, hasher, time.monotonic() of the last chunk)
+_hashers = {}
+_hashers_lock = threading.Lock()
+
+
+class UploadError(Exception):
+    status = 400
+
+
+class ChunkOutOfOrder(UploadError):
+    status = 409
+
+
+class ChunkTooLarge(UploadError):
+    status = 413
+
+
+def max_age():
+    return getattr(settings, "UPLOAD_SESSION_MAX_AGE", 24 * 3600)
+
+
+def partial_dir():
+    return default_storage.path(getattr(settings, "UPLOAD_PARTIAL_DIR", "uploads"))
+
+
+def partial_path(session):
+    return os.path.join(partial_dir(), f"{session.id}.part")
+
+
+def _remember(session, hasher):
+    """Cache the hash state after the session's acknowledged bytes, dropping idle sessions' states."""
+    now = time.monotonic()
+    with _hashers_lock:
+        _hashers[session.id] = (session.bytes_received, hasher, now)
+        for session_id in [k for k, (_, _, used) in _hashers.items() if now - used > max_age()]:
+            del _hashers[session_id]
+
+
+def _hasher_at(session, path):
+    """SHA-256 state covering the first bytes_received bytes of the partial file."""
+    with _hashers_lock:
+        cached = _hashers.get(session.id)
+    if cached and cached[0] == session.bytes_received:
+        return cached[1].copy()
+
+    hasher = hashlib.sha256()
+    remaining = session.bytes_received
+    if remaining:
+        with open(path, "rb") as f:
+            while remaining:
+                block = f.read(min(READ_BLOCK, remaining))
+                if not block:
+                    raise UploadError("Partial upload is shorter than acknowledged.")
+                hasher.update(block)
+                remaining -= len(block)
+    return hasher
+
+
+def _acknowledged(session, index):
+    """True if chunk `index` was already written; UploadError if it cannot be written now."""
+    if session.committed:
+        raise UploadError("Upload is already committed.")
+    if index > session.next_chunk:
+        raise ChunkOutOfOrder(f"Expected chunk {session.next_chunk}.")
+    return index < session.next_chunk
+
+
+def write_chunk(session_id, index, stream):
+    """
+    Append chunk `index` read from `stream`. Chunks already acknowledged are
+    accepted again without writing; a gap raises ChunkOutOfOrder.
+    """
+    max_bytes = getattr(settings, "UPLOAD_MAX_CHUNK_BYTES", 8 * 1024 * 1024)
+    session = UploadSession.objects.get(id=session_id)
+    if _acknowledged(session, index):
+        return session
+
+    path = partial_path(session)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Acknowledged bytes never change, so their hash state is valid without a lock.
+    offset = session.bytes_received
+    hasher = _hasher_at(session, path)
+    fd, chunk_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=f"{session.id}.", suffix=".chunk")
+    try:
+        written = 0
+        with os.fdopen(fd, "wb") as chunk:
+            while True:
+                block = stream.read(READ_BLOCK)
+                if not block:
+                    break
+                written += len(block)
+                if written > max_bytes:
+                    raise ChunkTooLarge(f"Chunks are limited to {max_bytes} bytes.")
+                chunk.write(block)
+                hasher.update(block)
+        if not written:
+            raise UploadError("Empty chunk.")
+
+        with transaction.atomic():
+            session = UploadSession.objects.select_for_update().get(id=session_id)
+            if _acknowledged(session, index):
+                return session  # a concurrent attempt at this chunk got there first
+            with open(path, "r+b" if os.path.exists(path) else "wb") as partial, open(chunk_path, "rb") as chunk:
+                # Overwrite whatever an interrupted attempt at this chunk left behind.
+                partial.seek(offset)
+                partial.truncate()
+                shutil.copyfileobj(chunk, partial, READ_BLOCK)
+            session.next_chunk += 1
+            session.bytes_received += written
+            session.save(update_fields=["next_chunk", "bytes_received", "updated_at"])
+            _remember(session, hasher)
+    finally:
+        os.remove(chunk_path)
+    return session
+
+
+def finish(session):
+    """
+    Verify a complete upload and return (File, sha256 hexdigest). The caller
+    saves the File into a model row and then calls discard().
+    """
+    path = partial_path(session)
+    if not session.bytes_received or not os.path.exists(path):
+        raise UploadError("Nothing has been uploaded.")
+    if session.expected_size is not None and session.bytes_received != session.expected_size:
+        raise UploadError(f"Received {session.bytes_received} of {session.expected_size} bytes.")
+
+    digest = _hasher_at(session, path).hexdigest()
+    if session.expected_sha256 and digest != session.expected_sha256.lower():
+        raise UploadError("SHA-256 does not match the uploaded bytes.")
+    return File(open(path, "rb"), name=session.filename), digest
+
+
+def discard(session):
+    """Forget a committed or abandoned session's hash state and delete its partial file."""
+    with _hashers_lock:
+        _hashers.pop(session.id, None)
+    try:
+        os.remove(partial_path(session))
+    except FileNotFoundError:
+        pass
+
+
+def expire_sessions(dry_run=False):
+    """
+    Delete uncommitted sessions idle for more than UPLOAD_SESSION_MAX_AGE, and
+    partial or chunk files as old that no open session owns. Returns the
+    (sessions, file paths) removed.
+    """
+    cutoff = timezone.now() - timedelta(seconds=max_age())
+    expired = list(UploadSession.objects.filter(committed=False, updated_at__lt=cutoff))
+    for session in expired:
+        if not dry_run:
+            discard(session)
+            session.delete()
+
+    live = {str(session_id) for session_id in UploadSession.objects.filter(committed=False).values_list("id", flat=True)}
+    orphans = []
+    directory = partial_dir()
+    for filename in os.listdir(directory) if os.path.isdir(directory) else ():
+        path = os.path.join(directory, filename)
+        if filename.split(".")[0] in live or os.path.getmtime(path) > time.time() - max_age():
+            continue
+        orphans.append(path)
+        if not dry_run:
+            os.remove(path)
+    return expired, orphans
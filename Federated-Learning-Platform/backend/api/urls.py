@@ -2,7 +2,7 @@ from django.urls import path
 from django.conf.urls.static import static
 from django.conf import settings
 
-from . import views
+from . import async_views, views
 
 urlpatterns = [
     path('signup/', views.signup, name='signup'),
@@ -19,10 +19,46 @@ urlpatterns = [
     path('client-models/', views.list_client_models, name='list_client_models'),
     path("client/current-iterations/<str:email>/", views.current_client_iterations, name="current_client_iterations"),
     path("client/submit-model/", views.submit_client_model, name="submit_client_model"),
+    path("client/submit-delta/", views.submit_client_delta, name="submit_client_delta"),
     path("central-models/<int:iteration_id>/submissions/", views.current_iteration_submissions, name="current_iteration_submissions"),
+    path("central-models/<int:iteration_id>/aggregate/", views.aggregate_submissions, name="aggregate_submissions"),
+    path("central-models/<int:iteration_id>/evaluate/", views.evaluate_iteration, name="evaluate_iteration"),
+    path("jobs/<uuid:job_id>/", views.job_status, name="job_status"),
+    path("uploads/", views.create_upload, name="create_upload"),
+    path("uploads/<uuid:upload_id>/", views.upload_status, name="upload_status"),
+    path("uploads/<uuid:upload_id>/chunks/<int:index>/", views.put_upload_chunk, name="put_upload_chunk"),
+    path("uploads/<uuid:upload_id>/commit/", views.commit_upload, name="commit_upload"),
+    path("uploads/<uuid:upload_id>/abort/", views.abort_upload, name="abort_upload"),
     path("diabetes/", views.diabetes, name="diabetes"),
-    path("heartdisease/", views.heartdisease, name="heartdisease")
+    path("heartdisease/", views.heartdisease, name="heartdisease"),
+    path("diabetes/batch/", views.diabetes_batch, name="diabetes_batch"),
+    path("heartdisease/batch/", views.heartdisease_batch, name="heartdisease_batch"),
+    path("predict/<str:model>/", views.predict, name="predict"),
+    path("predict/<str:model>/batch/", views.predict_batch, name="predict_batch"),
+    path("inference/metrics/", views.inference_metrics, name="inference_metrics"),
+    # No trailing slash: Prometheus scrapes /metrics by default.
+    path("metrics", views.prometheus_metrics, name="prometheus_metrics"),
 
 
 
 ]+ static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+
+
+# Async versions of the polled, upload and inference endpoints, routed ahead of
+# the views above when serving through ASGI (see core/asgi.py).
+async_urlpatterns = [
+    path('fetch_assign/<str:email>/', async_views.fetch_assign, name='fetch_assign'),
+    path('central-models/', async_views.list_central_models, name='list_central_models'),
+    path('central-models/running/', async_views.running_iterations, name='running_iterations'),
+    path('client-dashboard-data/<str:email>/', async_views.client_dashboard_data, name='client_dashboard_data'),
+    path('client-models/', async_views.list_client_models, name='list_client_models'),
+    path("client/current-iterations/<str:email>/", async_views.current_client_iterations, name="current_client_iterations"),
+    path("uploads/<uuid:upload_id>/", async_views.upload_status, name="upload_status"),
+    path("uploads/<uuid:upload_id>/chunks/<int:index>/", async_views.put_upload_chunk, name="put_upload_chunk"),
+    path("diabetes/", async_views.diabetes, name="diabetes"),
+    path("heartdisease/", async_views.heartdisease, name="heartdisease"),
+    path("predict/<str:model>/", async_views.predict, name="predict"),
+]
+
+if settings.ASYNC_VIEWS:
+    urlpatterns = async_urlpatterns + urlpatterns
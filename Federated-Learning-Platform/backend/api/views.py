@@ -1,27 +1,54 @@
+from django.conf import settings
 from django.shortcuts import get_object_or_404, render
-from django.db.models import Q
+from django.db import transaction
+from django.db.models import Count, Q
 from django.contrib.auth.hashers import check_password
 from rest_framework import status
-from rest_framework.decorators import api_view, parser_classes
-from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.decorators import api_view, authentication_classes, parser_classes
+from rest_framework.parsers import JSONParser, MultiPartParser, FormParser
 from rest_framework.response import Response
 
 import io
+import logging
+import os
 import pickle
-import numpy as np
 from django.core.files.base import ContentFile
 from django.core.files.storage import default_storage
 
-from .models import UserProfile, CentralClientAssignment, CentralAuthModel, ClientModel
+from .models import UserProfile, CentralClientAssignment, CentralAuthModel, ClientModel, Job, UploadSession
+from .registry import ModelNotRegistered, registry
+from .schemas import get_schema
+from .inference import iter_csv_chunks, iter_json_chunks, stream_predictions
+from .batching import batching_stats, predict_one
+from .pool import PoolSaturated, pool_stats
+from .metrics import CONTENT_TYPE, metrics
+from .prediction_cache import prediction_cache
+from .pagination import paginated_response
+from .auth import issue_token, principal
+from .caching import cached_response, email_scope, user_id_scope
+from .search import search_clients
+from .uploads import UploadError, discard, finish, write_chunk
+from .aggregation import (
+    AggregationError,
+    accumulate_submission,
+    iteration_submissions,
+    latest_submissions,
+    load_estimator,
+)
+from .delta import DeltaError, apply_delta
+from .jobs import enqueue, enqueue_conversion, enqueue_evaluation, evaluate_on_commit
 from .serializer import (
     UserProfileSerializers,
     CentralClientAssignmentSerializer,
     CentralAuthModelSerializer,
     ClientModelSerializer,
+    JobSerializer,
 )
-from django.http import HttpResponse
-import pandas as pd
+from django.http import HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.views.decorators.http import require_GET
 
+logger = logging.getLogger(__name__)
 
 
 @api_view(["GET"])
@@ -31,6 +58,7 @@ def home(request):
 
 
 @api_view(["POST"])
+@authentication_classes([])
 def signup(request):
     serializer = UserProfileSerializers(data=request.data)
     if serializer.is_valid():
@@ -39,11 +67,12 @@ def signup(request):
             {"message": "User registered successfully!"},
             status=status.HTTP_201_CREATED,
         )
-    print("Serializer errors:", serializer.errors)
+    logger.info("Signup rejected: %s", serializer.errors)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
 @api_view(["POST"])
+@authentication_classes([])
 def login(request):
     email = request.data.get("email")
     password = request.data.get("password")
@@ -75,6 +104,7 @@ def login(request):
             "email": user.email,
             "hospital": user.hospital,
             "role": user.role,
+            "token": issue_token(user),
         },
         status=status.HTTP_200_OK,
     )
@@ -85,30 +115,41 @@ def login(request):
 # ---------------------------
 @api_view(["GET"])
 def filter_client(request):
-    text = request.GET.get("search", "")
-    clients = UserProfile.objects.filter(role="client").filter(
-        Q(email__icontains=text) | Q(hospital__icontains=text)
-    )
+    text = request.GET.get("search", "").strip()
+    if not text:
+        clients = UserProfile.objects.filter(role="client")
+        return paginated_response(request, clients, UserProfileSerializers)
+
+    # Ranked, index-backed typeahead capped at CLIENT_SEARCH_LIMIT (or ?limit=)
+    clients = search_clients(text, request.GET.get("limit"))
     serializer = UserProfileSerializers(clients, many=True)
     return Response(serializer.data)
 
 
 @api_view(["GET"])
+@cached_response(email_scope)
 def fetch_assign(request, email):
     if not email:
         return Response(
             {"error": "email parameter is required"}, status=status.HTTP_400_BAD_REQUEST
         )
 
-    assignments = CentralClientAssignment.objects.filter(central_auth__email=email)
-    serializer = CentralClientAssignmentSerializer(assignments, many=True)
-    return Response(serializer.data)
+    # With a token the principal must be the central user named in the URL
+    if request.user.is_authenticated:
+        principal(request, "central", email=email)
+
+    assignments = CentralClientAssignment.objects.filter(
+        central_auth__email=email
+    ).select_related("client", "central_auth")
+    return paginated_response(
+        request, assignments, CentralClientAssignmentSerializer, time_field="assigned_at"
+    )
 
 
 @api_view(["POST"])
 def assign_client(request):
     data = request.data
-    central_auth_id = data.get("central_auth_id")
+    central_auth_id = data.get("central_auth_id") or getattr(request.user, "id", None)
     client_id = data.get("client_id")
     data_domain = data.get("data_domain")
     model_name = data.get("model_name")
@@ -118,26 +159,31 @@ def assign_client(request):
         return Response({"error": "All fields are required"}, status=status.HTTP_400_BAD_REQUEST)
 
     try:
-        central_auth = UserProfile.objects.get(id=central_auth_id, role="central")
+        central_auth = principal(request, "central", user_id=central_auth_id)
         client = UserProfile.objects.get(id=client_id, role="client")
     except UserProfile.DoesNotExist:
         return Response({"error": "Invalid central_auth_id or client_id"}, status=status.HTTP_404_NOT_FOUND)
 
     # Check if client already has a running assignment (version > 0)
-    active_assignments = CentralClientAssignment.objects.filter(
-        client=client,
-        iteration_name__in=CentralAuthModel.objects.filter(version__gt=0).values_list('iteration_name', flat=True)
-    )
+    active_assignments = CentralClientAssignment.objects.filter(client=client, iteration__version__gt=0)
     if active_assignments.exists():
         return Response({"error": "This client is already assigned to a running iteration"}, status=status.HTTP_400_BAD_REQUEST)
 
+    # Link to the newest row of the named iteration (set later by start_iteration if it does not exist yet)
+    iteration = (
+        CentralAuthModel.objects.filter(central_auth_id=central_auth.id, iteration_name=iteration_name)
+        .order_by("-created_at", "-id")
+        .first()
+    )
+
     # Create new assignment
     assignment = CentralClientAssignment.objects.create(
-        central_auth=central_auth,
+        central_auth_id=central_auth.id,
         client=client,
         data_domain=data_domain,
         model_name=model_name,
         iteration_name=iteration_name,
+        iteration=iteration,
     )
 
     serializer = CentralClientAssignmentSerializer(assignment)
@@ -149,23 +195,27 @@ def assign_client(request):
 # ✅ Model / Iteration Management
 # ---------------------------
 @api_view(["GET"])
+@cached_response(user_id_scope)
 def list_central_models(request):
     user_id = request.GET.get("user_id")
-    if not user_id:
+    if not user_id and not request.user.is_authenticated:
         return Response(
             {"error": "user_id parameter is required"}, status=status.HTTP_400_BAD_REQUEST
         )
 
     try:
-        user = UserProfile.objects.get(id=user_id, role="central")
+        user = principal(request, "central", user_id=user_id)
     except UserProfile.DoesNotExist:
         return Response(
             {"error": "Central Auth user not found"}, status=status.HTTP_404_NOT_FOUND
         )
 
-    models = CentralAuthModel.objects.filter(central_auth=user).order_by("-created_at")
-    serializer = CentralAuthModelSerializer(models, many=True)
-    return Response(serializer.data)
+    models = (
+        CentralAuthModel.objects.filter(central_auth_id=user.id)
+        .select_related("central_auth")
+        .order_by("-created_at")
+    )
+    return paginated_response(request, models, CentralAuthModelSerializer)
 
 
 @api_view(["POST"])
@@ -184,41 +234,54 @@ def start_iteration(request):
     """
     serializer = CentralAuthModelSerializer(data=request.data)
     if serializer.is_valid():
-        serializer.save()
+        _save_iteration(serializer)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-    print("Serializer errors:", serializer.errors)
+    logger.info("Iteration rejected: %s", serializer.errors)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+def _save_iteration(serializer):
+    iteration = serializer.save()
+    # Clients may have been assigned to this iteration name before it was started
+    CentralClientAssignment.objects.filter(
+        central_auth=iteration.central_auth,
+        iteration_name=iteration.iteration_name,
+        iteration__isnull=True,
+    ).update(iteration=iteration)
+    enqueue_conversion(iteration)
+    return iteration
+
+
 @api_view(["GET"])
+@cached_response(user_id_scope)
 def running_iterations(request):
     user_id = request.GET.get("user_id")
-    if not user_id:
+    if not user_id and not request.user.is_authenticated:
         return Response(
             {"error": "user_id parameter is required"}, status=status.HTTP_400_BAD_REQUEST
         )
 
     try:
-        user = UserProfile.objects.get(id=user_id, role="central")
+        user = principal(request, "central", user_id=user_id)
     except UserProfile.DoesNotExist:
         return Response(
             {"error": "Central Auth user not found"}, status=status.HTTP_404_NOT_FOUND
         )
 
     iterations = (
-        CentralAuthModel.objects.filter(central_auth=user, version__gt=0)
+        CentralAuthModel.objects.filter(central_auth_id=user.id, version__gt=0)
+        .select_related("central_auth")
         .order_by("-version")
     )
-    serializer = CentralAuthModelSerializer(iterations, many=True)
-    return Response(serializer.data)
+    return paginated_response(request, iterations, CentralAuthModelSerializer)
 
 
 @api_view(["PUT", "PATCH"])
 @parser_classes([MultiPartParser, FormParser])
 def update_iteration(request, pk):
     """
-    Update an existing CentralAuthModel instance.
+    Update an existing CentralAuthModel instance, as the central auth user who owns it.
     Accepts multipart/form-data for file updates.
     """
     try:
@@ -229,47 +292,62 @@ def update_iteration(request, pk):
             status=status.HTTP_404_NOT_FOUND,
         )
 
-    provided_central_auth = request.data.get("central_auth")
-    if provided_central_auth:
-        try:
-            provided_user = UserProfile.objects.get(id=provided_central_auth)
-        except UserProfile.DoesNotExist:
-            return Response(
-                {"error": "Provided central_auth user not found."},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
+    central_auth_id = request.data.get("central_auth")
+    if not central_auth_id and not request.user.is_authenticated:
+        return Response(
+            {"error": "central_auth is required."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
 
-        if provided_user.role != "central":
-            return Response(
-                {"error": "Provided user is not a central auth user."},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
+    try:
+        user = principal(request, "central", user_id=central_auth_id)
+    except UserProfile.DoesNotExist:
+        return Response(
+            {"error": "Provided central_auth user not found."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
 
-        if iteration.central_auth.id != int(provided_central_auth):
-            return Response(
-                {"error": "You are not allowed to edit this iteration."},
-                status=status.HTTP_403_FORBIDDEN,
-            )
+    if iteration.central_auth_id != user.id:
+        return Response(
+            {"error": "You are not allowed to edit this iteration."},
+            status=status.HTTP_403_FORBIDDEN,
+        )
 
     serializer = CentralAuthModelSerializer(iteration, data=request.data, partial=True)
     if serializer.is_valid():
         serializer.save()
         return Response(serializer.data, status=status.HTTP_200_OK)
 
-    print("Update serializer errors:", serializer.errors)
+    logger.info("Iteration %s update rejected: %s", pk, serializer.errors)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(["GET"])
 def iteration_clients(request, iteration_id):
     """
     Returns the list of clients assigned to a specific iteration (by iteration_name).
+    Only the central auth user who owns the iteration may read it.
     """
+    user_id = request.GET.get("user_id")
+    if not user_id and not request.user.is_authenticated:
+        # 401, so the frontend sends a session without a token back to login
+        return Response({"error": "Authentication required"}, status=status.HTTP_401_UNAUTHORIZED)
+
+    try:
+        user = principal(request, "central", user_id=user_id)
+    except UserProfile.DoesNotExist:
+        return Response({"error": "Central Auth user not found"}, status=status.HTTP_404_NOT_FOUND)
+
     try:
         iteration = CentralAuthModel.objects.get(id=iteration_id)
     except CentralAuthModel.DoesNotExist:
         return Response({"error": "Iteration not found"}, status=status.HTTP_404_NOT_FOUND)
 
-    assignments = CentralClientAssignment.objects.filter(iteration_name=iteration.iteration_name)
+    if iteration.central_auth_id != user.id:
+        return Response({"error": "You are not allowed to view this iteration."}, status=status.HTTP_403_FORBIDDEN)
+
+    assignments = CentralClientAssignment.objects.filter(
+        central_auth_id=iteration.central_auth_id, iteration_name=iteration.iteration_name
+    ).select_related("client")
     data = [
         {
             "client_email": a.client.email,
@@ -291,39 +369,28 @@ def client_dashboard_data(request, email):
       - Total finalized models involved
     """
     try:
-        client = UserProfile.objects.get(email=email, role="client")
+        client = principal(request, "client", email=email)
     except UserProfile.DoesNotExist:
         return Response({"error": "Client not found"}, status=status.HTTP_404_NOT_FOUND)
 
-    # Find all assignments for this client
-    assignments = CentralClientAssignment.objects.filter(client=client)
-
-    # Count how many iterations the client has participated in
-    total_rounds = assignments.count()
-
-    # Determine which iteration is currently running
-    running_iterations = CentralAuthModel.objects.filter(
-        iteration_name__in=assignments.values_list("iteration_name", flat=True),
-        version__gt=0  # version > 0 means running
+    # Rounds participated in, running (version > 0) and finalized (version == 0)
+    # iterations, counted over the client's assignments in one conditional aggregate
+    counters = CentralClientAssignment.objects.filter(client_id=client.id).aggregate(
+        total_rounds=Count("id"),
+        current_running_rounds=Count("id", filter=Q(iteration__version__gt=0)),
+        total_finalized_models=Count("id", filter=Q(iteration__version=0)),
     )
 
-    current_running_rounds = running_iterations.count()
-
-    # Count finalized models (version == 0 means finalized)
-    finalized_models = CentralAuthModel.objects.filter(
-        iteration_name__in=assignments.values_list("iteration_name", flat=True),
-        version=0
-    ).count()
-
     return Response({
         "client_email": client.email,
         "hospital": client.hospital,
-        "total_rounds": total_rounds,
-        "current_running_rounds": current_running_rounds,
-        "total_finalized_models": finalized_models
+        "total_rounds": counters["total_rounds"],
+        "current_running_rounds": counters["current_running_rounds"],
+        "total_finalized_models": counters["total_finalized_models"]
     }, status=status.HTTP_200_OK)
 
 @api_view(["GET"])
+@cached_response(user_id_scope)
 def list_client_models(request):
     """
     Returns all iterations (both current & completed)
@@ -331,23 +398,23 @@ def list_client_models(request):
     Includes current (version > 0) and finished (version = 0) models.
     """
     user_id = request.GET.get("user_id")
-    if not user_id:
+    if not user_id and not request.user.is_authenticated:
         return Response({"error": "user_id parameter is required"}, status=status.HTTP_400_BAD_REQUEST)
 
     try:
-        client = UserProfile.objects.get(id=user_id, role="client")
+        client = principal(request, "client", user_id=user_id)
     except UserProfile.DoesNotExist:
         return Response({"error": "Client not found"}, status=status.HTTP_404_NOT_FOUND)
 
-    # Find all iterations linked via assignments
-    assigned_iterations = CentralClientAssignment.objects.filter(client=client)
-    iteration_names = assigned_iterations.values_list("iteration_name", flat=True)
-
-    # Fetch corresponding CentralAuthModel iterations
-    iterations = CentralAuthModel.objects.filter(iteration_name__in=iteration_names).order_by("-created_at")
+    # Fetch the CentralAuthModel iterations linked via the client's assignments
+    iterations = (
+        CentralAuthModel.objects.filter(assignments__client_id=client.id)
+        .select_related("central_auth")
+        .distinct()
+        .order_by("-created_at")
+    )
 
-    serializer = CentralAuthModelSerializer(iterations, many=True)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    return paginated_response(request, iterations, CentralAuthModelSerializer)
 
 @api_view(["GET"])
 def current_client_iterations(request, email):
@@ -355,17 +422,14 @@ def current_client_iterations(request, email):
     Fetch only the current (running) iterations assigned to a specific client.
     """
     try:
-        client = UserProfile.objects.get(email=email, role="client")
+        client = principal(request, "client", email=email)
     except UserProfile.DoesNotExist:
         return Response({"error": "Client not found"}, status=status.HTTP_404_NOT_FOUND)
 
-    # Get current running central models (version > 0)
-    current_iterations = CentralAuthModel.objects.filter(version__gt=0)
-
-    # Filter by assignments for this client
+    # Assignments of this client whose iteration is running (version > 0)
     assigned_iterations = CentralClientAssignment.objects.filter(
-        client=client, iteration_name__in=current_iterations.values_list("iteration_name", flat=True)
-    )
+        client_id=client.id, iteration__version__gt=0
+    ).select_related("central_auth", "iteration")
 
     data = [
         {
@@ -374,7 +438,7 @@ def current_client_iterations(request, email):
             "model_name": a.model_name,
             "data_domain": a.data_domain,
             "central_auth_email": a.central_auth.email,
-            "version": getattr(a.central_auth.centralauthmodel_set.filter(iteration_name=a.iteration_name, version__gt=0).first(), 'version', 0)
+            "version": a.iteration.version,
         }
         for a in assigned_iterations
     ]
@@ -399,123 +463,429 @@ def submit_client_model(request):
     """
     serializer = ClientModelSerializer(data=request.data)
     if serializer.is_valid():
-        serializer.save()
+        _save_client_model(serializer)
         return Response({"message": "Client model submitted successfully!"}, status=status.HTTP_201_CREATED)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+@api_view(["POST"])
+@parser_classes([MultiPartParser, FormParser])
+def submit_client_delta(request):
+    """
+    Client uploads a compressed parameter delta against a CentralAuthModel
+    version instead of a full model (format in api/delta.py).
+    Expected fields: the submit_client_model fields, with
+    {
+        "base_model": <central_model_id>,
+        "delta_file": <uploaded .npz>
+    }
+    in place of "model_file".
+    """
+    delta_file = request.FILES.get("delta_file")
+    base_id = request.data.get("base_model")
+    if delta_file is None or not base_id:
+        return Response({"error": "base_model and delta_file are required"}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        assignment = CentralClientAssignment.objects.get(id=request.data.get("assignment"))
+        base_model = CentralAuthModel.objects.get(id=base_id)
+    except (CentralClientAssignment.DoesNotExist, CentralAuthModel.DoesNotExist, ValueError):
+        return Response({"error": "Assignment or base model not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    # Round names are unique per central authority, so both must match.
+    if (base_model.central_auth_id, base_model.iteration_name) != (assignment.central_auth_id, assignment.iteration_name):
+        return Response(
+            {"error": "base_model belongs to a different iteration than the assignment"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    try:
+        estimator = apply_delta(load_estimator(base_model.model_file), delta_file.read())
+    except (AggregationError, DeltaError) as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    data = {key: request.data.get(key) for key in request.data if key not in ("delta_file", "base_model")}
+    data["model_file"] = ContentFile(pickle.dumps(estimator), name=f"{os.path.splitext(delta_file.name)[0]}.pkl")
+    serializer = ClientModelSerializer(data=data)
+    if serializer.is_valid():
+        _save_client_model(serializer)
+        return Response({"message": "Client model submitted successfully!"}, status=status.HTTP_201_CREATED)
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+def _save_client_model(serializer):
+    with transaction.atomic():
+        client_model = serializer.save()
+        try:
+            # Fold into the iteration's running FedAvg so closing the round is O(1).
+            accumulate_submission(client_model)
+        except AggregationError as e:
+            logger.info("Submission %s not accumulated: %s", client_model.id, e)
+        evaluate_on_commit(client_model)
+    return client_model
+
+
 @api_view(["GET"])
 def current_iteration_submissions(request, iteration_id):
     """
     Returns latest client submissions for a given current iteration.
-    Only returns the latest version submitted by each client for this iteration.
+    Only returns the latest version submitted by each client for this iteration,
+    and only to the central auth user who owns it.
     """
+    user_id = request.GET.get("user_id")
+    if not user_id and not request.user.is_authenticated:
+        # 401, so the frontend sends a session without a token back to login
+        return Response({"error": "Authentication required"}, status=status.HTTP_401_UNAUTHORIZED)
+
+    try:
+        user = principal(request, "central", user_id=user_id)
+    except UserProfile.DoesNotExist:
+        return Response({"error": "Central Auth user not found"}, status=status.HTTP_404_NOT_FOUND)
+
     try:
         iteration = CentralAuthModel.objects.get(id=iteration_id)
     except CentralAuthModel.DoesNotExist:
         return Response({"error": "Iteration not found"}, status=status.HTTP_404_NOT_FOUND)
 
-    # Get all assignments for this iteration
-    assignments = CentralClientAssignment.objects.filter(iteration_name=iteration.iteration_name)
-
-    submissions = []
-    for assignment in assignments:
-        # Get latest client model for this assignment
-        latest_model = ClientModel.objects.filter(assignment=assignment).order_by('-created_at').first()
-        if latest_model:
-            submissions.append({
-                "client_email": assignment.client.email,
-                "client_hospital": assignment.client.hospital,
-                "accuracy": latest_model.accuracy,
-                "precision": latest_model.precision,
-                "recall": latest_model.recall,
-                "f1_score": latest_model.f1_score,
-                "version": latest_model.version,
-                "model_file": latest_model.model_file.url if latest_model.model_file else None,
-                "submitted_at": latest_model.created_at,
-            })
+    if iteration.central_auth_id != user.id:
+        return Response({"error": "You are not allowed to view this iteration."}, status=status.HTTP_403_FORBIDDEN)
+
+    # Latest client model per assignment, with its client, in a single query
+    submissions = [
+        {
+            "client_email": latest_model.assignment.client.email,
+            "client_hospital": latest_model.assignment.client.hospital,
+            "accuracy": latest_model.accuracy,
+            "precision": latest_model.precision,
+            "recall": latest_model.recall,
+            "f1_score": latest_model.f1_score,
+            "server_accuracy": latest_model.server_accuracy,
+            "server_precision": latest_model.server_precision,
+            "server_recall": latest_model.server_recall,
+            "server_f1_score": latest_model.server_f1_score,
+            "evaluated_at": latest_model.evaluated_at,
+            "evaluation_error": latest_model.evaluation_error,
+            "version": latest_model.version,
+            "model_file": latest_model.model_file.url if latest_model.model_file else None,
+            "submitted_at": latest_model.created_at,
+        }
+        for latest_model in latest_submissions(iteration)
+    ]
 
     return Response(submissions)
 
 @api_view(["POST"])
-def diabetes(request):
-    if request.method == "POST":
+def aggregate_submissions(request, iteration_id):
+    """
+    Queue FedAvg of the latest client submission of every assignment in this
+    iteration; the result becomes the iteration's next CentralAuthModel version.
+    Only the owning central auth user may, and not on a finalized (version 0) row.
+    Answers 202 with the job, whose status URL is in the Location header.
+    """
+    central_auth_id = request.data.get("central_auth_id")
+    if not central_auth_id and not request.user.is_authenticated:
+        return Response({"error": "Authentication required"}, status=status.HTTP_401_UNAUTHORIZED)
+
+    try:
+        user = principal(request, "central", user_id=central_auth_id)
+    except UserProfile.DoesNotExist:
+        return Response({"error": "Central Auth user not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    try:
+        iteration = CentralAuthModel.objects.get(id=iteration_id)
+    except CentralAuthModel.DoesNotExist:
+        return Response({"error": "Iteration not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    if iteration.central_auth_id != user.id:
+        return Response({"error": "You are not allowed to change this iteration."}, status=status.HTTP_403_FORBIDDEN)
+    if iteration.version == 0:
+        return Response({"error": "This iteration is finalized."}, status=status.HTTP_400_BAD_REQUEST)
+
+    if not iteration_submissions(iteration).exists():
+        return Response({"error": "No client submissions to aggregate."}, status=status.HTTP_400_BAD_REQUEST)
+
+    job = enqueue("aggregate_iteration", {"iteration_id": iteration.id}, key=f"aggregate_iteration:{iteration.id}")
+    return _accepted(job)
+
+
+@api_view(["POST"])
+def evaluate_iteration(request, iteration_id):
+    """
+    Queue server-side evaluation of this iteration's not yet evaluated client
+    submissions on the held-out validation set, as the owning central auth user.
+    Answers 202 with the job.
+    """
+    central_auth_id = request.data.get("central_auth_id")
+    if not central_auth_id and not request.user.is_authenticated:
+        return Response({"error": "Authentication required"}, status=status.HTTP_401_UNAUTHORIZED)
+
+    try:
+        user = principal(request, "central", user_id=central_auth_id)
+    except UserProfile.DoesNotExist:
+        return Response({"error": "Central Auth user not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    try:
+        iteration = CentralAuthModel.objects.get(id=iteration_id)
+    except CentralAuthModel.DoesNotExist:
+        return Response({"error": "Iteration not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    if iteration.central_auth_id != user.id:
+        return Response({"error": "You are not allowed to change this iteration."}, status=status.HTTP_403_FORBIDDEN)
+    if iteration.version == 0:
+        return Response({"error": "This iteration is finalized."}, status=status.HTTP_400_BAD_REQUEST)
+
+    return _accepted(enqueue_evaluation(iteration.central_auth_id, iteration.iteration_name))
+
+
+# ---------------------------
+# ✅ Background Jobs
+# ---------------------------
+def _accepted(job):
+    return Response(
+        JobSerializer(job).data,
+        status=status.HTTP_202_ACCEPTED,
+        headers={"Location": reverse("job_status", args=[job.id])},
+    )
+
+
+@api_view(["GET"])
+def job_status(request, job_id):
+    """Status, progress and (once finished) result or error of a background job."""
+    job = get_object_or_404(Job, id=job_id)
+    return Response(JobSerializer(job).data)
+
+# ---------------------------
+# ✅ Chunked Model Uploads
+# ---------------------------
+@api_view(["POST"])
+def create_upload(request):
+    """
+    Open a resumable upload for a central ("central") or client ("client") model.
+    Expected payload:
+    {
+        "kind": "client",
+        "filename": "model.pkl",
+        "size": 1048576,            # optional, checked on commit
+        "sha256": "<hex digest>"    # optional, checked on commit
+    }
+    """
+    kind = request.data.get("kind")
+    filename = request.data.get("filename")
+    if kind not in ("central", "client") or not filename:
+        return Response(
+            {"error": "kind ('central' or 'client') and filename are required"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    size = request.data.get("size")
+    if size is not None and not str(size).isdigit():
+        return Response({"error": "size must be a byte count"}, status=status.HTTP_400_BAD_REQUEST)
+
+    session = UploadSession.objects.create(
+        kind=kind,
+        filename=os.path.basename(filename),
+        expected_size=int(size) if size is not None else None,
+        expected_sha256=request.data.get("sha256") or "",
+    )
+    return Response(_upload_state(session), status=status.HTTP_201_CREATED)
+
+
+def _upload_state(session):
+    return {
+        "upload_id": session.id,
+        "next_chunk": session.next_chunk,
+        "bytes_received": session.bytes_received,
+        "committed": session.committed,
+    }
+
+
+@api_view(["GET"])
+def upload_status(request, upload_id):
+    """Where to resume: the next chunk index the server expects."""
+    session = get_object_or_404(UploadSession, id=upload_id)
+    return Response(_upload_state(session))
+
+
+@api_view(["PUT"])
+def put_upload_chunk(request, upload_id, index):
+    """Raw chunk bytes in the request body; re-sending an acknowledged chunk is a no-op."""
+    get_object_or_404(UploadSession, id=upload_id)
+    try:
+        session = write_chunk(upload_id, index, request.stream)
+    except UploadError as e:
+        current = UploadSession.objects.get(id=upload_id)
+        return Response({"error": str(e), **_upload_state(current)}, status=e.status)
+    return Response(_upload_state(session))
+
+
+@api_view(["POST"])
+def commit_upload(request, upload_id):
+    """
+    Create the CentralAuthModel or ClientModel from the uploaded bytes.
+    Takes the same fields as start_iteration / submit_client_model, minus model_file.
+    """
+    with transaction.atomic():
+        session = get_object_or_404(UploadSession.objects.select_for_update(), id=upload_id)
+        if session.committed:
+            return Response({"error": "Upload is already committed."}, status=status.HTTP_409_CONFLICT)
         try:
-            data = request.data
-
-            # Extract features from request
-            features = [
-                int(data.get("genHlth", 0)),             # General Health
-                float(data.get("bmi", 0)),               # BMI
-                int(data.get("age", 0)),                 # Age
-                int(data.get("highBP", 0)),              # HighBP
-                int(data.get("highChol", 0)),            # HighChol
-                int(data.get("cholCheck", 0)),           # CholCheck
-                int(data.get("hvyAlcoholConsump", 0)),   # Heavy Alcohol
-                int(data.get("sex", 0)),                 # Sex
-                int(data.get("income", 0)),              # Income
-                int(data.get("heartDiseaseValue", 0)),   # HeartDiseaseorAttack
-                int(data.get("physHlth", 0)),            # PhysHlth
-            ]
-
-            # Convert to 2D array for model
-            print(features)
-            features_array = np.array(features).reshape(1, -1)
-            print(1)
-            with open("../../pkl files/diabetes_model.pkl", "rb") as f:
-                diabetes_model = pickle.load(f)
-            # Predict
-            diabetes_prediction = diabetes_model.predict(features_array)[0]
-            probability = diabetes_model.predict_proba(features_array)[0][1]  # probability of diabetes=1
-            print("Probability:", probability)
-            print(diabetes_prediction)
-            
-
-            return Response({
-            "diabetes": int(diabetes_prediction),
-            "probability": float(probability)
-            })
-
-        except Exception as e:
-            return Response({"error": str(e)}, status=400)
-
-    return Response({"error": "Invalid request method"}, status=405)
+            model_file, digest = finish(session)
+        except UploadError as e:
+            return Response({"error": str(e)}, status=e.status)
+
+        data = {key: request.data.get(key) for key in request.data}
+        data["model_file"] = model_file
+        with model_file:
+            if session.kind == "central":
+                serializer = CentralAuthModelSerializer(data=data)
+                save = _save_iteration
+            else:
+                serializer = ClientModelSerializer(data=data)
+                save = _save_client_model
+            if not serializer.is_valid():
+                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            save(serializer)
+
+        session.committed = True
+        session.sha256 = digest
+        session.save(update_fields=["committed", "sha256", "updated_at"])
+
+    discard(session)
+    return Response({**serializer.data, "sha256": digest}, status=status.HTTP_201_CREATED)
+
+
+@api_view(["POST"])
+def abort_upload(request, upload_id):
+    """Abandon an uncommitted upload and delete what was received."""
+    with transaction.atomic():
+        session = get_object_or_404(UploadSession.objects.select_for_update(), id=upload_id)
+        if session.committed:
+            return Response({"error": "Upload is already committed."}, status=status.HTTP_409_CONFLICT)
+        discard(session)
+        session.delete()
+    return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+def _overloaded(error):
+    """503 for a full inference queue; clients retry after Retry-After seconds."""
+    return Response(
+        {"error": str(error)},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={"Retry-After": str(error.retry_after)},
+    )
+
+
+def _predict(request, name):
+    """
+    Score one record with model `name`. Fields are read through the model's
+    feature schema (api/schemas.py); missing fields take their defaults.
+    """
+    try:
+        schema = get_schema(name)
+    except ModelNotRegistered:
+        return Response({"error": f"Unknown model '{name}'."}, status=status.HTTP_404_NOT_FOUND)
+
+    if not isinstance(request.data, dict):
+        return Response({"error": "Send the features as a JSON object."}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        # Encoded into this thread's buffer; predict_one returns before it is reused
+        label, probability = predict_one(name, schema.encode(request.data))
+    except PoolSaturated as e:
+        return _overloaded(e)
+    except ModelNotRegistered:
+        return Response({"error": f"Model '{name}' is not served."}, status=status.HTTP_404_NOT_FOUND)
+    except Exception as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response({name: int(label), "probability": float(probability)})
+
+
+@api_view(["POST"])
+def predict(request, model):
+    return _predict(request, model)
+
+
+@api_view(["POST"])
+def diabetes(request):
+    return _predict(request, "diabetes")
+
 
 @api_view(["POST"])
 def heartdisease(request):
-    if request.method == "POST":
-        try:
-            data = request.data
-            features = {
-                "age": int(data.get("age", 0)),
-                "gender": int(data.get("gender", 0)),
-                "height": int(data.get("height", 0)),
-                "weight": int(data.get("weight", 0)),
-                "systolic_pressure": int(data.get("systolicBP", 0)),
-                "diastolic_pressure": int(data.get("diastolicBP", 0)),
-                "cholesterol": int(data.get("cholesterol", 0)),
-                "glucose": int(data.get("glucose", 0)),
-                "smoker": int(data.get("smoke", 0)),
-                "alcohol": int(data.get("alcohol", 0)),
-                "active": int(data.get("active", 0)),
-            }
-            print(features)
-            features_df = pd.DataFrame([features])
-            print(1)
-            with open("../../pkl files/heartDisease.pkl", "rb") as f:
-                heartdisease_model = pickle.load(f)
-            # Predict
-            heartdisease_prediction = heartdisease_model.predict(features_df)[0]
-            probability = heartdisease_model.predict_proba(features_df)[0][1]  # probability of heartdisease=1
-            print("Probability:", probability)
-            print(heartdisease_prediction)
-            
-
-            return Response({
-            "heartdisease": int(heartdisease_prediction),
-            "probability": float(probability)
-            })
-        except Exception as e:
-            print("🔥 REAL ERROR:", repr(e))
-            return Response({"error": str(e)}, status=400)
-    return Response({"error": "Invalid request method"}, status=405)
-    
+    return _predict(request, "heartdisease")
+
+
+def _batch_predict(request, name):
+    """
+    Score many records in one request and stream one NDJSON line per record.
+    Accepts either a JSON array of records (or {"records": [...]}) or a CSV
+    upload in the `file` field; `?sep=;` reads semicolon-separated files.
+    """
+    try:
+        get_schema(name)
+        model = registry.get(name)
+    except ModelNotRegistered:
+        return Response({"error": f"Unknown model '{name}'."}, status=status.HTTP_404_NOT_FOUND)
+
+    upload = request.FILES.get("file")
+    if upload is not None:
+        chunks = iter_csv_chunks(upload, sep=request.GET.get("sep", ","))
+    else:
+        records = request.data
+        if isinstance(records, dict):
+            records = records.get("records")
+        if not isinstance(records, list) or not all(isinstance(r, dict) for r in records):
+            return Response(
+                {"error": "Send a JSON array of records or a CSV file in the 'file' field."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        chunks = iter_json_chunks(records)
+
+    return StreamingHttpResponse(
+        stream_predictions(name, model, chunks),
+        content_type="application/x-ndjson",
+    )
+
+
+@api_view(["POST"])
+@parser_classes([JSONParser, MultiPartParser, FormParser])
+def predict_batch(request, model):
+    return _batch_predict(request, model)
+
+
+@api_view(["POST"])
+@parser_classes([JSONParser, MultiPartParser, FormParser])
+def diabetes_batch(request):
+    return _batch_predict(request, "diabetes")
+
+
+@api_view(["POST"])
+@parser_classes([JSONParser, MultiPartParser, FormParser])
+def heartdisease_batch(request):
+    return _batch_predict(request, "heartdisease")
+
+
+@api_view(["GET"])
+def inference_metrics(request):
+    """
+    Micro-batching counters per model (queue depth, batch sizes, queue wait),
+    prediction-cache hit rate and, when enabled, process-pool utilisation.
+    """
+    return Response({
+        "batching": batching_stats(),
+        "cache": prediction_cache.stats(),
+        "pool": pool_stats(),
+    })
+
+
+@require_GET
+def prometheus_metrics(request):
+    """
+    Request latency, SQL and response-size histograms per URL name and
+    inference time per model version (api/metrics.py), in the Prometheus text
+    format. Only METRICS_ALLOWED_IPS may scrape it (anyone when empty).
+    """
+    allowed = getattr(settings, "METRICS_ALLOWED_IPS", ())
+    if allowed and request.META.get("REMOTE_ADDR") not in allowed:
+        return HttpResponse(status=status.HTTP_403_FORBIDDEN)
+    return HttpResponse(metrics.render(), content_type=CONTENT_TYPE)
@@ -12,5 +12,18 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+# Serve the async views (api/async_views.py) under ASGI, e.g.
+#   uvicorn core.asgi:application --workers 4
+os.environ.setdefault('ASYNC_VIEWS', 'true')
 
 application = get_asgi_application()
+
+# Load the inference models once per worker, before the first request needs them.
+from api.registry import registry  # noqa: E402
+
+registry.warm()
+
+# Start the inference process pool, if INFERENCE_POOL_WORKERS enables it.
+from api.pool import start_pool  # noqa: E402
+
+start_pool()
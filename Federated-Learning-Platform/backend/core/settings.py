@@ -38,12 +38,15 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'api',
     'corsheaders',
 ]
 
 MIDDLEWARE = [
+    # First, so its timings cover the rest of the stack.
+    'api.metrics.RequestMetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.security.SecurityMiddleware',
@@ -93,15 +96,187 @@ DATABASES = {
 }
 
 
-# DATABASES = {
-#     'default': {
-#         'ENGINE': 'django.db.backends.sqlite3',
-#         'NAME': BASE_DIR / 'db.sqlite3',
-#     }
-# }
+# DB_ENGINE=sqlite runs locally (and the test suite) without a Postgres server.
+if env('DB_ENGINE', default='postgresql') == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+            # Concurrent writers (threads, `simulate_round`) wait for the write
+            # lock instead of failing with "database is locked".
+            'OPTIONS': {
+                'timeout': 20,
+                'transaction_mode': 'IMMEDIATE',
+                'init_command': 'PRAGMA journal_mode=WAL;',
+            },
+        }
+    }
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Model artifacts are stored once per distinct content (see api/storage.py)
+STORAGES = {
+    'default': {
+        'BACKEND': 'api.storage.ContentAddressedStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
+# Unreferenced blobs younger than this are kept, so an upload is never
+# collected between writing its file and saving the row that references it
+BLOB_GC_GRACE_SECONDS = 3600
+
+# Chunked model uploads: partial files live under MEDIA_ROOT/<dir> until committed
+UPLOAD_PARTIAL_DIR = 'uploads'
+UPLOAD_MAX_CHUNK_BYTES = 8 * 1024 * 1024
+# Uncommitted uploads idle this long are removed by `manage.py expire_uploads`
+UPLOAD_SESSION_MAX_AGE = 24 * 3600
+
+
+# Inference models
+# Each served model resolves to the newest finalized (version=0) CentralAuthModel
+# whose dataset_domain matches one of `domains`; `fallback` is the bundled pickle
+# used until such an iteration exists.
+PKL_DIR = BASE_DIR.parent.parent / 'pkl files'
+
+INFERENCE_MODELS = {
+    'diabetes': {
+        'domains': ['diabetes'],
+        'fallback': PKL_DIR / 'diabetes_model.pkl',
+    },
+    'heartdisease': {
+        'domains': ['heartdisease', 'heart-disease', 'heart disease'],
+        'fallback': PKL_DIR / 'heartDisease.pkl',
+    },
+}
+
+# Held-out validation sets for server-side evaluation of client submissions
+# (api/evaluation.py), keyed by inference model. Columns are renamed and scaled
+# as in the training notebook, whose test split (test_size, seed) is reproduced.
+DATASET_DIR = BASE_DIR.parent.parent / 'datasets'
+EVALUATION_DATASETS = {
+    'heartdisease': {
+        'path': DATASET_DIR / 'heart-disease' / 'cardio_train.csv',
+        'sep': ';',
+        'rename': {
+            'ap_hi': 'systolic_pressure',
+            'ap_lo': 'diastolic_pressure',
+            'gluc': 'glucose',
+            'smoke': 'smoker',
+            'alco': 'alcohol',
+        },
+        'scale': {'age': 1 / 365.25},  # days -> years
+        'target': 'cardio',
+        'test_size': 0.2,
+        'seed': 42,
+    },
+}
+EVALUATION_CACHE_DIR = 'validation'
+
+# Reference datasets converted to one .npy per column, and client partitions of
+# them (`manage.py partition_dataset`), under MEDIA_ROOT/<dir>.
+DATASET_CACHE_DIR = 'datasets'
+PARTITION_DIR = 'partitions'
+# Processes scoring submissions in each job worker (0 scores in the worker itself).
+EVALUATION_WORKERS = env.int('EVALUATION_WORKERS', default=os.cpu_count() or 1)
+
+# Serve models from memory-mappable native artifacts under MEDIA_ROOT/<dir>
+# (converted from the pickles on first use) so workers share weight pages.
+INFERENCE_USE_ARTIFACTS = True
+MODEL_ARTIFACT_DIR = 'artifacts'
+
+# How often (seconds) a worker checks the database for a newly finalized model.
+INFERENCE_REFRESH_SECONDS = env.int('INFERENCE_REFRESH_SECONDS', default=30)
+
+# Rows scored per predict_proba call by the batch endpoints.
+INFERENCE_BATCH_CHUNK_SIZE = env.int('INFERENCE_BATCH_CHUNK_SIZE', default=2048)
+
+# Micro-batching of concurrent single-record predictions: a batch is flushed
+# after WINDOW_MS or once MAX_SIZE requests are queued. A window of 0 disables it.
+INFERENCE_BATCH_WINDOW_MS = env.float('INFERENCE_BATCH_WINDOW_MS', default=2)
+INFERENCE_BATCH_MAX_SIZE = env.int('INFERENCE_BATCH_MAX_SIZE', default=64)
+
+# Score in a pool of worker processes instead of the web worker (0 = in-process).
+# At most QUEUE_SIZE requests wait or run in the pool; more get 503 + Retry-After.
+INFERENCE_POOL_WORKERS = env.int('INFERENCE_POOL_WORKERS', default=0)
+INFERENCE_POOL_QUEUE_SIZE = env.int('INFERENCE_POOL_QUEUE_SIZE', default=256)
+INFERENCE_POOL_RETRY_AFTER = 1
+
+# LRU of single-record predictions keyed on model + feature tuple (0 disables).
+INFERENCE_CACHE_SIZE = env.int('INFERENCE_CACHE_SIZE', default=4096)
+INFERENCE_CACHE_TTL = 3600
+
+
+# Keyset pagination of list endpoints (used when a request passes cursor or page_size)
+API_PAGE_SIZE = 50
+API_MAX_PAGE_SIZE = 500
+
+# Most clients returned by one filter_client search
+CLIENT_SEARCH_LIMIT = 20
+
+# Bearer tokens issued by login (api/auth.py), verified without a database query.
+# Endpoints still accept the legacy user_id/email parameters when no token is sent.
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': ['api.auth.SignedTokenAuthentication'],
+}
+AUTH_TOKEN_MAX_AGE = env.int('AUTH_TOKEN_MAX_AGE', default=12 * 3600)
+
+# Shared cache (CACHE_URL, e.g. redis://... or memcache://...). The default file
+# cache is shared by all workers on one host, so a write invalidates every worker.
+CACHES = {
+    'default': env.cache('CACHE_URL', default=f"filecache://{BASE_DIR / '.cache'}"),
+}
+
+# Per-user cache of the polled list endpoints (api/caching.py); entries are also
+# invalidated on every write that changes them, this is only an upper bound.
+RESPONSE_CACHE_TIMEOUT = 300
+
+
+# Background jobs (api/jobs.py), run by `manage.py run_jobs`. A failed attempt is
+# retried after JOB_RETRY_BACKOFF seconds, doubled per attempt up to the max; a
+# claimed job is reclaimed when its worker reports no progress for the lease.
+JOB_MAX_ATTEMPTS = 5
+JOB_RETRY_BACKOFF = 5
+JOB_RETRY_BACKOFF_MAX = 300
+JOB_LEASE_SECONDS = 600
+JOB_POLL_INTERVAL = 1
+
+
+# Stored results of `manage.py simulate_round`, keyed by scenario. A run fails when
+# it needs more queries per request than its baseline, or is slower (latency,
+# round time, peak RSS) by more than SIMULATION_TOLERANCE.
+SIMULATION_BASELINES = BASE_DIR / 'benchmarks' / 'round_baselines.json'
+SIMULATION_TOLERANCE = 0.5
+
+
+# Per-URL latency, SQL and response-size histograms and per-model-version
+# inference time (api/metrics.py), served in the Prometheus text format at
+# /metrics to the listed addresses (an empty list lets anyone scrape it).
+METRICS_ENABLED = env.bool('METRICS_ENABLED', default=True)
+METRICS_ALLOWED_IPS = env.list('METRICS_ALLOWED_IPS', default=['127.0.0.1', '::1'])
+
+# Application logs go to stderr at LOG_LEVEL; INFO adds model swaps and rejected requests.
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'plain': {'format': '%(asctime)s %(levelname)s %(name)s %(message)s'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler', 'formatter': 'plain'},
+    },
+    'loggers': {
+        'api': {'handlers': ['console'], 'level': env.str('LOG_LEVEL', default='WARNING')},
+    },
+}
+
+
+# Route the read, upload and inference endpoints to api/async_views.py.
+# core/asgi.py turns this on, so `uvicorn core.asgi:application` serves them async.
+ASYNC_VIEWS = env.bool('ASYNC_VIEWS', default=False)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
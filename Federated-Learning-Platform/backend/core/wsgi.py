@@ -14,3 +14,13 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
 application = get_wsgi_application()
+
+# Load the inference models once per worker, before the first request needs them.
+from api.registry import registry  # noqa: E402
+
+registry.warm()
+
+# Start the inference process pool, if INFERENCE_POOL_WORKERS enables it.
+from api.pool import start_pool  # noqa: E402
+
+start_pool()
@@ -50,7 +50,10 @@ const CentralAuthIteration = () => {
 
   const fetchIterationClients = async (iterationId) => {
     try {
-      const { data } = await axios.get(`${backendBase}/central-models/${iterationId}/clients/`);
+      const user = JSON.parse(localStorage.getItem("user"));
+      const { data } = await axios.get(`${backendBase}/central-models/${iterationId}/clients/`, {
+        params: { user_id: user?.id },
+      });
       setClients(data);
       const iteration = models.find((m) => m.id === iterationId);
       setSelectedIteration(iteration);
@@ -64,7 +67,10 @@ const CentralAuthIteration = () => {
   // New function to fetch submissions
   const fetchIterationSubmissions = async (iterationId) => {
     try {
-      const { data } = await axios.get(`${backendBase}/central-models/${iterationId}/submissions/`);
+      const user = JSON.parse(localStorage.getItem("user"));
+      const { data } = await axios.get(`${backendBase}/central-models/${iterationId}/submissions/`, {
+        params: { user_id: user?.id },
+      });
       setSubmissions(data);
       const iteration = models.find((m) => m.id === iterationId);
       setSelectedIteration(iteration);
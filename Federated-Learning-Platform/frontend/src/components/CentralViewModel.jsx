@@ -59,7 +59,10 @@ const CentralViewModel = () => {
 
   const fetchModelClients = async (modelId) => {
     try {
-      const { data } = await axios.get(`${backendBase}/central-models/${modelId}/clients/`);
+      const user = JSON.parse(localStorage.getItem("user"));
+      const { data } = await axios.get(`${backendBase}/central-models/${modelId}/clients/`, {
+        params: { user_id: user?.id },
+      });
       setClients(data);
       const model = models.find((m) => m.id === modelId);
       setSelectedModel(model);
@@ -21,10 +21,25 @@ import '../src/css/SendUpdate.css'
 import '../src/css/MLServices.css'
 
 import { BrowserRouter } from 'react-router-dom'
+import axios from 'axios'
 import "@fontsource/poppins"; 
 import "@fontsource/nova-cut";
 import ScrollToTop from './components/ScrollToTop';
 
+// Send the token issued at login; an expired or rejected token ends the session.
+axios.interceptors.request.use((config) => {
+  const token = JSON.parse(localStorage.getItem("user") || "null")?.token;
+  if (token) config.headers.Authorization = `Bearer ${token}`;
+  return config;
+});
+axios.interceptors.response.use(undefined, (error) => {
+  if (error.response?.status === 401 && localStorage.getItem("user")) {
+    localStorage.removeItem("user");
+    window.location.assign("/login");
+  }
+  return Promise.reject(error);
+});
+
 createRoot(document.getElementById('root')).render(
   <BrowserRouter>
   <ScrollToTop/>